@@ -0,0 +1,74 @@
+"""
+Time to build, save, load and query a Catalog of many data sets, against scanning the snapshots of every data set
+for each query.
+
+    PYTHONPATH=. python bench/bench_catalog.py
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from sdig.erddap.catalog import Catalog
+from sdig.erddap.snapshot import Snapshot
+
+DSG_TYPES = ('timeseries', 'timeseriesprofile', 'trajectory', 'profile')
+
+
+def snapshots(n_datasets, n_variables=40, seed=0):
+    rng = np.random.default_rng(seed)
+    made = []
+    for i in range(n_datasets):
+        names = ['sea_water_property_' + str(j) for j in rng.choice(500, n_variables, replace=False)]
+        if i % 3 == 0:
+            names[0] = 'sea_water_temperature'
+        variables = ['VAR' + str(j) for j in range(n_variables)]
+        start = 946684800.0 + rng.uniform(0, 20) * 31557600
+        end = start + rng.uniform(0.1, 5) * 31557600
+        made.append(Snapshot('http://erddap/tabledap/dataset_' + str(i), {
+            'get_dsg_type': DSG_TYPES[i % len(DSG_TYPES)], 'get_dsg_info': (None, {}),
+            'get_times': (None, None, start, end),
+            'get_variables': (variables, {v: n.replace('_', ' ') for v, n in zip(variables, names)}, {},
+                              dict(zip(variables, names)), {}),
+            'get_title': 'Synthetic data set ' + str(i), 'get_time_variable': 'time', 'get_platform_variable': None}))
+    return made
+
+
+def scan(snapshots, standard_name, dsg_type, start, end):
+    # The query answered by looking at every data set, as without a catalog
+    return sorted(s.url for s in snapshots if s.values['get_dsg_type'] == dsg_type and
+                  standard_name in s.values['get_variables'][3].values() and
+                  s.values['get_times'][2] <= end and s.values['get_times'][3] >= start)
+
+
+def main():
+    query = ('sea_water_temperature', 'timeseries', 1420070400.0, 1451606399.0)
+    print('%10s %10s %10s %10s %12s %10s %8s' % ('datasets', 'build s', 'save s', 'load s', 'search ms', 'scan ms',
+                                                'found'))
+    for n_datasets in (100, 1000, 5000):
+        made = snapshots(n_datasets)
+        begin = time.perf_counter()
+        catalog = Catalog.build(made)
+        build = time.perf_counter() - begin
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.snap')
+            begin = time.perf_counter()
+            catalog.save(path)
+            save = time.perf_counter() - begin
+            begin = time.perf_counter()
+            Catalog.load(path)
+            load = time.perf_counter() - begin
+        catalog.search(start=query[2], end=query[3])
+        begin = time.perf_counter()
+        found = catalog.search(standard_name=query[0], dsg_type=query[1], start=query[2], end=query[3])
+        search = time.perf_counter() - begin
+        begin = time.perf_counter()
+        assert scan(made, *query) == found
+        scanned = time.perf_counter() - begin
+        print('%10d %10.3f %10.3f %10.3f %12.3f %10.3f %8d' % (n_datasets, build, save, load, search * 1000,
+                                                               scanned * 1000, len(found)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Time and output size of decimating plug_gaps output with minmax and lttb, in memory and from streamed chunks.
+
+    PYTHONPATH=. python bench/bench_decimate.py
+"""
+import time
+
+import synthetic
+from sdig.erddap.decimate import Decimator
+from sdig.erddap.decimate import decimate
+from sdig.erddap.gaps import plug_gaps
+
+
+def main():
+    print('%10s %8s %8s %10s %12s %12s' % ('rows', 'method', 'n_out', 'kept', 'in memory s', 'streamed s'))
+    for n_platforms, n_times in ((10, 100000), (20, 250000), (50, 100000)):
+        df = plug_gaps(synthetic.timeseries(n_platforms, n_times, gap_every=5000), 'time', 'station_id',
+                       ['station_id'], 3)
+        start, end = df['time'].min(), df['time'].max()
+        chunks = [chunk for day, chunk in df.groupby(df['time'].dt.dayofyear // 30)]
+        for method in ('minmax', 'lttb'):
+            n_out = 1500
+            begin = time.perf_counter()
+            out = decimate(df, 'time', 'station_id', 'SST', n_out, method)
+            in_memory = time.perf_counter() - begin
+            begin = time.perf_counter()
+            decimator = Decimator('time', 'station_id', 'SST', start, end, n_out, method)
+            for chunk in chunks:
+                decimator.update(chunk)
+            decimator.result()
+            streamed = time.perf_counter() - begin
+            print('%10d %8s %8d %10d %12.3f %12.3f' % (len(df), method, n_out, len(out), in_memory, streamed))
+
+
+if __name__ == '__main__':
+    main()
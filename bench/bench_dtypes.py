@@ -0,0 +1,48 @@
+"""
+Decode time, peak memory while decoding and memory held by the result of multi-platform csv and nc responses,
+read as pandas infers them and with a DtypePlan. Without a plan the csv times stay strings, with one they are
+decoded to datetime64 too.
+
+    PYTHONPATH=.:test/sdig/erddap python bench/bench_dtypes.py
+"""
+import time
+import tracemalloc
+
+import synthetic
+from sdig.erddap import formats
+from sdig.erddap.dtypes import DtypePlan
+
+import standin
+
+PLAN = DtypePlan({'station_id': 'category', 'latitude': 'float32', 'longitude': 'float32', 'SST': 'float32'},
+                 ['time'])
+
+
+def measure(body, file_type, plan):
+    # Timed without tracemalloc, which slows allocation down, then decoded again for the peak
+    start = time.perf_counter()
+    df = formats.read(body, file_type, plan=plan)
+    elapsed = time.perf_counter() - start
+    held = df.memory_usage(deep=True).sum()
+    del df
+    tracemalloc.start()
+    formats.read(body, file_type, plan=plan)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, held
+
+
+def main():
+    print('%10s %6s %8s %10s %12s %12s' % ('rows', 'type', 'plan', 'decode s', 'peak MB', 'held MB'))
+    for n_platforms, n_times in ((10, 10000), (100, 10000), (100, 50000)):
+        df = synthetic.timeseries(n_platforms, n_times)
+        df['time'] = df['time'].dt.tz_localize('UTC')
+        for file_type, body in (('csv', standin.encode_csv(df)), ('nc', standin.encode_nc(df))):
+            for plan in (None, PLAN):
+                elapsed, peak, held = measure(body, file_type, plan)
+                print('%10d %6s %8s %10.3f %12.1f %12.1f' % (len(df), file_type, 'no' if plan is None else 'yes',
+                                                           elapsed, peak / 1e6, held / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Parse time and peak memory of each tabledap response type for the same rows, using fixture files written the
+way ERDDAP writes them.
+
+    PYTHONPATH=.:test/sdig/erddap python bench/bench_formats.py
+"""
+import io
+import time
+import tracemalloc
+
+import synthetic
+from sdig.erddap import formats
+
+import standin
+
+
+def fixture(df, file_type):
+    if file_type == 'csv':
+        return standin.encode_csv(df)
+    if file_type == 'nc':
+        return standin.encode_nc(df)
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def measure(body, file_type):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = formats.read(body, file_type)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def main():
+    file_types = [file_type for file_type in formats.FILE_TYPES if formats.available(file_type)]
+    print('%10s %8s %10s %10s %12s' % ('rows', 'format', 'body MB', 'parse s', 'peak MB'))
+    for n_platforms, n_times in ((10, 10000), (20, 50000), (50, 100000)):
+        df = synthetic.timeseries(n_platforms, n_times)
+        for file_type in file_types:
+            body = fixture(df, file_type)
+            out, elapsed, peak = measure(body, file_type)
+            assert len(out) == len(df)
+            print('%10d %8s %10.1f %10.3f %12.1f' % (len(df), file_type, len(body) / 1e6, elapsed, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Bytes transferred and time to read one time step of a global 0.1 degree grid for a 1000 x 500 pixel map: the full
+resolution array against the strided subset, and the strided subset again through a GridCache.
+
+    PYTHONPATH=.:test/sdig/erddap python bench/bench_griddap.py
+"""
+import tempfile
+import time
+
+import numpy as np
+
+from sdig.erddap import instrument
+from sdig.erddap.griddap import GridCache
+from sdig.erddap.griddap import GridInfo
+
+import standin
+
+
+def measure(read):
+    events = []
+    instrument.add_sink(events.append)
+    try:
+        start = time.perf_counter()
+        grid = read()
+        elapsed = time.perf_counter() - start
+    finally:
+        instrument.remove_sink(events.append)
+    return elapsed, sum(event['bytes'] for event in events), grid.shape
+
+
+def main():
+    axes = {'time': np.array(['2020-01-01', '2020-01-02', '2020-01-03'], dtype='datetime64[s]'),
+            'latitude': np.linspace(-89.95, 89.95, 1800), 'longitude': np.linspace(-179.95, 179.95, 3600)}
+    rng = np.random.default_rng(0)
+    sst = rng.normal(15, 5, (3, 1800, 3600)).astype(np.float32)
+    bounds = {'time': '2020-01-01'}
+    view = {'latitude': 500, 'longitude': 1000}
+    with standin.StandInServer({'sst': standin.grid_index_csv(axes, {'sst': sst})},
+                               grids={'sst': (axes, {'sst': sst})}) as server:
+        info = GridInfo(server.url + '/griddap/sst')
+        info.get_axes()
+        with tempfile.TemporaryDirectory() as directory:
+            cache = GridCache(directory)
+            reads = [
+                ('full resolution', lambda: info.get_grid(['sst'], bounds)),
+                ('strided', lambda: info.get_grid(['sst'], bounds, view)),
+                ('strided, cache miss', lambda: info.get_grid(['sst'], bounds, view, cache=cache)),
+                ('strided, cache hit', lambda: info.get_grid(['sst'], bounds, view, cache=cache)),
+            ]
+            print('%22s %10s %10s %16s' % ('read', 'seconds', 'MB', 'shape'))
+            for name, read in reads:
+                elapsed, received, shape = measure(read)
+                print('%22s %10.3f %10.2f %16s' % (name, elapsed, received / 1e6, 'x'.join(map(str, shape))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares the boolean-mask lookups Info used to do on info_df with the indexed Metadata lookups.
+
+    PYTHONPATH=. python bench/bench_metadata.py
+"""
+import io
+import timeit
+
+import pandas as pd
+
+import synthetic
+from sdig.erddap.metadata import Metadata
+
+
+def masked(info_df):
+    df = info_df
+    dsg_type = list(df.loc[(df['Row Type'] == 'attribute') & (df['Variable Name'] == 'NC_GLOBAL') & (
+            df['Attribute Name'] == 'cdm_data_type')]['Value'].unique())[0]
+    ids = [list(df.loc[(df['Row Type'] == 'attribute') & (df['Value'] == role) & (
+            df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
+           for role in ('profile_id', 'timeseries_id')]
+    start = df.loc[(df['Row Type'] == 'attribute') & (df['Attribute Name'] == 'time_coverage_start') & (
+            df['Variable Name'] == 'NC_GLOBAL')]['Value'].to_list()[0]
+    title = list(df.loc[(df['Row Type'] == 'attribute') & (df['Variable Name'] == 'NC_GLOBAL') & (
+            df['Attribute Name'] == 'title')]['Value'].unique())[0]
+    variables = list(df.loc[(df['Row Type'] == 'attribute') & (df['Variable Name'] != 'NC_GLOBAL')][
+        'Variable Name'].unique())
+    unit_df = df.loc[(df['Row Type'] == 'attribute') & (df['Attribute Name'] == 'units')]
+    units = dict(zip(unit_df['Variable Name'], unit_df['Value']))
+    return dsg_type, ids, start, title, variables, units
+
+
+def indexed(metadata):
+    dsg_type = metadata.attribute('NC_GLOBAL', 'cdm_data_type')
+    ids = [metadata.variables_with('cf_role', role)[0] for role in ('profile_id', 'timeseries_id')]
+    start = metadata.attribute('NC_GLOBAL', 'time_coverage_start')
+    title = metadata.attribute('NC_GLOBAL', 'title')
+    variables = list(metadata.variables)
+    units = {v: values[-1] for v, values in metadata.attribute_values('units').items()}
+    return dsg_type, ids, start, title, variables, units
+
+
+def main():
+    print('%10s %12s %12s %12s %9s' % ('variables', 'masked ms', 'build ms', 'indexed ms', 'speedup'))
+    for n in (10, 100, 1000, 5000):
+        info_df = pd.read_csv(io.StringIO(synthetic.index_csv(n)))
+        metadata = Metadata.from_dataframe(info_df)
+        assert masked(info_df) == indexed(metadata)
+        repeat = 20
+        t_masked = timeit.timeit(lambda: masked(info_df), number=repeat) / repeat * 1000
+        t_build = timeit.timeit(lambda: Metadata.from_dataframe(info_df), number=repeat) / repeat * 1000
+        t_indexed = timeit.timeit(lambda: indexed(metadata), number=repeat) / repeat * 1000
+        print('%10d %12.3f %12.3f %12.3f %8.0fx' % (n, t_masked, t_build, t_indexed, t_masked / t_indexed))
+
+
+if __name__ == '__main__':
+    main()
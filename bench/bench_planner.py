@@ -0,0 +1,52 @@
+"""
+Bytes transferred, rows and time to read an overview of a year of data for many platforms: all of the rows with
+get_data against server-side reductions with get_reduced at 1000 points per platform. The reduction grows with the
+number of samples each point stands for.
+
+    PYTHONPATH=.:test/sdig/erddap python bench/bench_planner.py
+"""
+import time
+
+import pandas as pd
+
+import synthetic
+from sdig.erddap import instrument
+from sdig.erddap.info import Info
+
+from standin import StandInServer
+
+
+def measure(read):
+    events = []
+    instrument.add_sink(events.append)
+    try:
+        start = time.perf_counter()
+        df = read()
+        elapsed = time.perf_counter() - start
+    finally:
+        instrument.remove_sink(events.append)
+    return elapsed, sum(event['bytes'] for event in events), len(df)
+
+
+def main():
+    print('%10s %6s %10s %10s %12s %10s' % ('platforms', 'freq', 'read', 'seconds', 'MB', 'rows'))
+    for n_platforms, freq in ((10, '1h'), (50, '1h'), (10, '10min')):
+        n_times = int(pd.Timedelta('365D') / pd.Timedelta(freq))
+        index_csv = synthetic.index_csv(1, 'TimeSeries', '2019-01-01T00:00:00Z', '2019-12-31T23:00:00Z')
+        df = synthetic.profiles(n_platforms, n_times, n_depths=1, freq=freq)
+        with StandInServer({'overview': index_csv}, {'overview': df}) as server:
+            info = Info(server.url + '/tabledap/overview')
+            platforms = sorted(df['platform'].unique().tolist())
+            variables = ['platform', 'time', 'var_0']
+            reads = {
+                'get_data': lambda: pd.concat(info.get_data(variables, platforms=platforms)),
+                'mean': lambda: info.get_reduced(['var_0'], platforms=platforms, n_out=1000),
+                'minmax': lambda: info.get_reduced(['var_0'], platforms=platforms, n_out=1000, method='minmax'),
+            }
+            for name, read in reads.items():
+                elapsed, received, rows = measure(read)
+                print('%10d %6s %10s %10.3f %12.2f %10d' % (n_platforms, freq, name, elapsed, received / 1e6, rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the per-platform, per-gap loop Info.plug_gaps used to run with the vectorized sdig.erddap.gaps engine.
+
+    PYTHONPATH=. python bench/bench_plug_gaps.py
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+from sdig.erddap.gaps import plug_gaps
+
+
+def loop_plug_gaps(df, time_name, id_name, keep, n_std):
+    df[time_name] = pd.to_datetime(df[time_name])
+    processed = []
+    id_values = df[id_name].unique()
+    for e_id in id_values:
+        id_df = df[df[id_name] == e_id].copy()
+        gaps = id_df[time_name].diff()[1:]
+        stats = gaps.describe()
+        factor = stats['std'] * n_std
+        if factor > stats['mean']:
+            breaks = gaps[gaps > factor]
+            after = breaks.index
+            before = breaks.index - 1
+            insert = breaks.index - .5
+            for g in range(0, len(after)):
+                b_row = df.loc[before[g]]
+                a_row = id_df.loc[after[g]]
+                row = []
+                for col in df.columns:
+                    if col == time_name:
+                        row.append(b_row[time_name] + (a_row[time_name] - b_row[time_name]) / 2.0)
+                    elif col in keep:
+                        row.append(a_row[col])
+                    else:
+                        row.append(np.nan)
+                id_df.loc[insert[g]] = row
+            id_df.sort_index(inplace=True)
+            id_df.reset_index(inplace=True, drop=True)
+        processed.append(id_df)
+    df = pd.concat(processed)
+    df = df.reset_index(drop=True)
+    return df
+
+
+def timed(function, df):
+    start = time.perf_counter()
+    out = function(df.copy(), 'time', 'station_id', ['latitude', 'longitude', 'station_id'], 2)
+    return out, time.perf_counter() - start
+
+
+def main():
+    print('%10s %10s %8s %12s %14s' % ('platforms', 'rows', 'gaps', 'loop s', 'vectorized s'))
+    for n_platforms, n_times in ((5, 2000), (20, 10000), (100, 10000), (300, 50000)):
+        df = synthetic.timeseries(n_platforms, n_times, gap_every=1000)
+        vectorized, t_vectorized = timed(plug_gaps, df)
+        n_gaps = len(vectorized) - len(df)
+        if len(df) <= 200000:
+            loop, t_loop = timed(loop_plug_gaps, df)
+            pd.testing.assert_frame_equal(loop, vectorized, check_dtype=False)
+            t_loop = '%12.3f' % t_loop
+        else:
+            t_loop = '%12s' % 'skipped'
+        print('%10d %10d %8d %s %14.3f' % (n_platforms, len(df), n_gaps, t_loop, t_vectorized))
+
+
+if __name__ == '__main__':
+    main()
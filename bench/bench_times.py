@@ -0,0 +1,36 @@
+"""
+Time to turn ERDDAP time strings into datetime64 with pandas.to_datetime, as plug_gaps used to, and with
+formats.to_datetimes, and to decode a whole csv response with parse_times and an nc response.
+
+    PYTHONPATH=.:test/sdig/erddap python bench/bench_times.py
+"""
+import time
+
+import pandas as pd
+
+import synthetic
+from sdig.erddap import formats
+
+import standin
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    print('%10s %16s %14s %12s %12s' % ('rows', 'pd.to_datetime s', 'to_datetimes s', 'csv s', 'nc s'))
+    for n_times in (10000, 100000, 1000000):
+        df = synthetic.timeseries(1, n_times)[['station_id', 'time', 'SST']]
+        strings = df['time'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+        csv = standin.encode_csv(df)
+        nc = standin.encode_nc(df)
+        print('%10d %16.3f %14.3f %12.3f %12.3f' % (
+            n_times, timed(lambda: pd.to_datetime(strings)), timed(lambda: formats.to_datetimes(strings)),
+            timed(lambda: formats.read(csv, 'csv', parse_times=True)), timed(lambda: formats.read(nc, 'nc'))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Compares calling zoom_center once per platform with the batched sdig.util.zc.zoom_centers and with feeding
+sdig.util.zc.Bounds one chunk at a time.
+
+    PYTHONPATH=. python bench/bench_zoom_center.py
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from sdig.util.zc import Bounds
+from sdig.util.zc import frame_zoom_centers
+from sdig.util.zc import zoom_center
+
+
+def positions(n_platforms, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, n_platforms, n_rows)
+    return pd.DataFrame({'trajectory': ids.astype(str),
+                         'longitude': rng.uniform(-180, 180, n_platforms)[ids] + rng.normal(0, 2, n_rows),
+                         'latitude': rng.uniform(-60, 60, n_platforms)[ids] + rng.normal(0, 1, n_rows)})
+
+
+def main():
+    for n_platforms, n_rows in ((10, 100000), (200, 1000000), (2000, 4000000)):
+        df = positions(n_platforms, n_rows)
+        start = time.perf_counter()
+        loop = {p: zoom_center(tuple(g['longitude']), tuple(g['latitude'])) for p, g in df.groupby('trajectory')}
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        batched = frame_zoom_centers(df, 'trajectory')
+        batched_time = time.perf_counter() - start
+        start = time.perf_counter()
+        extent = Bounds()
+        for chunk_start in range(0, n_rows, 100000):
+            extent.update_frame(df.iloc[chunk_start:chunk_start + 100000], 'trajectory')
+        streamed = extent.zoom_centers()
+        streamed_time = time.perf_counter() - start
+        assert all(batched.loc[p, 'zoom'] == z and batched.loc[p, 'lon'] == c['lon'] for p, (z, c) in loop.items())
+        assert streamed.sort_index().equals(batched.sort_index())
+        print(f'{n_platforms:5d} platforms {n_rows:8d} rows  loop {loop_time:7.3f}s  batched {batched_time:7.3f}s '
+              f'({loop_time / batched_time:5.1f}x)  streamed {streamed_time:7.3f}s')
+
+
+if __name__ == '__main__':
+    main()
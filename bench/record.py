@@ -0,0 +1,37 @@
+"""
+Records the index.csv and, optionally, some data of a live ERDDAP data set into bench/data so bench/suite.py
+can replay them without network access.
+
+    PYTHONPATH=. python bench/record.py https://data.pmel.noaa.gov/pmel/erddap/tabledap/CGBN_Canada
+    PYTHONPATH=. python bench/record.py https://data.pmel.noaa.gov/pmel/erddap/tabledap/CGBN_Canada --data 'ID,time,latitude,longitude,QS' --constraint 'time>=1993-08-19'
+"""
+import argparse
+import os
+
+from sdig.erddap import fetch
+from sdig.erddap import query
+from sdig.erddap.info import Info
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_url')
+    parser.add_argument('--data', help='comma separated variables of the data to record, no data if not given')
+    parser.add_argument('--constraint', action='append', default=[], help='an ERDDAP constraint on the data')
+    args = parser.parse_args()
+
+    data_url = args.data_url[:-len('.html')] if args.data_url.endswith('.html') else args.data_url
+    dataset_id = data_url.rstrip('/').split('/')[-1]
+    os.makedirs(DATA, exist_ok=True)
+    with open(os.path.join(DATA, dataset_id + '_index.csv'), 'wb') as f:
+        f.write(fetch.get(Info.get_info_url(data_url)))
+    if args.data:
+        url = query.tabledap_url(data_url, args.data.split(','), args.constraint)
+        with open(os.path.join(DATA, dataset_id + '.csv'), 'wb') as f:
+            f.write(fetch.get(url))
+
+
+if __name__ == '__main__':
+    main()
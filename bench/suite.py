@@ -0,0 +1,225 @@
+"""
+Times Info construction, every getter, get_depths, a platform read, plug_gaps and zoom_center against a local
+stand-in ERDDAP, at several scales, without network access. Each run is appended to a history file and compared
+with the run before it, and operations that got slower by more than the threshold are reported as regressions.
+
+    PYTHONPATH=.:test/sdig/erddap python bench/suite.py                # the recorded data sets, small and medium scales
+    PYTHONPATH=.:test/sdig/erddap python bench/suite.py --scale large  # thousands of variables, millions of rows
+    PYTHONPATH=.:test/sdig/erddap python bench/suite.py --fail         # exit with status 1 if anything regressed
+
+The stand-in ERDDAP is the one the tests use, test/sdig/erddap/standin.py, which is not part of the sdig package.
+
+The recorded data sets are the info/<id>/index.csv responses saved as bench/data/<id>_index.csv, with the data
+saved as bench/data/<id>.csv if it was recorded too, see bench/record.py.
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+from sdig.erddap import formats
+from sdig.erddap.cache import MemoryCache
+from sdig.erddap.gaps import GapPlugger
+from sdig.erddap.info import Info
+from sdig.util.zc import frame_zoom_centers
+from sdig.util.zc import zoom_center
+
+from standin import StandInServer
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(BENCH, 'data')
+HISTORY = os.path.join(BENCH, 'results', 'history.jsonl')
+
+# n_variables in index.csv, then platforms, profiles per platform and depths per profile of the data
+SCALES = {
+    'small': (50, 10, 1000, 3),
+    'medium': (1000, 100, 2000, 5),
+    'large': (5000, 500, 2000, 5),
+}
+GETTERS = ('get_dsg_type', 'get_dsg_info', 'get_times', 'get_variables', 'get_title', 'get_time_variable',
+           'get_platform_variable')
+
+
+def measure(function, repeat, setup=None):
+    # The min and median wall time of repeat calls, with setup run untimed before each call.
+    times = []
+    for i in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        if setup is not None:
+            function(argument)
+        else:
+            function()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times)}
+
+
+def recorded():
+    # (dataset id, index.csv text, data or None) for each recorded data set
+    sets = []
+    for path in sorted(glob.glob(os.path.join(DATA, '*_index.csv'))):
+        dataset_id = os.path.basename(path)[:-len('_index.csv')]
+        with open(path) as f:
+            index_csv = f.read()
+        data = None
+        data_path = os.path.join(DATA, dataset_id + '.csv')
+        if os.path.exists(data_path):
+            with open(data_path, 'rb') as f:
+                data = formats.read_csv(f.read())
+            for name in data.columns:
+                if name == 'time' or name.endswith('_time'):
+                    data[name] = pd.to_datetime(data[name], utc=True, format='ISO8601')
+        sets.append((dataset_id, index_csv, data))
+    return sets
+
+
+def synthesize(scale):
+    n_variables, n_platforms, n_times, n_depths = SCALES[scale]
+    data = synthetic.profiles(n_platforms, n_times, n_depths)
+    start = data['time'].min().strftime('%Y-%m-%dT%H:%M:%SZ')
+    end = data['time'].max().strftime('%Y-%m-%dT%H:%M:%SZ')
+    return synthetic.index_csv(n_variables, start=start, end=end), data
+
+
+def bench_info(server, dataset_id, repeat, results, prefix):
+    url = server.url + '/tabledap/' + dataset_id
+    results[prefix + 'Info()'] = measure(lambda: Info(url), repeat)
+    cache = MemoryCache(ttl=3600)
+    Info(url, cache=cache)
+    for getter in GETTERS:
+        results[prefix + getter] = measure(lambda info: getattr(info, getter)(), repeat,
+                                           lambda: Info(url, cache=cache))
+    return Info(url, cache=cache)
+
+
+def bench_data(info, data, repeat, results, prefix):
+    depth_name, dsg_id = info.get_dsg_info()
+    if depth_name is not None and depth_name in data.columns:
+        results[prefix + 'get_depths'] = measure(info.get_depths, repeat)
+    platform_name = info.get_platform_variable()
+    time_name = info.get_time_variable()
+    if platform_name in data.columns and time_name in data.columns:
+        platforms = sorted(data[platform_name].astype(str).unique().tolist())[:3]
+        start = data[time_name].min()
+        end = start + (data[time_name].max() - start) / 10
+        variables = [platform_name, time_name] + [c for c in data.columns if c not in (platform_name, time_name)][:3]
+        results[prefix + 'get_data(3 platforms)'] = measure(
+            lambda: pd.concat(list(info.get_data(variables, start, end, platforms=platforms))), repeat)
+    if 'latitude' in data.columns and 'longitude' in data.columns and platform_name in data.columns:
+        groups = {p: (tuple(g['longitude']), tuple(g['latitude'])) for p, g in data.groupby(platform_name)}
+        results[prefix + 'zoom_center(per platform)'] = measure(
+            lambda: [zoom_center(lons, lats) for lons, lats in groups.values()], repeat)
+        results[prefix + 'zoom_centers(batched)'] = measure(lambda: frame_zoom_centers(data, platform_name), repeat)
+
+
+def bench_plug_gaps(scale, repeat, results):
+    n_variables, n_platforms, n_times, n_depths = SCALES[scale]
+    df = synthetic.timeseries(n_platforms, n_times * n_depths, gap_every=500)
+    results[scale + '/plug_gaps'] = measure(lambda copy: Info.plug_gaps(copy, 'time', 'station_id', [], 3), repeat,
+                                            df.copy)
+    chunks = [chunk.reset_index(drop=True) for _, chunk in df.groupby(np.arange(len(df)) * 10 // len(df))]
+
+    def stream(chunks):
+        plugger = GapPlugger('time', 'station_id', [], 3)
+        for chunk in chunks:
+            plugger.plug(chunk)
+    results[scale + '/GapPlugger(10 chunks)'] = measure(stream, repeat, lambda: [chunk.copy() for chunk in chunks])
+
+
+def run(scales, repeat):
+    results = {}
+    datasets = {}
+    data = {}
+    for dataset_id, index_csv, rows in recorded():
+        datasets[dataset_id] = index_csv
+        if rows is not None:
+            data[dataset_id] = rows
+    for scale in scales:
+        datasets[scale], data[scale] = synthesize(scale)
+    with StandInServer(datasets, data) as server:
+        for dataset_id in datasets:
+            prefix = dataset_id + '/'
+            info = bench_info(server, dataset_id, repeat, results, prefix)
+            if dataset_id in data:
+                bench_data(info, data[dataset_id], repeat, results, prefix)
+    for scale in scales:
+        bench_plug_gaps(scale, repeat, results)
+    return results
+
+
+def previous_run(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def compare(results, previous, threshold):
+    # The table of this run against the previous one and the names of the operations that regressed.
+    regressions = []
+    lines = ['%-45s %12s %12s %8s' % ('operation', 'median ms', 'before ms', 'change')]
+    before = previous['results'] if previous is not None else {}
+    for name, timing in results.items():
+        median = timing['median']
+        if name in before:
+            change = median / before[name]['median'] - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append(name)
+            lines.append('%-45s %12.3f %12.3f %+7.0f%%%s' % (name, median * 1000, before[name]['median'] * 1000,
+                                                            change * 100, flag))
+        else:
+            lines.append('%-45s %12.3f %12s %8s' % (name, median * 1000, '', ''))
+    return '\n'.join(lines), regressions
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BENCH).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', action='append', choices=sorted(SCALES), help='default: small and medium')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--history', default=HISTORY, help='the JSON lines file runs are appended to')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='the fractional slow down of the median reported as a regression')
+    parser.add_argument('--no-save', action='store_true', help='compare with the last run but do not record this one')
+    parser.add_argument('--fail', action='store_true', help='exit with status 1 if anything regressed')
+    args = parser.parse_args()
+
+    results = run(args.scale or ['small', 'medium'], args.repeat)
+    table, regressions = compare(results, previous_run(args.history), args.threshold)
+    print(table)
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        entry = {'when': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                 'commit': commit(), 'python': platform.python_version(), 'pandas': pd.__version__,
+                 'numpy': np.__version__, 'repeat': args.repeat, 'results': results}
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    if regressions:
+        print('\n' + str(len(regressions)) + ' regression(s) over ' + format(args.threshold, '.0%') + ': ' +
+              ', '.join(regressions))
+        if args.fail:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Synthetic ERDDAP responses for the benchmarks.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+
+def index_csv(n_variables, dsg_type='TimeSeriesProfile', start='2010-01-01T00:00:00Z', end='2020-12-31T23:00:00Z'):
+    """
+    Returns the text of an info index.csv with n_variables data variables on top of the id, time,
+    latitude, longitude and depth variables a DSG data set of dsg_type needs.
+    """
+    rows = [
+        ('attribute', 'NC_GLOBAL', 'cdm_data_type', 'String', dsg_type),
+        ('attribute', 'NC_GLOBAL', 'cdm_altitude_proxy', 'String', 'depth'),
+        ('attribute', 'NC_GLOBAL', 'time_coverage_start', 'String', start),
+        ('attribute', 'NC_GLOBAL', 'time_coverage_end', 'String', end),
+        ('attribute', 'NC_GLOBAL', 'title', 'String', 'Synthetic ' + dsg_type + ' with ' + str(n_variables) + ' variables'),
+    ]
+    for name, role in (('platform', 'timeseries_id'), ('trajectory', 'trajectory_id'), ('profile', 'profile_id')):
+        rows.append(('variable', name, '', 'String', ''))
+        rows.append(('attribute', name, 'cf_role', 'String', role))
+        rows.append(('attribute', name, 'long_name', 'String', name + ' id'))
+    for name, data_type, units in (('time', 'double', 'seconds since 1970-01-01T00:00:00Z'),
+                                   ('latitude', 'float', 'degrees_north'), ('longitude', 'float', 'degrees_east'),
+                                   ('depth', 'float', 'm')):
+        rows.append(('variable', name, '', data_type, ''))
+        rows.append(('attribute', name, 'long_name', 'String', name))
+        rows.append(('attribute', name, 'standard_name', 'String', name))
+        rows.append(('attribute', name, 'units', 'String', units))
+    rows.append(('attribute', 'depth', 'positive', 'String', 'down'))
+    for i in range(n_variables):
+        name = 'var_' + str(i)
+        rows.append(('variable', name, '', 'float', ''))
+        rows.append(('attribute', name, 'actual_range', 'float', '0.0, 1.0'))
+        rows.append(('attribute', name, 'ioos_category', 'String', 'Other'))
+        rows.append(('attribute', name, 'long_name', 'String', 'variable number ' + str(i)))
+        rows.append(('attribute', name, 'standard_name', 'String', 'sea_water_property_' + str(i)))
+        rows.append(('attribute', name, 'units', 'String', '1'))
+    df = pd.DataFrame(rows, columns=['Row Type', 'Variable Name', 'Attribute Name', 'Data Type', 'Value'])
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def timeseries(n_platforms, n_times, freq='1min', gap_every=None, seed=0):
+    """
+    Returns a DataFrame of n_platforms regularly sampled time series with n_times rows each, sorted by platform
+    then time. If gap_every is given a gap of 60 samples is cut out of every gap_every samples.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2019-01-01', periods=n_times, freq=freq)
+    if gap_every is not None:
+        keep = (np.arange(n_times) % gap_every) >= 60
+        keep[0] = True
+        times = times[keep]
+    n = len(times)
+    frames = []
+    for p in range(n_platforms):
+        frames.append(pd.DataFrame({
+            'station_id': 'M' + str(p),
+            'time': times,
+            'latitude': 50.0 + p * 0.01,
+            'longitude': -150.0 + p * 0.01,
+            'SST': rng.normal(10.0, 1.0, n),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def profiles(n_platforms, n_times, n_depths=3, n_variables=1, freq='10min', gap_every=None, seed=0):
+    """
+    Returns the rows of a TimeSeriesProfile data set described by index_csv: n_platforms platforms, each with
+    n_times profiles of n_depths depths, and the first n_variables data variables. If gap_every is given a gap of
+    60 profiles is cut out of every gap_every profiles.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2019-01-01T00:00:00Z', periods=n_times, freq=freq)
+    if gap_every is not None:
+        keep = (np.arange(n_times) % gap_every) >= 60
+        keep[0] = True
+        times = times[keep]
+    depths = np.arange(n_depths, dtype=float) * 10.0
+    n = len(times) * n_depths
+    platform = np.repeat(np.arange(n_platforms), n)
+    profile = np.repeat(np.arange(n_platforms * len(times)), n_depths)
+    columns = {
+        'platform': pd.Series(np.char.add('P', platform.astype(str))),
+        'profile': pd.Series(np.char.add('C', profile.astype(str))),
+        'time': np.tile(np.repeat(times, n_depths), n_platforms),
+        'latitude': (rng.uniform(-60, 60, n_platforms)[platform] + rng.normal(0, 0.5, len(platform))).astype(np.float32),
+        'longitude': (rng.uniform(-180, 180, n_platforms)[platform] + rng.normal(0, 0.5, len(platform))).astype(np.float32),
+        'depth': np.tile(depths, n_platforms * len(times)).astype(np.float32),
+    }
+    for i in range(n_variables):
+        columns['var_' + str(i)] = rng.random(len(platform)).astype(np.float32)
+    return pd.DataFrame(columns)
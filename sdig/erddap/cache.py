@@ -0,0 +1,230 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+from sdig.erddap import fetch
+from sdig.erddap import instrument
+
+
+class MemoryCache:
+    """
+    An in-process cache of HTTP responses with a time to live and least-recently-used eviction. Entries
+    older than the TTL are revalidated with the server using the ETag and Last-Modified validators from
+    the original response, so an unchanged resource costs a 304 instead of a full download.
+
+        Parameters:
+                :param: ttl: seconds an entry is served without asking the server, None means forever
+                :type: float
+                :param: max_entries: the number of entries kept before the least recently used is evicted
+                :type: int
+    """
+    def __init__(self, ttl=3600, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._entries = collections.OrderedDict()
+
+    def fetch(self, url):
+        """
+        Returns the body for url from the cache if it is fresh, after a conditional request if it is stale
+        or after a full download if it is not in the cache.
+
+            Parameters:
+                    :param: url: the URL to read
+                    :type: str
+            Returns:
+                    :returns: body: the response body
+                    :rtype: bytes
+        """
+        body, headers = self.lookup(url)
+        if body is not None:
+            return body
+        status, body, response_headers = fetch.request(url, headers=headers)
+        cached = self.update(url, status, body, response_headers)
+        if cached is None:
+            # The entry went away while the server was revalidating it, read it again in full
+            status, body, response_headers = fetch.request(url)
+            cached = self.update(url, status, body, response_headers)
+        return cached
+
+    def lookup(self, url):
+        """
+        The first half of fetch, for callers that make the request themselves: returns the cached body if it is
+        fresh, otherwise None and the conditional request headers to send.
+
+            Parameters:
+                    :param: url: the URL to read
+                    :type: str
+            Returns:
+                    :returns: body: the fresh cached body or None
+                    :rtype: bytes
+                    :returns: headers: If-None-Match and If-Modified-Since headers for a stale entry
+                    :rtype: dict
+        """
+        with self._lock:
+            entry = self._load(url)
+            if entry is not None and self._is_fresh(entry):
+                self.hits += 1
+                _record('hit')
+                return entry['body'], {}
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return None, headers
+
+    def update(self, url, status, body, response_headers):
+        """
+        The second half of fetch: stores the response to the request made after lookup and returns the body, the
+        cached one if the server answered 304 Not Modified. Returns None for a 304 when the entry was evicted or
+        removed after lookup, the request has to be made again without the conditional headers.
+        """
+        with self._lock:
+            if status == 304:
+                entry = self._load(url)
+                if entry is None:
+                    return None
+                self.revalidations += 1
+                _record('revalidated')
+                entry['stored'] = time.time()
+                self._store(url, entry)
+                return entry['body']
+            self.misses += 1
+            _record('miss')
+            entry = {
+                'body': body,
+                'etag': fetch.header(response_headers, 'ETag'),
+                'last_modified': fetch.header(response_headers, 'Last-Modified'),
+                'stored': time.time(),
+            }
+            self._store(url, entry)
+        return body
+
+    def stats(self):
+        """
+        Returns the hit, miss, revalidation and eviction counters along with the number of entries held.
+
+            Returns:
+                    :returns: stats: the counters keyed by name
+                    :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidations': self.revalidations,
+                    'evictions': self.evictions, 'entries': len(self)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _is_fresh(self, entry):
+        return self.ttl is None or time.time() - entry['stored'] < self.ttl
+
+    def _load(self, url):
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def _store(self, url, entry):
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class DiskCache(MemoryCache):
+    """
+    A MemoryCache that keeps its entries as files in a local directory so they survive restarts and can be
+    shared by several processes. The access time of an entry is kept in the modification time of its
+    metadata file, which is what the LRU eviction sorts on.
+
+        Parameters:
+                :param: directory: where to keep the cache files, created if it does not exist
+                :type: str
+                :param: ttl: seconds an entry is served without asking the server, None means forever
+                :type: float
+                :param: max_entries: the number of entries kept before the least recently used is evicted
+                :type: int
+    """
+    def __init__(self, directory, ttl=3600, max_entries=1024):
+        super().__init__(ttl=ttl, max_entries=max_entries)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith('.meta') or name.endswith('.body'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def __len__(self):
+        return len([name for name in os.listdir(self.directory) if name.endswith('.meta')])
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.meta'), os.path.join(self.directory, key + '.body')
+
+    def _load(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+            with open(body_path, 'rb') as f:
+                entry['body'] = f.read()
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def _store(self, url, entry):
+        meta_path, body_path = self._paths(url)
+        meta = {k: v for k, v in entry.items() if k != 'body'}
+        meta['url'] = url
+        write_atomic(body_path, entry['body'])
+        write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        metas = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith('.meta')]
+        if len(metas) > self.max_entries:
+            metas.sort(key=os.path.getmtime)
+            for oldest in metas[:len(metas) - self.max_entries]:
+                for path in (oldest, oldest[:-len('.meta')] + '.body'):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self.evictions += 1
+
+
+def write_atomic(path, data):
+    """
+    Writes data to path so that readers see either the old file or the whole new one. The temporary file is named
+    for the process and the thread, so writers of the same path in either never share one.
+
+        Parameters:
+                :param: path: the file to write
+                :type: str
+                :param: data: the content
+                :type: bytes
+    """
+    tmp = path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _record(outcome):
+    event = instrument.current()
+    if event is not None:
+        event['cache'] = outcome
@@ -0,0 +1,250 @@
+import bisect
+import re
+
+import pandas as pd
+
+from sdig.erddap.snapshot import Snapshot
+from sdig.erddap.snapshot import SnapshotStore
+
+_WORD = re.compile('[a-z0-9]+')
+
+
+class Catalog:
+    """
+    A search index over the metadata of many data sets, so a query does not have to look at every Info. It keeps
+    an inverted index from the words of the titles, variable names, long names and standard names to the data
+    sets that use them, the data sets of each standard_name and of each DSG type, and the time coverage of the
+    data sets sorted by start and by end. A query intersects the sets that match each of its parts:
+
+        catalog = Catalog.build(infos)
+        catalog.search(standard_name='sea_water_temperature', dsg_type='timeseries', start='2015-01-01',
+                       end='2015-12-31T23:59:59Z')
+
+    The catalog is built from Info objects or snapshots of their metadata and is saved as a SnapshotStore, see
+    save and load. refresh updates it in place, only the data sets that changed are indexed again.
+    """
+    def __init__(self):
+        self._snapshots = {}
+        self._terms = {}
+        self._standard_names = {}
+        self._dsg_types = {}
+        self._coverage = {}
+        # The coverage start times in order with their data URLs, and the same for the end times, rebuilt when
+        # the coverage changes
+        self._starts = None
+        self._ends = None
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def __contains__(self, url):
+        return url in self._snapshots
+
+    def urls(self):
+        return sorted(self._snapshots)
+
+    def get(self, url, default=None):
+        """
+        Returns the snapshot of the data set with the data URL url, or default if it is not in the catalog.
+        """
+        return self._snapshots.get(url, default)
+
+    @classmethod
+    def build(cls, sources):
+        """
+        Makes a catalog of the data sets.
+
+            Parameters:
+                    :param: sources: Info objects or Snapshots of the data sets, e.g. the values from Info.load_many
+                    :type: iterable
+            Returns:
+                    :returns: catalog: the catalog
+                    :rtype: Catalog
+        """
+        catalog = cls()
+        catalog.refresh(sources)
+        return catalog
+
+    def refresh(self, sources, prune=False):
+        """
+        Brings the catalog up to date with the data sets. A data set whose metadata has not changed is left as it
+        is, one that changed is indexed again and a new one is added. Read the Infos through a cache to only fetch
+        the index.csv responses that changed on the server.
+
+            Parameters:
+                    :param: sources: Info objects or Snapshots of the data sets
+                    :type: iterable
+                    :param: prune: also remove the data sets that are not in sources
+                    :type: bool
+            Returns:
+                    :returns: changed: the data URLs that were added, changed or removed
+                    :rtype: list
+        """
+        changed = []
+        seen = set()
+        for source in sources:
+            snapshot = source if isinstance(source, Snapshot) else Snapshot.from_info(source)
+            seen.add(snapshot.url)
+            if self._snapshots.get(snapshot.url) == snapshot:
+                continue
+            self._remove(snapshot.url)
+            self._add(snapshot)
+            changed.append(snapshot.url)
+        if prune:
+            for url in [url for url in self._snapshots if url not in seen]:
+                self._remove(url)
+                changed.append(url)
+        return changed
+
+    def remove(self, url):
+        """
+        Removes a data set from the catalog, if it is there.
+        """
+        self._remove(url)
+
+    def search(self, text=None, standard_name=None, dsg_type=None, start=None, end=None):
+        """
+        Returns the data sets that match all the given parts of a query.
+
+            Parameters:
+                    :param: text: words that must all be in the title or the names of the variables, any case
+                    :type: str
+                    :param: standard_name: a standard_name a variable must have, or a list of standard_names all of
+                            which must be there
+                    :type: str
+                    :param: dsg_type: the DSG type, e.g. timeseries, any case
+                    :type: str
+                    :param: start: the data sets must have data at or after start
+                    :type: str, datetime or Unix epoch seconds
+                    :param: end: the data sets must have data at or before end
+                    :type: str, datetime or Unix epoch seconds
+            Returns:
+                    :returns: urls: the data URLs of the matching data sets, sorted
+                    :rtype: list
+        """
+        sets = []
+        if text is not None:
+            words = _words(text)
+            sets.extend(self._terms.get(word, set()) for word in words)
+        if standard_name is not None:
+            names = [standard_name] if isinstance(standard_name, str) else standard_name
+            sets.extend(self._standard_names.get(name, set()) for name in names)
+        if dsg_type is not None:
+            sets.append(self._dsg_types.get(dsg_type.lower(), set()))
+        timed = start is not None or end is not None
+        if not sets:
+            return sorted(self._covering(start, end)) if timed else self.urls()
+        sets.sort(key=len)
+        found = set(sets[0])
+        for other in sets[1:]:
+            found.intersection_update(other)
+            if not found:
+                break
+        if timed:
+            # The other parts have narrowed the data sets down, checking the coverage of each of them is quicker
+            # than taking the overlapping ones from the sorted coverage.
+            first = float('-inf') if start is None else _seconds(start)
+            last = float('inf') if end is None else _seconds(end)
+            found = [url for url in found if url in self._coverage and self._coverage[url][0] <= last and
+                     self._coverage[url][1] >= first]
+        return sorted(found)
+
+    def save(self, path):
+        """
+        Writes the catalog to path as a SnapshotStore, replacing it atomically.
+        """
+        SnapshotStore.write(path, self._snapshots.values())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a catalog written by save, or any SnapshotStore file.
+        """
+        store = SnapshotStore.open(path)
+        try:
+            return cls.build([store.get(url) for url in store.urls()])
+        finally:
+            store.close()
+
+    def _add(self, snapshot):
+        url = snapshot.url
+        values = snapshot.values
+        self._snapshots[url] = snapshot
+        variables, long_names, units, standard_names, variable_types = values['get_variables']
+        for word in _document_words(values['get_title'], variables, long_names, standard_names):
+            self._terms.setdefault(word, set()).add(url)
+        for name in set(standard_names.values()):
+            self._standard_names.setdefault(name, set()).add(url)
+        dsg_type = values['get_dsg_type']
+        if dsg_type is not None:
+            self._dsg_types.setdefault(dsg_type.lower(), set()).add(url)
+        times = values['get_times']
+        if times is not None and times[2] is not None and times[3] is not None:
+            self._coverage[url] = (times[2], times[3])
+            self._starts = None
+            self._ends = None
+
+    def _remove(self, url):
+        snapshot = self._snapshots.pop(url, None)
+        if snapshot is None:
+            return
+        values = snapshot.values
+        variables, long_names, units, standard_names, variable_types = values['get_variables']
+        for word in _document_words(values['get_title'], variables, long_names, standard_names):
+            _discard(self._terms, word, url)
+        for name in set(standard_names.values()):
+            _discard(self._standard_names, name, url)
+        if values['get_dsg_type'] is not None:
+            _discard(self._dsg_types, values['get_dsg_type'].lower(), url)
+        if self._coverage.pop(url, None) is not None:
+            self._starts = None
+            self._ends = None
+
+    def _covering(self, start, end):
+        # The data sets whose coverage overlaps [start, end]: those that start by end less those that end before
+        # start, each a prefix of the coverage sorted by start or by end.
+        if self._starts is None:
+            self._starts = _sorted_by(self._coverage, 0)
+            self._ends = _sorted_by(self._coverage, 1)
+        start_values, start_urls = self._starts
+        end_values, end_urls = self._ends
+        found = set(start_urls if end is None else start_urls[:bisect.bisect_right(start_values, _seconds(end))])
+        if start is not None:
+            found.difference_update(end_urls[:bisect.bisect_left(end_values, _seconds(start))])
+        return found
+
+
+def _sorted_by(coverage, i):
+    # The start (i=0) or end (i=1) times of the coverage in order, and the data URLs in the same order
+    pairs = sorted((times[i], url) for url, times in coverage.items())
+    return [value for value, url in pairs], [url for value, url in pairs]
+
+
+def _words(text):
+    return set(_WORD.findall(str(text).lower()))
+
+
+def _document_words(title, variables, long_names, standard_names):
+    words = _words(title)
+    for names in (variables, long_names.values(), standard_names.values()):
+        for name in names:
+            words.update(_words(name))
+    return words
+
+
+def _discard(index, key, url):
+    urls = index.get(key)
+    if urls is not None:
+        urls.discard(url)
+        if not urls:
+            del index[key]
+
+
+def _seconds(value):
+    # Unix epoch seconds of a time given as a number, a string or a datetime, UTC if it has no time zone.
+    if isinstance(value, (int, float)):
+        return float(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.timestamp()
@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import formats
+
+# Decimation methods, see decimate
+METHODS = ('minmax', 'lttb')
+
+# Buckets per output point the streaming Decimator keeps for LTTB, which runs on these candidates at the end
+_LTTB_CANDIDATES = 4
+
+
+def decimate(df, time_name, id_name, values, n_out=1000, method='minmax', start=None, end=None):
+    """
+    Reduces each platform's trace to about n_out points for plotting, e.g. the pixel width of the plot, keeping
+    its shape. Traces are broken at rows where all of the values are missing, such as the rows plug_gaps
+    inserts, no point is chosen across such a row and the first row of each run of them is kept so the plotted
+    line still breaks there.
+
+    minmax keeps the rows with the smallest and largest value in each of n_out / 2 equal time buckets, which
+    keeps every spike. lttb (Largest Triangle Three Buckets) keeps the row of each of n_out equal count buckets
+    that makes the largest triangle with its neighbours, which follows the visual shape more closely. Both keep
+    the first and last row of every unbroken part of a trace, and rows picked for any of the values are kept.
+
+        Parameters:
+                :param: df: the rows to reduce, in any order
+                :type: Dataframe
+                :param: time_name: the name of the time column
+                :type: str
+                :param: id_name: the name of the platform id column, None for a single trace
+                :type: str
+                :param: values: the name or names of the columns that are plotted
+                :type: str or list
+                :param: n_out: the number of points wanted for each platform
+                :type: int
+                :param: method: one of METHODS
+                :type: str
+                :param: start: with end, the time range the minmax buckets divide, the time range of each platform
+                if None. Use the plotted range so the buckets line up between calls.
+                :type: str or float
+                :param: end: see start
+                :type: str or float
+        Returns:
+                :returns: df: the kept rows sorted by platform and time, with a new index
+                :rtype: Dataframe
+    """
+    if method not in METHODS:
+        raise ValueError('method must be one of ' + ', '.join(METHODS))
+    if method == 'lttb':
+        return _select(df, time_name, id_name, values, lambda trace: _lttb(trace, n_out))
+    return _select(df, time_name, id_name, values, lambda trace: _minmax(trace, max(1, n_out // 2), start, end))
+
+
+class Decimator:
+    """
+    Decimates data that arrive in chunks, such as the chunks of Info.get_data, keeping only a bounded set of
+    candidate rows between chunks, so the plot can be drawn before the download is finished and memory does not
+    grow with the data. result() can be called at any time and returns what decimate would return for all the
+    rows seen so far. For minmax it is exactly decimate of all the rows with the same start and end. For lttb
+    the candidates are the minmax rows of _LTTB_CANDIDATES * n_out buckets and LTTB runs on them (MinMaxLTTB).
+
+        Parameters:
+                :param: time_name: the name of the time column
+                :type: str
+                :param: id_name: the name of the platform id column, None for a single trace
+                :type: str
+                :param: values: the name or names of the columns that are plotted
+                :type: str or list
+                :param: start: the start of the time range being read, fixes the buckets
+                :type: str or float
+                :param: end: the end of the time range being read
+                :type: str or float
+                :param: n_out: the number of points wanted for each platform
+                :type: int
+                :param: method: one of METHODS
+                :type: str
+    """
+    def __init__(self, time_name, id_name, values, start, end, n_out=1000, method='minmax'):
+        if method not in METHODS:
+            raise ValueError('method must be one of ' + ', '.join(METHODS))
+        self.time_name = time_name
+        self.id_name = id_name
+        self.values = values
+        self.start = start
+        self.end = end
+        self.n_out = n_out
+        self.method = method
+        self.rows = 0
+        self.candidates = None
+
+    def update(self, chunk):
+        """
+        Adds a chunk of rows.
+        """
+        self.rows += len(chunk)
+        frames = [chunk] if self.candidates is None else [self.candidates, chunk]
+        n_buckets = self.n_out * _LTTB_CANDIDATES if self.method == 'lttb' else max(1, self.n_out // 2)
+        self.candidates = _select(pd.concat(frames, ignore_index=True), self.time_name, self.id_name, self.values,
+                                  lambda trace: _minmax(trace, n_buckets, self.start, self.end))
+
+    def result(self):
+        """
+        Returns the decimated rows of all the chunks so far, sorted by platform and time.
+        """
+        if self.candidates is None:
+            return None
+        if self.method == 'lttb':
+            return decimate(self.candidates, self.time_name, self.id_name, self.values, self.n_out, 'lttb')
+        return self.candidates
+
+
+class _Traces:
+    # The rows of a frame sorted by platform and time, with the breaks that split them into unbroken segments.
+    def __init__(self, df, time_name, id_name, values):
+        self.numeric = pd.api.types.is_numeric_dtype(df[time_name])
+        self.t = _time_numbers(df[time_name])
+        if id_name is None:
+            codes = np.zeros(len(df), dtype=np.intp)
+        else:
+            codes = pd.factorize(df[id_name], sort=True)[0]
+        same = codes[1:] == codes[:-1]
+        if np.all(codes[1:] >= codes[:-1]) and not np.any(same & (self.t[1:] < self.t[:-1])):
+            # Already by platform and time, as plug_gaps returns it
+            order = np.arange(len(codes))
+        else:
+            order = np.lexsort((self.t, codes))
+        self.order = order[codes[order] >= 0]
+        self.codes = codes[self.order]
+        self.t = self.t[self.order]
+        self.y = [df[name].to_numpy(dtype=float, na_value=np.nan)[self.order] for name in values]
+        all_missing = np.logical_and.reduce([np.isnan(y) for y in self.y]) | np.isnan(self.t)
+        new_trace = np.ones(len(self.order), dtype=bool)
+        new_trace[1:] = self.codes[1:] != self.codes[:-1]
+        self.gap = all_missing
+        self.segment = np.cumsum(new_trace | all_missing)
+        first_of_run = np.ones(len(self.order), dtype=bool)
+        first_of_run[1:] = ~all_missing[:-1] | new_trace[1:]
+        self.keep_gap = all_missing & first_of_run
+
+
+def _select(df, time_name, id_name, values, choose):
+    if isinstance(values, str):
+        values = [values]
+    traces = _Traces(df, time_name, id_name, values)
+    keep = traces.keep_gap.copy()
+    keep[choose(traces)] = True
+    return df.take(traces.order[keep]).reset_index(drop=True)
+
+
+def _minmax(traces, n_buckets, start, end):
+    # Positions, in traces order, of the first, last, smallest and largest row of each segment in each bucket.
+    t = traces.t
+    if start is not None and end is not None:
+        low = np.full(traces.codes.max() + 1 if len(t) else 0, _time_number(start, traces.numeric))
+        high = np.full(len(low), _time_number(end, traces.numeric))
+    else:
+        valid = ~traces.gap
+        by_code = pd.Series(t[valid]).groupby(traces.codes[valid])
+        n_codes = traces.codes.max() + 1 if len(t) else 0
+        low = by_code.min().reindex(range(n_codes)).to_numpy()
+        high = by_code.max().reindex(range(n_codes)).to_numpy()
+    span = (high - low)[traces.codes]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bucket = np.where(span > 0, np.floor((t - low[traces.codes]) / span * n_buckets), 0)
+    bucket = np.clip(np.nan_to_num(bucket), 0, n_buckets - 1).astype(np.int64)
+    chosen = []
+    for y in traces.y:
+        rows = np.flatnonzero(~traces.gap & ~np.isnan(y))
+        if len(rows) == 0:
+            continue
+        # Rows are in time order within a segment and buckets follow time, so each bucket of a segment is one run.
+        values = y[rows]
+        starts = _run_starts([traces.segment[rows], bucket[rows]])
+        run = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(rows))))
+        for reduce in (np.minimum, np.maximum):
+            hits = np.flatnonzero(values == reduce.reduceat(values, starts)[run])
+            # The earliest row of each run that has the extreme value
+            chosen.append(rows[hits[_run_starts([run[hits]])]])
+        segment_starts = _run_starts([traces.segment[rows]])
+        chosen.append(rows[segment_starts])
+        chosen.append(rows[np.append(segment_starts[1:], len(rows)) - 1])
+    return np.concatenate(chosen) if chosen else np.array([], dtype=np.intp)
+
+
+def _run_starts(keys):
+    # The positions where any of the keys changes value, the start of each run of equal keys.
+    change = np.ones(len(keys[0]), dtype=bool)
+    change[1:] = False
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def _lttb(traces, n_out):
+    chosen = []
+    for y in traces.y:
+        rows = np.flatnonzero(~traces.gap & ~np.isnan(y))
+        chosen.append(_lttb_rows(rows, traces.t[rows], y[rows], traces.segment[rows], traces.codes[rows], n_out))
+    return np.concatenate(chosen) if chosen else np.array([], dtype=np.intp)
+
+
+def _lttb_rows(rows, x, y, segment, codes, n_out):
+    # LTTB on every segment at once: one step per bucket, each step vectorized over all the segments.
+    if len(rows) == 0:
+        return rows
+    first = _run_starts([segment])
+    lengths = np.diff(np.append(first, len(rows)))
+    code_lengths = np.bincount(codes)
+    k = np.maximum(3, np.round(n_out * lengths / code_lengths[codes[first]])).astype(np.int64)
+    whole = lengths <= k
+    keep = np.repeat(whole, lengths)
+    keep[first] = True
+    keep[first + lengths - 1] = True
+    if whole.all():
+        return rows[keep]
+    # Bucket 0 is the first row, k - 1 the last, the rows between go in k - 2 equal count buckets.
+    seg = np.repeat(np.arange(len(first)), lengths)
+    local = np.arange(len(rows)) - np.repeat(first, lengths)
+    row_lengths = np.repeat(lengths, lengths)
+    row_k = np.repeat(k, lengths)
+    inner = np.flatnonzero((local > 0) & (local < row_lengths - 1) & ~keep)
+    bucket = np.where(local == 0, 0, row_k - 1)
+    bucket[inner] = 1 + (local[inner] - 1) * (row_k[inner] - 2) // (row_lengths[inner] - 2)
+    offset = np.append(0, np.cumsum(k)[:-1])
+    flat = offset[seg] + bucket
+    counts = np.bincount(flat, minlength=k.sum())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.bincount(flat, weights=x, minlength=k.sum()) / counts
+        mean_y = np.bincount(flat, weights=y, minlength=k.sum()) / counts
+    ax = x[first].copy()
+    ay = y[first].copy()
+    # The inner rows by bucket, and by segment within a bucket
+    by_bucket = inner[np.argsort(bucket[inner], kind='stable')]
+    bounds = np.searchsorted(bucket[by_bucket], np.arange(1, k.max() + 1))
+    for j in range(1, k.max() - 1):
+        part = by_bucket[bounds[j - 1]:bounds[j]]
+        if len(part) == 0:
+            continue
+        s = seg[part]
+        cx = mean_x[offset[s] + j + 1]
+        cy = mean_y[offset[s] + j + 1]
+        area = np.abs((ax[s] - cx) * (y[part] - ay[s]) - (ax[s] - x[part]) * (cy - ay[s]))
+        # The row with the largest area in each segment, the earliest one on ties
+        starts = _run_starts([s])
+        run = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(part))))
+        hits = np.flatnonzero(area == np.maximum.reduceat(area, starts)[run])
+        best = part[hits[_run_starts([run[hits]])]]
+        keep[best] = True
+        ax[seg[best]] = x[best]
+        ay[seg[best]] = y[best]
+    return rows[keep]
+
+
+def _time_numbers(column):
+    # Times as float64 numbers that keep their order and spacing, NaN where missing.
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy(dtype=float, na_value=np.nan)
+    if not pd.api.types.is_datetime64_any_dtype(column):
+        column = formats.to_datetimes(column)
+    if column.dt.tz is not None:
+        column = column.dt.tz_convert('UTC').dt.tz_localize(None)
+    values = column.to_numpy(dtype='datetime64[ns]')
+    numbers = values.astype(np.int64).astype(float)
+    numbers[np.isnat(values)] = np.nan
+    return numbers
+
+
+def _time_number(value, numeric):
+    # start or end on the scale of _time_numbers, numbers are Unix epoch seconds unless the time column is numeric.
+    if isinstance(value, (int, float, np.number)):
+        return float(value) if numeric else float(value) * 1e9
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return float(timestamp.as_unit('ns').value)
@@ -0,0 +1,129 @@
+import json
+import os
+
+import pandas as pd
+
+from sdig.erddap import cache
+from sdig.erddap import query
+from sdig.erddap.dtypes import DtypePlan
+
+
+class DistinctIndex:
+    """
+    The distinct combinations of the DSG id variables and the depth variable of a data set, kept in memory and
+    optionally in a file, so depth lists, platform lists and depth/platform filters are answered without asking
+    ERDDAP for distinct() over the whole data set. refresh() only asks for rows newer than the newest time it has
+    already seen.
+
+        Parameters:
+                :param: info: the Info of the data set
+                :type: sdig.erddap.info.Info
+                :param: path: a JSON file to keep the index in between runs, or None to keep it in memory only
+                :type: str
+                :param: file_type: the ERDDAP response type to read, one of csv, nc or parquet
+                :type: str
+    """
+    def __init__(self, info, path=None, file_type='csv'):
+        self.info = info
+        self.path = path
+        self.file_type = file_type
+        self.time_name = info.get_time_variable()
+        self.depth_name, dsg_id = info.get_dsg_info()
+        self.platform_name = info.get_platform_variable()
+        self.columns = list(dict.fromkeys(list(dsg_id.values()) + ([self.depth_name] if self.depth_name else [])))
+        self.rows = pd.DataFrame(columns=self.columns)
+        self.last_time = None
+        self._memo = {}
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    def refresh(self):
+        """
+        Reads the combinations in rows newer than the last refresh, or all of them the first time, and saves the index
+        if it has a path.
+
+            Returns:
+                    :returns: added: the number of new combinations
+                    :rtype: int
+        """
+        newer = []
+        if self.last_time is not None:
+            newer = [self.time_name + '>' + self.last_time.strftime(query.ERDDAP_TIME_FORMAT)]
+        latest = query.read_table(self.info.url, [self.time_name], newer + ['orderByMax("' + self.time_name + '")'],
+                                  self.file_type)
+        if latest is None:
+            return 0
+        last_time = query.to_timestamp(latest[self.time_name].iloc[0])
+        # Stop at the newest time found so rows arriving during the refresh are picked up by the next one.
+        constraints = newer + [self.time_name + '<=' + last_time.strftime(query.ERDDAP_TIME_FORMAT), 'distinct()']
+        # The ids as strings, read as numbers an id such as 01 would lose its leading zero
+        new_rows = query.read_table(self.info.url, self.columns, constraints, self.file_type,
+                                    plan=DtypePlan.ids(self.info))
+        before = len(self.rows)
+        if new_rows is not None:
+            rows = new_rows if before == 0 else pd.concat([self.rows, new_rows], ignore_index=True)
+            self.rows = rows.drop_duplicates(ignore_index=True)
+        self.last_time = last_time
+        self._memo = {}
+        if self.path is not None:
+            self._save()
+        return len(self.rows) - before
+
+    def depths(self, platform=None):
+        """
+        Returns the sorted distinct depths, of one platform if platform is given. The same as Info.get_depths
+        without a request to ERDDAP.
+        """
+        if self.depth_name is None:
+            return []
+        key = ('depths', None if platform is None else str(platform))
+        if key not in self._memo:
+            rows = self.rows if platform is None else self.filter(**{self.platform_name: platform})
+            self._memo[key] = sorted(rows[self.depth_name].dropna().unique().tolist())
+        return self._memo[key]
+
+    def platforms(self, depth=None):
+        """
+        Returns the sorted distinct platform ids, of those measured at depth if depth is given. Raises ValueError
+        for a depth when the data set has no depth variable.
+        """
+        if depth is not None and self.depth_name is None:
+            raise ValueError('Platforms by depth need a depth variable, ' + self.info.url + ' has none')
+        key = ('platforms', depth)
+        if key not in self._memo:
+            rows = self.rows if depth is None else self.filter(**{self.depth_name: depth})
+            self._memo[key] = sorted(rows[self.platform_name].dropna().unique().tolist())
+        return self._memo[key]
+
+    def filter(self, **values):
+        """
+        Returns the combinations where each named variable has the given value, or one of the values if a list is
+        given, e.g. index.filter(station='M1', depth=[10, 20]). Ids are kept and compared as strings.
+        """
+        mask = pd.Series(True, index=self.rows.index)
+        for name, value in values.items():
+            column = self.rows[name]
+            wanted = value if isinstance(value, list) else [value]
+            if name != self.depth_name:
+                wanted = [str(v) for v in wanted]
+            mask &= column.isin(wanted)
+        return self.rows[mask]
+
+    def _save(self):
+        state = {
+            'url': self.info.url,
+            'columns': self.columns,
+            'last_time': None if self.last_time is None else self.last_time.isoformat(),
+            'rows': self.rows.astype(object).where(self.rows.notna(), None).values.tolist(),
+        }
+        cache.write_atomic(self.path, json.dumps(state).encode('utf-8'))
+
+    def _load(self):
+        with open(self.path) as f:
+            state = json.load(f)
+        if state['url'] != self.info.url or state['columns'] != self.columns:
+            return
+        self.rows = pd.DataFrame(state['rows'], columns=self.columns).astype(
+            {name: 'str' for name in self.columns if name != self.depth_name})
+        if state['last_time'] is not None:
+            self.last_time = pd.Timestamp(state['last_time'])
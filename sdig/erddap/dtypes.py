@@ -0,0 +1,136 @@
+import pandas as pd
+
+# The pandas dtype of each ERDDAP Data Type. Integers are the nullable pandas types since ERDDAP marks missing
+# values in integer variables too. String and char variables are left to the reader.
+ERDDAP_DTYPES = {
+    'byte': 'Int8', 'ubyte': 'UInt8', 'short': 'Int16', 'ushort': 'UInt16', 'int': 'Int32', 'uint': 'UInt32',
+    'long': 'Int64', 'ulong': 'UInt64', 'float': 'float32', 'double': 'float64', 'boolean': 'boolean',
+}
+
+
+class DtypePlan:
+    """
+    The compact pandas dtype of each variable of a data set, from the Data Type that index.csv declares and the
+    role the variable plays: numbers as narrow as they were declared, e.g. float32 rather than float64, the cf_role
+    id variables of the DSG as category, so a platform id is stored once rather than once per row, and the time
+    variables as UTC datetime64. The readers in sdig.erddap.formats apply a plan while they decode a response,
+    so the wide columns never exist. Make one with from_info, or pass compact=True to Info.get_data.
+
+        Parameters:
+                :param: dtypes: the pandas dtype of each variable keyed by name
+                :type: dict
+                :param: times: the names of the time variables, read as datetime64
+                :type: list
+    """
+    def __init__(self, dtypes, times):
+        self.dtypes = dict(dtypes)
+        self.times = list(times)
+
+    def __eq__(self, other):
+        return isinstance(other, DtypePlan) and self.dtypes == other.dtypes and self.times == other.times
+
+    def __hash__(self):
+        return hash((tuple(sorted(self.dtypes.items())), tuple(self.times)))
+
+    def __repr__(self):
+        return 'DtypePlan(' + repr(self.dtypes) + ', ' + repr(self.times) + ')'
+
+    @classmethod
+    def from_info(cls, info):
+        """
+        Plans the dtypes of the variables of a data set from its metadata.
+
+            Parameters:
+                    :param: info: the Info of the data set
+                    :type: sdig.erddap.info.Info
+            Returns:
+                    :returns: plan: the plan
+                    :rtype: DtypePlan
+        """
+        variables, long_names, units, standard_names, variable_types = info.get_variables()
+        depth_name, dsg_id = info.get_dsg_info()
+        time_name = info.get_time_variable()
+        times = [v for v in variables if v == time_name or
+                 (isinstance(units.get(v), str) and units[v].startswith('seconds since 1970-01-01'))]
+        dtypes = {}
+        for variable in variables:
+            if variable in times:
+                continue
+            if variable in dsg_id.values():
+                dtypes[variable] = 'category'
+            elif variable_types.get(variable) in ERDDAP_DTYPES:
+                dtypes[variable] = ERDDAP_DTYPES[variable_types[variable]]
+        return cls(dtypes, times)
+
+    @classmethod
+    def ids(cls, info):
+        """
+        Plans only the DSG id variables of a data set, as strings. Read with it, ids such as 01 keep the digits that
+        reading them as numbers would lose.
+
+            Parameters:
+                    :param: info: the Info of the data set
+                    :type: sdig.erddap.info.Info
+            Returns:
+                    :returns: plan: the plan
+                    :rtype: DtypePlan
+        """
+        depth_name, dsg_id = info.get_dsg_info()
+        return cls({name: 'str' for name in dsg_id.values()}, [])
+
+    def without(self, names):
+        """
+        Returns the plan without the variables in names, which are then read as the reader infers them.
+        """
+        return DtypePlan({k: v for k, v in self.dtypes.items() if k not in names},
+                         [t for t in self.times if t not in names])
+
+    def apply(self, df):
+        """
+        Converts the columns of an already decoded DataFrame that the plan covers, in place, and returns it.
+        """
+        for name in df.columns:
+            if name in self.dtypes and df[name].dtype != self.dtypes[name]:
+                df[name] = cast(df[name], self.dtypes[name])
+        return df
+
+
+def cast(values, dtype):
+    """
+    Returns values, an array or Series, as a Series of dtype. NaN becomes NA in the nullable integer types.
+    """
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values)
+    return values.astype(dtype)
+
+
+def concat(frames):
+    """
+    pandas.concat for the chunks of a compact get_data. pandas.concat turns a category column back into strings
+    when the chunks have different categories, as chunks of different platforms do. Here the categories are
+    merged first so the column stays category.
+
+        Parameters:
+                :param: frames: the chunks
+                :type: list
+        Returns:
+                :returns: df: the rows of all the chunks
+                :rtype: Dataframe
+    """
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame()
+    for name in frames[0].columns:
+        columns = [frame[name] for frame in frames if name in frame.columns]
+        if all(isinstance(column.dtype, pd.CategoricalDtype) for column in columns):
+            merged = pd.api.types.union_categoricals(columns)
+            frames = [_with_categories(frame, name, merged.categories) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _with_categories(frame, name, categories):
+    if name not in frame.columns:
+        return frame
+    frame = frame.copy(deep=False)
+    frame[name] = frame[name].cat.set_categories(categories)
+    return frame
@@ -0,0 +1,455 @@
+import asyncio
+import gzip
+import http.client
+import io
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from sdig.erddap import instrument
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 10
+
+
+class Session:
+    """
+    A thread safe pool of keep-alive HTTP connections so that many requests to the same ERDDAP server reuse
+    sockets (and TLS sessions) instead of connecting again for every request. Responses are requested gzip
+    compressed, redirects are followed and hosts that have to be reached through a proxy go through urllib.
+
+        Parameters:
+                :param: max_connections_per_host: the most requests in flight to one host, further requests wait
+                :type: int
+                :param: timeout: socket timeout in seconds
+                :type: float
+    """
+    def __init__(self, max_connections_per_host=16, timeout=60):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+
+    def request(self, url, headers=None, timeout=None):
+        """
+        Performs an HTTP GET and returns the status, the body and the response headers. A 304 Not Modified
+        answer to a conditional request is returned rather than raised, every other HTTP error is raised as
+        urllib.error.HTTPError, as is a redirect that is still redirecting after _MAX_REDIRECTS hops.
+
+            Parameters:
+                    :param: url: the URL to read
+                    :type: str
+                    :param: headers: extra request headers, e.g. If-None-Match or If-Modified-Since
+                    :type: dict
+                    :param: timeout: socket timeout in seconds, the session timeout if None
+                    :type: float
+            Returns:
+                    :returns: status: the HTTP status code
+                    :rtype: int
+                    :returns: body: the response body, empty for a 304
+                    :rtype: bytes
+                    :returns: response_headers: the response headers
+                    :rtype: dict
+        """
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        timeout = self.timeout if timeout is None else timeout
+        event = instrument.current()
+        start = time.perf_counter()
+        for redirect in range(_MAX_REDIRECTS):
+            split = urllib.parse.urlsplit(url)
+            if _proxied(split):
+                response = _urllib_request(url, headers, timeout)
+                _record(event, start, None, response[0], response[1])
+                return response
+            try:
+                status, reason, body, response_headers, first_byte = self._send(split, headers, timeout)
+            except (http.client.HTTPException, OSError) as e:
+                # Report connection failures the way urllib (and so pandas.read_csv) always has.
+                raise urllib.error.URLError(e) from e
+            start = _record(event, start, first_byte, status, body)
+            location = header(response_headers, 'Location')
+            if status not in _REDIRECTS or not location:
+                break
+            url = urllib.parse.urljoin(url, location)
+        else:
+            raise _redirect_loop(url, status, reason, body)
+        if header(response_headers, 'Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        if status == 304:
+            return 304, b'', response_headers
+        if status >= 400:
+            raise urllib.error.HTTPError(url, status, reason, http.client.HTTPMessage(), io.BytesIO(body))
+        return status, body, response_headers
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _send(self, split, headers, timeout):
+        key = (split.scheme, split.hostname, split.port)
+        path = split.path or '/'
+        if split.query:
+            path = path + '?' + split.query
+        with self._slot(key):
+            connection, reused = self._acquire(key, timeout)
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection, try once more on a new one.
+                connection = self._connect(key, timeout)
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+            first_byte = time.perf_counter()
+            try:
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+            return response.status, response.reason, body, dict(response.getheaders()), first_byte
+
+    def _slot(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.max_connections_per_host)
+            return self._slots[key]
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                connection = idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+        return self._connect(key, timeout), False
+
+    def _connect(self, key, timeout):
+        scheme, host, port = key
+        with self._lock:
+            self.connections_opened += 1
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _release(self, key, connection):
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+
+class AsyncSession:
+    """
+    The asyncio counterpart of Session: a pool of keep-alive HTTP/1.1 connections driven by asyncio streams, so
+    an event loop can have many requests in flight without blocking and without a thread per request. At most
+    max_connections_per_host requests run against one host at a time, further requests wait for a free slot.
+    Responses are requested gzip compressed and redirects are followed. Hosts that have to be reached through a
+    proxy go through Session in a worker thread. A session can be used from several event loops, e.g. threads that
+    each run their own asyncio.run: every loop has its own idle connections and its own per host limit, and those
+    of a loop that has been closed are dropped.
+
+        Parameters:
+                :param: max_connections_per_host: the most requests in flight to one host, further requests wait
+                :type: int
+                :param: timeout: seconds to wait for the I/O of a request before giving up, not counting the wait
+                        for a free slot
+                :type: float
+    """
+    def __init__(self, max_connections_per_host=16, timeout=60):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        self._loops = {}
+
+    async def request(self, url, headers=None, timeout=None):
+        """
+        Performs an HTTP GET and returns the status, the body and the response headers, like Session.request.
+        A 304 Not Modified answer to a conditional request is returned rather than raised, every other HTTP error
+        is raised as urllib.error.HTTPError and connection failures as urllib.error.URLError.
+        """
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        timeout = self.timeout if timeout is None else timeout
+        event = instrument.current()
+        start = time.perf_counter()
+        for redirect in range(_MAX_REDIRECTS):
+            split = urllib.parse.urlsplit(url)
+            if _proxied(split):
+                return await asyncio.to_thread(session.request, url, headers, timeout)
+            try:
+                status, reason, body, response_headers, first_byte = await self._send(split, headers, timeout)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, OSError) as e:
+                raise urllib.error.URLError(e) from e
+            start = _record(event, start, first_byte, status, body)
+            location = header(response_headers, 'Location')
+            if status not in _REDIRECTS or not location:
+                break
+            url = urllib.parse.urljoin(url, location)
+        else:
+            raise _redirect_loop(url, status, reason, body)
+        if header(response_headers, 'Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        if status == 304:
+            return 304, b'', response_headers
+        if status >= 400:
+            raise urllib.error.HTTPError(url, status, reason, http.client.HTTPMessage(), io.BytesIO(body))
+        return status, body, response_headers
+
+    async def get(self, url, cache=None):
+        """
+        Returns the body of the response from url, going through the cache if one is given, like fetch.get.
+        """
+        if cache is None:
+            status, body, response_headers = await self.request(url)
+            return body
+        body, headers = cache.lookup(url)
+        if body is not None:
+            return body
+        status, body, response_headers = await self.request(url, headers=headers)
+        cached = cache.update(url, status, body, response_headers)
+        if cached is None:
+            # The entry went away while the server was revalidating it, read it again in full
+            status, body, response_headers = await self.request(url)
+            cached = cache.update(url, status, body, response_headers)
+        return cached
+
+    async def close(self):
+        """
+        Closes the idle connections of the running event loop.
+        """
+        state = self._state()
+        idle, state.idle = state.idle, {}
+        for connections in idle.values():
+            for reader, writer in connections:
+                writer.close()
+
+    async def _send(self, split, headers, timeout):
+        key = (split.scheme, split.hostname, split.port or (443 if split.scheme == 'https' else 80))
+        path = split.path or '/'
+        if split.query:
+            path = path + '?' + split.query
+        host = split.hostname if split.port is None else split.hostname + ':' + str(split.port)
+        lines = ['GET ' + path + ' HTTP/1.1', 'Host: ' + host, 'Connection: keep-alive']
+        lines.extend(name + ': ' + value for name, value in headers.items())
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        state = self._state()
+        if key not in state.slots:
+            state.slots[key] = asyncio.Semaphore(self.max_connections_per_host)
+        async with state.slots[key]:
+            # Only the I/O is timed, not the wait for the slot
+            return await asyncio.wait_for(self._perform(state, key, message), timeout)
+
+    async def _perform(self, state, key, message):
+        connection, reused = await self._acquire(state, key)
+        try:
+            response = await _exchange(connection, message)
+        except (asyncio.IncompleteReadError, ValueError, OSError):
+            connection[1].close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection, try once more on a new one.
+            connection = await self._connect(key)
+            try:
+                response = await _exchange(connection, message)
+            except BaseException:
+                connection[1].close()
+                raise
+        except BaseException:
+            connection[1].close()
+            raise
+        status, reason, body, response_headers, keep_alive, first_byte = response
+        if keep_alive:
+            state.idle.setdefault(key, []).append(connection)
+        else:
+            connection[1].close()
+        return status, reason, body, response_headers, first_byte
+
+    def _state(self):
+        # The idle connections and slots of the running loop. Those of closed loops are dropped, their connections
+        # went with the loop.
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for other in [other for other in self._loops if other.is_closed()]:
+                del self._loops[other]
+            if loop not in self._loops:
+                self._loops[loop] = _LoopState()
+            return self._loops[loop]
+
+    async def _acquire(self, state, key):
+        idle = state.idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.close()
+        return await self._connect(key), False
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        self.connections_opened += 1
+        context = ssl.create_default_context() if scheme == 'https' else None
+        return await asyncio.open_connection(host, port, ssl=context)
+
+
+class _LoopState:
+    __slots__ = ('idle', 'slots')
+
+    def __init__(self):
+        self.idle = {}
+        self.slots = {}
+
+
+async def _exchange(connection, message):
+    reader, writer = connection
+    writer.write(message)
+    await writer.drain()
+    status_line = await reader.readline()
+    first_byte = time.perf_counter()
+    if not status_line:
+        raise asyncio.IncompleteReadError(b'', None)
+    version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+    status = int(status)
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, value = line.decode('latin-1').split(':', 1)
+        response_headers[name.strip()] = value.strip()
+    connection_header = (header(response_headers, 'Connection') or '').lower()
+    keep_alive = version == 'HTTP/1.1' and connection_header != 'close' or connection_header == 'keep-alive'
+    length = header(response_headers, 'Content-Length')
+    if status in (204, 304) or 100 <= status < 200:
+        body = b''
+    elif (header(response_headers, 'Transfer-Encoding') or '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        body = b''.join(chunks)
+    elif length is not None:
+        body = await reader.readexactly(int(length))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return status, reason, body, response_headers, keep_alive, first_byte
+
+
+# The session used by request and get unless they are given one
+session = Session()
+
+# The session used by AsyncInfo and query.aread_table unless they are given one
+async_session = AsyncSession()
+
+
+def request(url, headers=None, timeout=60):
+    """
+    Performs an HTTP GET through the shared connection pool and returns the status, the body and the response
+    headers. A 304 Not Modified answer to a conditional request is returned rather than raised, every other
+    HTTP error is raised.
+
+        Parameters:
+                :param: url: the URL to read
+                :type: str
+                :param: headers: extra request headers, e.g. If-None-Match or If-Modified-Since
+                :type: dict
+                :param: timeout: socket timeout in seconds
+                :type: float
+        Returns:
+                :returns: status: the HTTP status code
+                :rtype: int
+                :returns: body: the response body, empty for a 304
+                :rtype: bytes
+                :returns: response_headers: the response headers
+                :rtype: dict
+    """
+    return session.request(url, headers=headers, timeout=timeout)
+
+
+def get(url, cache=None):
+    """
+    Returns the body of the response from url, going through the cache if one is given.
+
+        Parameters:
+                :param: url: the URL to read
+                :type: str
+                :param: cache: a MemoryCache or DiskCache from sdig.erddap.cache or None
+                :type: sdig.erddap.cache.MemoryCache
+        Returns:
+                :returns: body: the response body
+                :rtype: bytes
+    """
+    if cache is not None:
+        return cache.fetch(url)
+    status, body, headers = request(url)
+    return body
+
+
+def header(headers, name):
+    """
+    Returns the value of a response header looked up without regard to case, or None.
+    """
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def _record(event, start, first_byte, status, body):
+    # Add a response to the event being measured, if any, and return the time the next request starts from.
+    # Bytes are counted as received, before decompression.
+    if event is None:
+        return start
+    now = time.perf_counter()
+    if event['ttfb'] is None and first_byte is not None:
+        event['ttfb'] = first_byte - start
+    event['fetch'] += now - start
+    event['status'] = status
+    event['bytes'] += len(body)
+    return now
+
+
+def _redirect_loop(url, status, reason, body):
+    # The error urllib raises for a server that keeps redirecting.
+    message = ('The HTTP server returned a redirect error that would lead to an infinite loop.\n'
+               'The last 30x error message was:\n' + reason)
+    return urllib.error.HTTPError(url, status, message, http.client.HTTPMessage(), io.BytesIO(body))
+
+
+def _proxied(split):
+    proxies = urllib.request.getproxies()
+    return split.scheme in proxies and not urllib.request.proxy_bypass(split.hostname)
+
+
+def _urllib_request(url, headers, timeout):
+    headers = {k: v for k, v in headers.items() if k != 'Accept-Encoding'}
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, response.read(), dict(response.headers.items())
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, b'', dict(e.headers.items())
+        raise
@@ -0,0 +1,134 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from sdig.erddap import instrument
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent work: while a call for a key is in flight, other calls for the same key wait
+    for it and get its result instead of doing the work again. Info uses the shared one, flights, around reading
+    index.csv and tabledap requests, so a dashboard opened by many users at once sends ERDDAP one request for
+    each URL rather than one for each user. Threads and asyncio tasks share calls with each other.
+
+    A result is only shared with the calls that arrived while it was in flight, nothing is kept afterwards, so
+    this is not a cache. When the result was shared each caller gets copy(result), so none of them sees what
+    another does to its result, e.g. plug_gaps converting the time column in place.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, function, copy=None):
+        """
+        Returns function(), or the result of the call for key that is already in flight. An exception raised by
+        the call is raised to every caller that shared it.
+
+            Parameters:
+                    :param: key: what identifies the work, e.g. the URL read
+                    :type: hashable
+                    :param: function: does the work, called without arguments
+                    :type: callable
+                    :param: copy: makes each caller's copy of a shared result, None to share the result itself
+                    :type: callable
+            Returns:
+                    :returns: result: the result of function
+        """
+        call, leader = self._join(key, blocking=True)
+        if leader:
+            try:
+                result = function()
+            except BaseException as e:
+                self._finish(key, call, exception=e)
+                raise
+            self._finish(key, call, result=result)
+        return self._result(call, copy)
+
+    async def ado(self, key, coroutine_function, copy=None):
+        """
+        The asyncio do: awaits coroutine_function(), or the call for key that is already in flight. The work runs
+        as a task of its own, so cancelling the caller that started it does not cancel it for the others.
+        """
+        call, leader = self._join(key, blocking=False)
+        if leader:
+            task = asyncio.ensure_future(coroutine_function())
+            task.add_done_callback(lambda done: self._finish_task(key, call, done))
+        await asyncio.shield(asyncio.wrap_future(call.future))
+        return self._result(call, copy)
+
+    def stats(self):
+        """
+        Returns how many calls did the work, how many shared a call in flight and how many are in flight now.
+
+            Returns:
+                    :returns: stats: the counters keyed by name
+                    :rtype: dict
+        """
+        with self._lock:
+            return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+    def clear_stats(self):
+        with self._lock:
+            self.executed = 0
+            self.coalesced = 0
+
+    def _join(self, key, blocking):
+        # The call for key and whether this caller is to do the work. A blocking caller on the thread running the
+        # call would wait for itself, e.g. a synchronous Info made on the event loop of an AsyncInfo read, so it
+        # does the work on its own.
+        thread = threading.get_ident()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and not (blocking and call.thread == thread):
+                call.waiters += 1
+                self.coalesced += 1
+                event = instrument.current()
+                if event is not None:
+                    event['coalesced'] = True
+                return call, False
+            call = _Call(thread)
+            if key not in self._calls:
+                self._calls[key] = call
+            self.executed += 1
+            return call, True
+
+    def _finish(self, key, call, result=None, exception=None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        if exception is not None:
+            call.future.set_exception(exception)
+        else:
+            call.future.set_result(result)
+
+    def _finish_task(self, key, call, task):
+        if task.cancelled():
+            self._finish(key, call, exception=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._finish(key, call, exception=task.exception())
+        else:
+            self._finish(key, call, result=task.result())
+
+    @staticmethod
+    def _result(call, copy):
+        # Nobody can join a finished call, so its waiters are all known by now.
+        result = call.future.result()
+        if copy is None or call.waiters == 0 or result is None:
+            return result
+        return copy(result)
+
+
+class _Call:
+    __slots__ = ('future', 'thread', 'waiters')
+
+    def __init__(self, thread):
+        self.future = concurrent.futures.Future()
+        self.thread = thread
+        self.waiters = 0
+
+
+# The SingleFlight that Info, AsyncInfo and sdig.erddap.query read through
+flights = SingleFlight()
@@ -0,0 +1,184 @@
+import csv
+import importlib.util
+import io
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import dtypes
+from sdig.erddap import netcdf3
+
+# The ERDDAP file types the tabledap readers understand, csv is always available
+FILE_TYPES = ('csv', 'nc', 'parquet')
+
+# The rows of time strings decoded at once by to_datetimes
+_BLOCK = 65536
+
+
+def available(file_type):
+    """
+    Returns True if responses of file_type can be decoded here. Parquet needs pyarrow or fastparquet, the others
+    need nothing beyond pandas and numpy.
+
+        Parameters:
+                :param: file_type: one of FILE_TYPES
+                :type: str
+        Returns:
+                :returns: available: whether file_type can be read
+                :rtype: bool
+    """
+    if file_type == 'parquet':
+        return importlib.util.find_spec('pyarrow') is not None or importlib.util.find_spec('fastparquet') is not None
+    return file_type in FILE_TYPES
+
+
+def read(body, file_type, parse_times=False, plan=None):
+    """
+    Decodes the body of a tabledap response of file_type into a DataFrame.
+
+        Parameters:
+                :param: body: the response body
+                :type: bytes
+                :param: file_type: one of FILE_TYPES
+                :type: str
+                :param: parse_times: return the time columns of a csv response as UTC datetime64, the binary types
+                        always do
+                :type: bool
+                :param: plan: the dtypes to decode the columns into, see sdig.erddap.dtypes.DtypePlan
+                :type: sdig.erddap.dtypes.DtypePlan
+        Returns:
+                :returns: df: the rows of the response
+                :rtype: Dataframe
+    """
+    if file_type == 'nc':
+        return read_nc(body, plan)
+    if file_type == 'parquet':
+        df = pd.read_parquet(io.BytesIO(body))
+        return df if plan is None else plan.apply(df)
+    return read_csv(body, parse_times, plan)
+
+
+def read_csv(body, parse_times=False, plan=None):
+    """
+    Reads an ERDDAP .csv response, skipping the units row under the header. With parse_times the columns whose
+    unit is UTC, the times, are converted to datetime64 with to_datetimes. A plan gives the dtypes pandas decodes
+    each column into and the time columns, which are converted whether parse_times is set or not.
+    """
+    times = []
+    if parse_times:
+        lines = body.split(b'\n', 2)
+        if len(lines) > 1:
+            names, units = csv.reader([line.decode('utf-8').rstrip('\r') for line in lines[:2]])
+            times = [name for name, unit in zip(names, units) if unit == 'UTC']
+    if plan is None:
+        df = pd.read_csv(io.BytesIO(body), skiprows=[1])
+    else:
+        times = times + plan.times
+        try:
+            df = pd.read_csv(io.BytesIO(body), skiprows=[1], dtype=plan.dtypes)
+        except (ValueError, TypeError):
+            # A value the declared type can not hold, read the column as pandas sees it rather than fail.
+            df = pd.read_csv(io.BytesIO(body), skiprows=[1])
+    for name in dict.fromkeys(times):
+        if name in df.columns:
+            df[name] = to_datetimes(df[name])
+    return df
+
+
+def to_datetimes(column):
+    """
+    Returns a column of times as UTC datetime64, whatever form it came in. Numbers are Unix epoch seconds, as in
+    the binary responses. Strings in the fixed format of ERDDAP's csv times, 2020-01-31T12:00:00Z, are decoded in
+    one vectorized pass over their bytes, which is several times faster than pandas.to_datetime. Other strings
+    are parsed as ISO 8601 or, failing that, by pandas.to_datetime. A datetime64 column is returned as it is.
+
+        Parameters:
+                :param: column: the times
+                :type: pandas.Series
+        Returns:
+                :returns: times: the times as datetime64
+                :rtype: pandas.Series
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    if pd.api.types.is_numeric_dtype(column):
+        return pd.to_datetime(column, unit='s', utc=True)
+    seconds = _fixed_format_seconds(column)
+    if seconds is not None:
+        return pd.Series(pd.DatetimeIndex(seconds).tz_localize('UTC'), index=column.index, name=column.name)
+    try:
+        return pd.to_datetime(column, format='ISO8601')
+    except ValueError:
+        return pd.to_datetime(column)
+
+
+def _fixed_format_seconds(column):
+    # The times of column as datetime64[s] if every value is missing or in the form 2020-01-31T12:00:00Z,
+    # otherwise None.
+    missing = column.isna().to_numpy()
+    try:
+        raw = column.to_numpy(dtype=object, na_value='1970-01-01T00:00:00Z').astype('S')
+    except (UnicodeEncodeError, ValueError):
+        return None
+    if raw.dtype.itemsize != 20:
+        return None
+    chars = raw.view(np.uint8).reshape(-1, 20)
+    seconds = np.empty(len(chars), dtype=np.int64)
+    # A block at a time so the temporary arrays stay small however long the column is
+    for start in range(0, len(chars), _BLOCK):
+        block = _block_seconds(chars[start:start + _BLOCK])
+        if block is None:
+            return None
+        seconds[start:start + _BLOCK] = block
+    seconds = seconds.astype('datetime64[s]')
+    seconds[missing] = np.datetime64('NaT')
+    return seconds
+
+
+def _block_seconds(chars):
+    # - - T : : Z in their places and digits everywhere else
+    if not ((chars[:, [4, 7]] == 45).all() and (chars[:, 10] == 84).all() and (chars[:, [13, 16]] == 58).all()
+            and (chars[:, 19] == 90).all()):
+        return None
+    digits = chars[:, [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]].astype(np.int32) - 48
+    if not ((digits >= 0) & (digits <= 9)).all():
+        return None
+    pairs = digits[:, 4:].reshape(-1, 5, 2)
+    month, day, hour, minute, second = (pairs[:, :, 0] * 10 + pairs[:, :, 1]).T
+    if not ((month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (hour <= 23) & (minute <= 59) &
+            (second <= 60)).all():
+        return None
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    first = months.astype('datetime64[D]').astype(np.int64)
+    # A day past the end of its month, e.g. 2021-04-31, is left to pandas rather than rolled into the next month
+    if not (day <= (months + 1).astype('datetime64[D]').astype(np.int64) - first).all():
+        return None
+    days = first + day - 1
+    return days * 86400 + hour * 3600 + minute * 60 + second
+
+
+def read_nc(body, plan=None):
+    """
+    Reads an ERDDAP tabledap .nc response into typed columns. Values equal to _FillValue or missing_value become
+    NaN and variables in seconds since 1970-01-01 become UTC datetime64 columns. The variables a plan covers are
+    converted to its dtypes as they are decoded.
+    """
+    dimensions, attributes, variables = netcdf3.read(body)
+    columns = {}
+    for name, (dims, data, var_attributes) in variables.items():
+        if data.ndim != 1:
+            continue
+        if data.dtype.kind in ('i', 'u', 'f'):
+            missing = [var_attributes[a] for a in ('_FillValue', 'missing_value') if a in var_attributes]
+            if missing:
+                is_missing = np.isin(data, missing)
+                if is_missing.any():
+                    data = np.where(is_missing, np.nan, data.astype(np.result_type(data.dtype, np.float32)))
+            units = var_attributes.get('units', '')
+            if isinstance(units, str) and units.startswith('seconds since 1970-01-01'):
+                data = pd.to_datetime(data, unit='s', utc=True)
+        if plan is not None and name in plan.dtypes and data.dtype != plan.dtypes[name]:
+            data = dtypes.cast(data, plan.dtypes[name])
+        columns[name] = data
+    return pd.DataFrame(columns)
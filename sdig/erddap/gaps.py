@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import formats
+from sdig.erddap import instrument
+
+
+def plug_gaps(df, time_name, id_name, keep, n_std):
+    """
+    Inserts a row of NaN in every time gap of every platform so plots break the line at the gap. A gap is a
+    time step larger than n_std standard deviations of the time steps of that platform, and gaps are only
+    looked for when n_std standard deviations is larger than the mean time step. The inserted row is put
+    half way through the gap and gets the values of the row after the gap in the keep columns.
+
+    The gaps of all platforms are found in one pass with groupby and all the NaN rows are merged into the
+    frame with a single sort, so the cost does not depend on the number of platforms or gaps.
+
+    :param: df: a Dataframe in which to insert NaN's in time gaps, sorted by time within each platform.
+    :type: Dataframe
+    :param: time_name: the name of the column in the Dataframe that contains the time, as datetime64, Unix epoch
+    seconds or ERDDAP time strings, see sdig.erddap.formats.to_datetimes. It is converted to datetime64 in place.
+    :type: str
+    :param: id_name: the column name of the timeseries ID
+    :type: str
+    :param: keep: the names of the columns which are to be copied into the NaN rows
+    :type: list
+    :param: n_std: the number of standard deviations wide the gap must be to be considered a gap
+    :return: The Dataframe with the rows of each platform together in order of appearance and the NaN rows in the gaps
+    :rtype: Dataframe
+    """
+    with instrument.span('plug_gaps') as event:
+        out = _plug_gaps(df, time_name, id_name, keep, n_std)
+        if event is not None:
+            event['rows'] = len(out)
+        return out
+
+
+def _plug_gaps(df, time_name, id_name, keep, n_std):
+    df[time_name] = formats.to_datetimes(df[time_name])
+    codes = pd.factorize(df[id_name])[0]
+    work = df[codes >= 0].reset_index(drop=True)
+    codes = codes[codes >= 0]
+
+    gaps = work[time_name].groupby(codes).diff()
+    gap_seconds = gaps.dt.total_seconds()
+    by_id = gap_seconds.groupby(codes)
+    factor = by_id.transform('std') * n_std
+    is_gap = ((gap_seconds > factor) & (factor > by_id.transform('mean'))).to_numpy()
+    return _insert(work, codes, gaps, is_gap, time_name, keep)
+
+
+class GapPlugger:
+    """
+    plug_gaps for data that arrive in chunks, e.g. from Info.get_data, so a long record never has to be in
+    memory at once. It keeps, for each platform, the count, mean and sum of squared deviations of its time steps
+    (Welford's running statistics, merged a chunk at a time) and the time of its last row, so gaps across chunk
+    boundaries are found too. plug returns each chunk with its NaN rows as soon as it is given.
+
+    By default each time step is judged against the statistics of the platform's steps up to and including it,
+    so the first gaps of a platform are judged on few steps. For the exact plug_gaps result, first give every
+    chunk to observe, call freeze, and then give the chunks to plug again: the NaN rows are then those plug_gaps
+    inserts in the whole record. Chunks must keep each platform in time order, as time windows of get_data do.
+
+        Parameters:
+                :param: time_name: the name of the time column
+                :type: str
+                :param: id_name: the column name of the timeseries ID
+                :type: str
+                :param: keep: the names of the columns which are to be copied into the NaN rows
+                :type: list
+                :param: n_std: the number of standard deviations wide the gap must be to be considered a gap
+                :type: float
+    """
+    def __init__(self, time_name, id_name, keep, n_std):
+        self.time_name = time_name
+        self.id_name = id_name
+        self.keep = keep
+        self.n_std = n_std
+        self.frozen = False
+        # [count, mean, sum of squared deviations] of the time steps in seconds, and the last time, by platform
+        self._stats = {}
+        self._last = {}
+
+    def observe(self, chunk):
+        """
+        Adds the time steps of a chunk to the statistics without plugging it, the statistics pass of exact mode.
+        """
+        if self.frozen:
+            raise ValueError('The statistics are frozen')
+        self._steps(chunk)
+
+    def freeze(self):
+        """
+        Ends the statistics pass: from now on the statistics of the whole record decide the gaps and the chunks
+        are expected again from the start.
+        """
+        self.frozen = True
+        self._last = {}
+
+    def plug(self, chunk):
+        """
+        Returns the chunk with a row of NaN in each gap, its rows of each platform together in order of
+        appearance. The time column of chunk is converted to datetime in place, as plug_gaps does.
+
+            Parameters:
+                    :param: chunk: the next rows
+                    :type: Dataframe
+            Returns:
+                    :returns: df: the rows with the NaN rows in the gaps
+                    :rtype: Dataframe
+        """
+        with instrument.span('plug_gaps') as event:
+            work, codes, gaps, gap_seconds, mean, std = self._steps(chunk)
+            factor = std * self.n_std
+            with np.errstate(invalid='ignore'):
+                is_gap = (gap_seconds > factor) & (factor > mean)
+            out = _insert(work, codes, gaps, is_gap, self.time_name, self.keep)
+            if event is not None:
+                event['rows'] = len(out)
+            return out
+
+    def _steps(self, chunk):
+        # The time steps of a chunk and, for each, the mean and standard deviation they are judged against.
+        chunk[self.time_name] = formats.to_datetimes(chunk[self.time_name])
+        codes, ids = pd.factorize(chunk[self.id_name])
+        work = chunk[codes >= 0].reset_index(drop=True)
+        codes = codes[codes >= 0]
+        times = work[self.time_name]
+        gaps = times.groupby(codes).diff()
+        # The first step of each platform in the chunk is from its last row in the chunk before.
+        first = np.unique(codes, return_index=True)[1]
+        before = pd.Series([self._last.get(i, pd.NaT) for i in ids], dtype=times.dtype)
+        gaps.iloc[first] = (times.iloc[first].reset_index(drop=True) - before).to_numpy()
+        gap_seconds = gaps.dt.total_seconds().to_numpy()
+
+        state = np.array([self._stats.get(i, (0, 0.0, 0.0)) for i in ids], dtype=float).reshape(-1, 3)
+        if self.frozen:
+            n, mean, m2 = state[codes, 0], state[codes, 1], state[codes, 2]
+        else:
+            n, mean, m2 = _merge(state, codes, gap_seconds)
+            last = np.full(len(ids), -1)
+            last[codes] = np.arange(len(codes))
+            for c, i in enumerate(ids):
+                self._stats[i] = (n[last[c]], mean[last[c]], m2[last[c]])
+        for i, t in zip(ids, times.groupby(codes).last()):
+            self._last[i] = t
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.where(n > 1, np.sqrt(m2 / (n - 1)), np.nan)
+        mean = np.where(n > 0, mean, np.nan)
+        return work, codes, gaps, gap_seconds, mean, std
+
+
+def _merge(state, codes, x):
+    # The count, mean and sum of squared deviations after each step x, merging the steps of each platform so far
+    # in this chunk with its earlier statistics in state (Chan et al.'s pairwise form of Welford's update).
+    valid = ~np.isnan(x)
+    n0, mean0, m20 = state[codes, 0], state[codes, 1], state[codes, 2]
+    # Deviations from a reference near the mean keep the cumulative sums from cancelling.
+    first_valid = pd.Series(np.where(valid, x, np.nan)).groupby(codes).transform('first').to_numpy()
+    reference = np.where(n0 > 0, mean0, np.nan_to_num(first_valid))
+    deviation = np.where(valid, x - reference, 0.0)
+    n_k = pd.Series(valid.astype(float)).groupby(codes).cumsum().to_numpy()
+    s1 = pd.Series(deviation).groupby(codes).cumsum().to_numpy()
+    s2 = pd.Series(deviation * deviation).groupby(codes).cumsum().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_k = np.where(n_k > 0, reference + s1 / n_k, 0.0)
+        m2_k = np.where(n_k > 0, s2 - s1 * s1 / n_k, 0.0)
+        n = n0 + n_k
+        delta = mean_k - mean0
+        mean = np.where(n > 0, mean0 + delta * n_k / n, 0.0)
+        m2 = m20 + m2_k + np.where(n > 0, delta * delta * n0 * n_k / n, 0.0)
+    return n, mean, m2
+
+
+def _insert(work, codes, gaps, is_gap, time_name, keep):
+    # Puts a NaN row before each row after a gap, half way through the gap, and the rows of each platform together.
+    after = np.flatnonzero(is_gap)
+    if len(after) == 0:
+        return work.take(np.argsort(codes, kind='stable')).reset_index(drop=True)
+
+    # The NaN rows get labels after the existing ones so reindex fills them with the right missing value for
+    # each column's dtype, then they are sorted in just before the row after the gap.
+    n = len(work)
+    labels = np.concatenate([np.arange(n), n + np.arange(len(after))])
+    order = np.lexsort((np.concatenate([np.arange(n), after - 0.5]), np.concatenate([codes, codes[after]])))
+    out = work.reindex(labels)
+    step = gaps.iloc[after].reset_index(drop=True)
+    # The row before the gap may be in an earlier chunk, its time is the time after less the gap.
+    midpoints = work[time_name].iloc[after].reset_index(drop=True) - step + step / 2
+    out[time_name] = pd.concat([work[time_name], midpoints]).set_axis(labels)
+    source = np.concatenate([np.arange(n), after])
+    for col in keep:
+        if col != time_name and col in out.columns:
+            out[col] = work[col].take(source).set_axis(labels)
+    return out.take(order).reset_index(drop=True)
@@ -0,0 +1,471 @@
+import concurrent.futures
+import hashlib
+import io
+import itertools
+import math
+import numbers
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import cache
+from sdig.erddap import fetch
+from sdig.erddap import flight
+from sdig.erddap import instrument
+from sdig.erddap import netcdf3
+from sdig.erddap import query
+from sdig.erddap.info import Info
+
+# The key=value pairs of the Value of a dimension row of index.csv, e.g. nValues=1441, evenlySpaced=true
+_DIMENSION_VALUE = re.compile('(\\w+)=([^,]*)')
+
+
+class Axis:
+    """
+    An axis of a griddap data set and its values in index order, which may be increasing or decreasing. Times are
+    Unix epoch seconds.
+
+        Parameters:
+                :param: name: the name of the axis variable
+                :type: str
+                :param: values: the value at each index
+                :type: numpy.ndarray
+                :param: is_time: whether the values are times
+                :type: bool
+    """
+    def __init__(self, name, values, is_time=False):
+        self.name = name
+        self.values = np.asarray(values, dtype=float)
+        self.is_time = is_time
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return 'Axis(' + repr(self.name) + ', ' + str(len(self)) + ' values)'
+
+    def number(self, value):
+        """
+        Returns a bound as a number comparable with the values, times as epoch seconds.
+        """
+        if self.is_time and not isinstance(value, numbers.Real):
+            return query.to_timestamp(value).timestamp()
+        return float(value)
+
+    def nearest(self, value):
+        """
+        Returns the index of the value closest to value.
+        """
+        return int(np.abs(self.values - self.number(value)).argmin())
+
+    def index_range(self, low, high):
+        """
+        Returns the first and last index of the values from low to high, either of which may be None for the end of
+        the axis. A range between two values is the index of the value nearest to it.
+
+            Parameters:
+                    :param: low: the smallest value wanted, times as anything sdig.erddap.query.to_timestamp accepts
+                    :param: high: the largest value wanted
+            Returns:
+                    :returns: start: the first index
+                    :rtype: int
+                    :returns: stop: the last index, inclusive as in an ERDDAP index range
+                    :rtype: int
+        """
+        low = -np.inf if low is None else self.number(low)
+        high = np.inf if high is None else self.number(high)
+        if low > high:
+            low, high = high, low
+        inside = np.flatnonzero((self.values >= low) & (self.values <= high))
+        if len(inside) == 0:
+            target = (low + high) / 2 if np.isfinite(low) and np.isfinite(high) else low if np.isfinite(low) else high
+            index = int(np.abs(self.values - target).argmin())
+            return index, index
+        return int(inside[0]), int(inside[-1])
+
+
+class GridSubset:
+    """
+    The index ranges of a strided subset of a griddap data set, one (start, stride, stop) for each axis with stop
+    included. The starts are multiples of the strides, so views of the same stride select the same grid points
+    and share cached chunks.
+
+        Parameters:
+                :param: axes: the axes of the data set in dimension order
+                :type: list
+                :param: ranges: (start, stride, stop) of each axis in the same order
+                :type: list
+    """
+    def __init__(self, axes, ranges):
+        self.axes = axes
+        self.ranges = ranges
+
+    def __repr__(self):
+        return 'GridSubset(' + self.constraint() + ')'
+
+    @property
+    def shape(self):
+        return tuple((stop - start) // stride + 1 for start, stride, stop in self.ranges)
+
+    def constraint(self, ranges=None):
+        """
+        Returns the ERDDAP index constraint of the subset, e.g. [0:1:10][100:4:300], or of other ranges.
+        """
+        ranges = self.ranges if ranges is None else ranges
+        return ''.join('[' + str(start) + ':' + str(stride) + ':' + str(stop) + ']' for start, stride, stop in ranges)
+
+    def url(self, data_url, variables, ranges=None):
+        """
+        Returns the URL of a griddap .nc request for the variables over the subset, or over other ranges.
+        """
+        constraint = self.constraint(ranges)
+        return data_url + '.nc?' + ','.join(variable + constraint for variable in variables)
+
+    def axis_values(self):
+        """
+        Returns the values of each axis at the points of the subset keyed by axis name, times as UTC datetimes.
+        """
+        values = {}
+        for axis, (start, stride, stop) in zip(self.axes, self.ranges):
+            picked = axis.values[start:stop + 1:stride]
+            values[axis.name] = pd.to_datetime(picked, unit='s', utc=True) if axis.is_time else picked
+        return values
+
+
+class Grid:
+    """
+    The data of a strided subset of a griddap data set, as GridInfo.get_grid returns it.
+
+        Parameters:
+                :param: axes: the values along each axis keyed by name in dimension order, time as UTC datetimes
+                :type: dict
+                :param: variables: the data of each variable keyed by name, with a dimension for each axis. Missing
+                        values are NaN.
+                :type: dict
+    """
+    def __init__(self, axes, variables):
+        self.axes = axes
+        self.variables = variables
+
+    def __repr__(self):
+        return 'Grid(' + ', '.join(name + '=' + str(len(values)) for name, values in self.axes.items()) + ')'
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.axes.values())
+
+    def to_dataframe(self):
+        """
+        Returns the grid as a DataFrame with a row for each grid point and a column for each axis and variable.
+        """
+        points = np.meshgrid(*[np.arange(len(values)) for values in self.axes.values()], indexing='ij')
+        columns = {name: values[index.ravel()] for (name, values), index in zip(self.axes.items(), points)}
+        for name, data in self.variables.items():
+            columns[name] = data.ravel()
+        return pd.DataFrame(columns)
+
+
+class GridInfo(Info):
+    """
+    An Info for a griddap data set. The axes are read from the dimension rows of index.csv and a view of the grid,
+    a bounding box, time window and output size, becomes ERDDAP index ranges with strides, so only the grid points
+    the view can show are sent. They come back as a binary .nc response decoded straight into numpy arrays. Give
+    get_grid a GridCache to keep the chunks of the grid read so far on disk.
+
+        grid_info = GridInfo('https://coastwatch.pfeg.noaa.gov/erddap/griddap/erdMH1sstdmday')
+        grid = grid_info.get_grid(['sst'], {'time': '2020-06-16', 'latitude': (20, 50), 'longitude': (-130, -110)},
+                                  {'latitude': 300, 'longitude': 300})
+
+    The DSG getters of Info do not apply to a grid.
+    """
+    def get_axes(self):
+        """
+        Returns the axes of the data set in dimension order. The values of an evenly spaced axis are computed from
+        its actual_range and nValues, which ERDDAP gives first value first. The values of the others are read
+        from the server once.
+
+        Returns:
+            :returns: axes: the axes
+            :rtype: list
+        """
+        if 'get_axes' not in self._memo:
+            self._memo['get_axes'] = self._read_axes()
+        return self._memo['get_axes']
+
+    def _read_axes(self):
+        time_name = self.get_time_variable()
+        dimensions = self.info_df[self.info_df['Row Type'] == 'dimension']
+        axes = []
+        uneven = []
+        for name, value in zip(dimensions['Variable Name'], dimensions['Value']):
+            described = dict((k, v.strip()) for k, v in _DIMENSION_VALUE.findall(str(value)))
+            n = int(described.get('nValues', 0))
+            actual_range = self.metadata.attribute(name, 'actual_range')
+            if described.get('evenlySpaced') == 'true' and isinstance(actual_range, str):
+                first, last = [float(v) for v in actual_range.split(',')]
+                values = np.linspace(first, last, n)
+            else:
+                values = None
+                uneven.append(name)
+            axes.append(Axis(name, values if values is not None else [], name == time_name))
+        if uneven:
+            body = fetch.get(self.url + '.nc?' + ','.join(uneven), self.cache)
+            dims, attributes, variables = netcdf3.read(body)
+            for axis in axes:
+                if axis.name in variables:
+                    axis.values = variables[axis.name][1].astype(float)
+        return axes
+
+    def get_grid_variables(self):
+        """
+        Returns the names of the data variables, the variables that are not axes.
+
+        Returns:
+            :returns: variables: the short names of the data variables in the order of index.csv
+            :rtype: list
+        """
+        axes = set(self.info_df.loc[self.info_df['Row Type'] == 'dimension', 'Variable Name'])
+        return [v for v in self.metadata.variables if v not in axes]
+
+    def plan_subset(self, bounds=None, shape=None):
+        """
+        Returns the index ranges and strides that cover the bounds with at most shape points along each axis.
+
+            Parameters:
+                    :param: bounds: (low, high) or a single value of each axis keyed by axis name, the whole axis for
+                            an axis that is not given. A single value is the nearest grid point. Times can be
+                            anything sdig.erddap.query.to_timestamp accepts.
+                    :type: dict
+                    :param: shape: the most points along each axis keyed by axis name, e.g. the pixel size of a map,
+                            every point for an axis that is not given
+                    :type: dict
+            Returns:
+                    :returns: subset: the index ranges
+                    :rtype: GridSubset
+        """
+        bounds = bounds or {}
+        shape = shape or {}
+        ranges = []
+        axes = self.get_axes()
+        for axis in axes:
+            bound = bounds.get(axis.name)
+            if isinstance(bound, (tuple, list)):
+                start, stop = axis.index_range(*bound)
+            elif bound is not None:
+                start = stop = axis.nearest(bound)
+            else:
+                start, stop = 0, len(axis) - 1
+            stride = 1
+            if axis.name in shape:
+                stride = max(1, math.ceil((stop - start + 1) / max(1, shape[axis.name])))
+            # Line the points up on multiples of the stride, the range holds at least one of them
+            first = -(-start // stride) * stride
+            ranges.append((first, stride, first + (stop - first) // stride * stride))
+        return GridSubset(axes, ranges)
+
+    def get_grid(self, variables, bounds=None, shape=None, cache=None):
+        """
+        Reads a strided subset of the variables as a binary .nc response, or from the chunks kept in a cache.
+
+            Parameters:
+                    :param: variables: the short names of the data variables to read
+                    :type: list
+                    :param: bounds: the range of each axis, see plan_subset
+                    :type: dict
+                    :param: shape: the most points along each axis, see plan_subset
+                    :type: dict
+                    :param: cache: a GridCache to read the chunks of the grid through, None to read the subset in one
+                            request
+                    :type: GridCache
+            Returns:
+                    :returns: grid: the axis values and data
+                    :rtype: Grid
+        """
+        subset = self.plan_subset(bounds, shape)
+        if cache is not None:
+            data = cache.read(self, variables, subset)
+        else:
+            data = read_grid(subset.url(self.url, variables), variables)
+        return Grid(subset.axis_values(), data)
+
+
+class GridCache:
+    """
+    A local disk cache of the chunks of griddap data sets. The points of a strided subset are split into chunks of
+    chunk_points along each axis and time_points along the time axis, aligned on the grid so that views of the
+    same stride share them, and a read only requests the chunks it has not seen before. Panning a map over areas already viewed is then a disk read. Chunks
+    that reach the last time step are not kept, data may still be arriving for them, and the least recently read
+    chunks are removed when the cache grows past max_bytes.
+
+        Parameters:
+                :param: directory: where to keep the chunks, created if it does not exist
+                :type: str
+                :param: chunk_points: the points along each axis of a chunk other than time
+                :type: int
+                :param: time_points: the points along the time axis of a chunk, a map shows one time step
+                :type: int
+                :param: max_bytes: the size of the chunks kept on disk before the least recently used are removed
+                :type: int
+                :param: max_workers: the most chunks read from ERDDAP at the same time
+                :type: int
+    """
+    def __init__(self, directory, chunk_points=128, time_points=1, max_bytes=2 * 1024 ** 3, max_workers=4):
+        self.directory = directory
+        self.chunk_points = chunk_points
+        self.time_points = time_points
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self, info, variables, subset):
+        """
+        Returns the data of the variables over the subset, reading only the chunks that are not on disk.
+
+            Parameters:
+                    :param: info: the GridInfo of the data set
+                    :type: GridInfo
+                    :param: variables: the short names of the data variables
+                    :type: list
+                    :param: subset: the index ranges, from GridInfo.plan_subset
+                    :type: GridSubset
+            Returns:
+                    :returns: data: the data of each variable keyed by name
+                    :rtype: dict
+        """
+        sizes = self._sizes(subset)
+        # Positions are counted in points of the stride, the subset covers positions first to last on each axis
+        first = [start // stride for start, stride, stop in subset.ranges]
+        last = [stop // stride for start, stride, stop in subset.ranges]
+        ends = [(len(axis) - 1) // stride for axis, (start, stride, stop) in zip(subset.axes, subset.ranges)]
+        strides = [stride for start, stride, stop in subset.ranges]
+        chunks = {}
+        missing = []
+        for k in itertools.product(*[range(f // size, l // size + 1) for f, l, size in zip(first, last, sizes)]):
+            data = self._load(self._path(info.url, variables, strides, k))
+            if data is None:
+                self.misses += 1
+                missing.append(k)
+            else:
+                self.hits += 1
+                chunks[k] = data
+        if missing:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {k: executor.submit(self._fetch, info, variables, subset, strides, ends, k) for k in missing}
+                for k, future in futures.items():
+                    chunks[k] = future.result()
+            self._evict()
+        # The output has a dtype every chunk fits in, chunks on disk need not all have the same one
+        out = {name: np.empty(subset.shape, dtype=np.result_type(*[data[name].dtype for data in chunks.values()]))
+               for name in variables}
+        for k, data in chunks.items():
+            # Where the chunk and the subset overlap, in the chunk and in the output
+            source = []
+            target = []
+            for j, f, l, size in zip(k, first, last, sizes):
+                low = max(j * size, f)
+                high = min((j + 1) * size - 1, l)
+                source.append(slice(low - j * size, high - j * size + 1))
+                target.append(slice(low - f, high - f + 1))
+            for name in variables:
+                out[name][tuple(target)] = data[name][tuple(source)]
+        return out
+
+    def stats(self):
+        """
+        Returns the chunk hit and miss counters and the number and size of the chunks on disk.
+        """
+        sizes = [entry.stat().st_size for entry in self._entries()]
+        return {'hits': self.hits, 'misses': self.misses, 'chunks': len(sizes), 'bytes': sum(sizes)}
+
+    def clear(self):
+        for entry in self._entries():
+            os.remove(entry.path)
+
+    def _sizes(self, subset):
+        return [self.time_points if axis.is_time else self.chunk_points for axis in subset.axes]
+
+    def _fetch(self, info, variables, subset, strides, ends, k):
+        sizes = self._sizes(subset)
+        ranges = [(j * size * stride, stride, min((j + 1) * size - 1, end) * stride)
+                  for j, size, stride, end in zip(k, sizes, strides, ends)]
+        data = read_grid(subset.url(info.url, variables, ranges), variables)
+        complete = all(not axis.is_time or (j + 1) * size - 1 < end
+                       for axis, j, size, end in zip(subset.axes, k, sizes, ends))
+        if complete:
+            self._store(self._path(info.url, variables, strides, k), data)
+        return data
+
+    def _path(self, data_url, variables, strides, k):
+        key = '|'.join([data_url, ','.join(variables), ','.join(str(s) for s in strides), ','.join(str(j) for j in k),
+                        str(self.chunk_points), str(self.time_points)])
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+    def _load(self, path):
+        try:
+            os.utime(path)
+            with np.load(path) as stored:
+                return {name: stored[name] for name in stored.files}
+        except FileNotFoundError:
+            # Never stored, or evicted by another reader since
+            return None
+
+    def _store(self, path, data):
+        buffer = io.BytesIO()
+        np.savez(buffer, **data)
+        cache.write_atomic(path, buffer.getvalue())
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.npz')]
+
+    def _evict(self):
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries()]
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def read_grid(url, variables):
+    """
+    Reads a griddap .nc request and returns the data of the variables as numpy arrays with a dimension for each
+    axis. Values equal to _FillValue or missing_value become NaN.
+
+        Parameters:
+                :param: url: the request URL, e.g. from GridSubset.url
+                :type: str
+                :param: variables: the short names of the data variables requested
+                :type: list
+        Returns:
+                :returns: data: the data of each variable keyed by name
+                :rtype: dict
+    """
+    with instrument.span('griddap', url) as event:
+        # Identical requests made at the same time share one read, each caller gets its own arrays.
+        return flight.flights.do(url, lambda: _read_grid(url, variables, event),
+                                 copy=lambda data: {name: values.copy() for name, values in data.items()})
+
+
+def _read_grid(url, variables, event):
+    body = fetch.get(url)
+    dimensions, attributes, decoded = netcdf3.read(body)
+    data = {}
+    for name in variables:
+        dims, values, var_attributes = decoded[name]
+        missing = [var_attributes[a] for a in ('_FillValue', 'missing_value') if a in var_attributes]
+        if missing and values.dtype.kind in ('i', 'u', 'f'):
+            # Promote even when this request has no missing values, so every chunk of a variable has the same dtype
+            values = values.astype(np.result_type(values.dtype, np.float32))
+            values[np.isin(values, np.asarray(missing, dtype=values.dtype))] = np.nan
+        data[name] = values
+    if event is not None:
+        event['rows'] = int(sum(values.size for values in data.values()))
+    return data
@@ -1,22 +1,137 @@
 import pandas as pd
+import asyncio
+import collections
+import concurrent.futures
 import datetime
 import dateutil.parser
+import functools
+import io
+import itertools
+import numbers
 import re
+import threading
+import time
 import urllib
-import numpy as np
+
+from sdig.erddap import decimate
+from sdig.erddap import fetch
+from sdig.erddap import flight
+from sdig.erddap import gaps
+from sdig.erddap import instrument
+from sdig.erddap import planner
+from sdig.erddap import query
+from sdig.erddap.dtypes import DtypePlan
+from sdig.erddap.metadata import Metadata
+
+
+# An ISO 8601 duration such as P1M, PT1H or P1DT12H, and the seconds in each of its parts. A month is 30.44 days
+# and a year 365.25.
+_ISO_DURATION = re.compile('P(?:{0}Y)?(?:{0}M)?(?:{0}W)?(?:{0}D)?(?:T(?:{0}H)?(?:{0}M)?(?:{0}S)?)?'.format(
+    '([0-9]+(?:\\.[0-9]+)?)'))
+_ISO_DURATION_SECONDS = (365.25 * 86400, 30.44 * 86400, 7 * 86400, 86400, 3600, 60, 1)
+
+
+def _memoized(getter):
+    # Keep the result of a getter that takes no arguments, the metadata it is derived from does not change. Each
+    # call gets its own copy so a caller changing the lists and dicts does not change what later calls return.
+    @functools.wraps(getter)
+    def wrapper(self):
+        if getter.__name__ not in self._memo:
+            self._memo[getter.__name__] = getter(self)
+        return _copy(self._memo[getter.__name__])
+    return wrapper
+
+
+def _copy(value):
+    # Copy the containers a getter returns, the strings and numbers in them cannot change
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    if isinstance(value, (list, dict)):
+        return type(value)(value)
+    if isinstance(value, DtypePlan):
+        return DtypePlan(value.dtypes, value.times)
+    return value
 
 
 class Info:
-    def __init__(self, data_url):
+    # The cache used by every Info that is not given one, see set_cache
+    cache = None
+
+    def __init__(self, data_url, cache=None, lazy=False):
+        """
+        Reads the metadata of an ERDDAP data set from its info/dataset_id/index.csv.
+
+            Parameters:
+                    :param: data_url: the data URL of the data set, with or without .html
+                    :type: str
+                    :param: cache: a MemoryCache or DiskCache from sdig.erddap.cache, the default cache if None
+                    :type: sdig.erddap.cache.MemoryCache
+                    :param: lazy: do not read the metadata until it is first needed, or prefetch() is called
+                    :type: bool
+        """
         if data_url.endswith('.html'):
             data_url = re.sub('\\.html$', '', data_url)
         self.url = data_url
-        info_url = Info.get_info_url(data_url)
-        self.info_df = pd.read_csv(info_url)
-        dsg_type_i = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Variable Name'] == 'NC_GLOBAL') & (
-                self.info_df['Attribute Name'] == 'cdm_data_type')]['Value'].unique())[0]
-        self.dsg_type = dsg_type_i.lower()
-        
+        if cache is None:
+            cache = Info.cache
+        self.cache = cache
+        self._info_df = None
+        self._metadata = None
+        self._dsg_type = None
+        self._memo = {}
+        self._lock = threading.Lock()
+        if not lazy:
+            self.prefetch()
+
+    @property
+    def info_df(self):
+        return self.prefetch()._info_df
+
+    @property
+    def metadata(self):
+        return self.prefetch()._metadata
+
+    @property
+    def dsg_type(self):
+        if self._dsg_type is not None:
+            return self._dsg_type
+        return self.prefetch()._dsg_type
+
+    def prefetch(self):
+        """
+        Reads the metadata now if it has not been read yet. Only needed for an Info constructed with lazy=True, to
+        read the metadata before the first getter call.
+
+            Returns:
+                :returns: info: this Info
+                :rtype: Info
+        """
+        if self._metadata is None:
+            with self._lock:
+                if self._metadata is None:
+                    info_url = Info.get_info_url(self.url)
+                    with instrument.span('info', info_url) as event:
+                        # Infos of the same data set made at the same time share one read and parse.
+                        self._set_metadata(*flight.flights.do(
+                            info_url, lambda: _parse_metadata(fetch.get(info_url, self.cache), event)))
+        return self
+
+    def _set_metadata(self, info_df, metadata):
+        self._dsg_type = metadata.attribute('NC_GLOBAL', 'cdm_data_type').lower()
+        self._info_df = info_df
+        self._metadata = metadata
+
+    async def aprefetch(self):
+        """
+        Awaitable prefetch(), reads the metadata on a worker thread so the event loop is not blocked.
+
+            Returns:
+                :returns: info: this Info
+                :rtype: Info
+        """
+        return await asyncio.to_thread(self.prefetch)
+
+    @_memoized
     def get_dsg_type(self):
         """
         Returns the dsg_type of the data set. One of timeseries, profile, trajectory, timeseriesprofile.
@@ -27,6 +142,7 @@ class Info:
         """
         return self.dsg_type
 
+    @_memoized
     def get_dsg_info(self):
         """
         Returns the name of the Z variable as a string and the DSG ID of the data set as a dict
@@ -43,84 +159,63 @@ class Info:
         dsg_id = {}
         depth_name = None
         if self.dsg_type == 'timeseries':
-            timeseries_id = list(self.info_df.loc[
-                                     (self.info_df['Row Type'] == 'attribute') & (self.info_df['Value'] == 'timeseries_id') & (
-                                             self.info_df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
-            dsg_id['timeseries'] = timeseries_id
+            dsg_id['timeseries'] = self._cf_role_variable('timeseries_id')
         elif self.dsg_type == 'trajectory':
-            trajectory_id = list(self.info_df.loc[
-                                     (self.info_df['Row Type'] == 'attribute') & (self.info_df['Value'] == 'trajectory_id') & (
-                                             self.info_df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
-            dsg_id['trajectory'] = trajectory_id
+            dsg_id['trajectory'] = self._cf_role_variable('trajectory_id')
         elif self.dsg_type == 'profile':
-            profile_id = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Value'] == 'profile_id') & (
-                    self.info_df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
-            dsg_id['profile'] = profile_id
-    
-            # Try to find the vertical proxy first.
-            depth_name = None
-            depth_series =  self.info_df.loc[
-                (self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'cdm_altitude_proxy') & (
-                        self.info_df['Variable Name'] == 'NC_GLOBAL')]['Value']
-            if len(depth_series) > 0:
-                depth_name = depth_series.to_list()[0]
-    
-            if depth_name is None:
-                depth_name = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'positive')][
-                                      'Variable Name'].unique())[0]
-    
+            dsg_id['profile'] = self._cf_role_variable('profile_id')
+            depth_name = self._depth_variable()
         elif self.dsg_type == 'timeseriesprofile':
-            profile_id = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Value'] == 'profile_id') & (
-                    self.info_df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
-            dsg_id['profile'] = profile_id
-            timeseries_id = list(self.info_df.loc[
-                                     (self.info_df['Row Type'] == 'attribute') & (self.info_df['Value'] == 'timeseries_id') & (
-                                             self.info_df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
-            dsg_id['timeseries'] = timeseries_id
-            depth_name = None
-            att_series = self.info_df.loc[
-                (self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'cdm_altitude_proxy') & (
-                        self.info_df['Variable Name'] == 'NC_GLOBAL')]['Value']
-            if len(att_series) > 0:
-                depth_name = att_series.to_list()[0]
-            if depth_name is None:
-                depth_name = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'positive')][
-                                      'Variable Name'].unique())[0]
+            dsg_id['profile'] = self._cf_role_variable('profile_id')
+            dsg_id['timeseries'] = self._cf_role_variable('timeseries_id')
+            depth_name = self._depth_variable()
         elif self.dsg_type == 'trajectoryprofile':
-            profile_id = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Value'] == 'profile_id') & (
-                    self.info_df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
-            dsg_id['profile'] = profile_id
-            trajectory_id = list(self.info_df.loc[
-                                     (self.info_df['Row Type'] == 'attribute') & (self.info_df['Value'] == 'trajectory_id') & (
-                                             self.info_df['Attribute Name'] == 'cf_role')]['Variable Name'].unique())[0]
-            dsg_id['trajectory'] = trajectory_id
-            depth_name = None
-            att_series = self.info_df.loc[
-                (self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'cdm_altitude_proxy') & (
-                        self.info_df['Variable Name'] == 'NC_GLOBAL')]['Value']
-            if len(att_series) > 0:
-                depth_name = att_series.to_list()[0]
-            if depth_name is None:
-                depth_name = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'positive')][
-                                      'Variable Name'].unique())[0]
-        return depth_name, dsg_id    
-
-    def get_depths(self):
-        """
-        Returns a list of depths read directly from an ERDDAP data source.
+            dsg_id['profile'] = self._cf_role_variable('profile_id')
+            dsg_id['trajectory'] = self._cf_role_variable('trajectory_id')
+            depth_name = self._depth_variable()
+        return depth_name, dsg_id
+
+    def _cf_role_variable(self, cf_role):
+        return self.metadata.variables_with('cf_role', cf_role)[0]
+
+    def _depth_variable(self):
+        # Try to find the vertical proxy first.
+        depth_name = self.metadata.attribute('NC_GLOBAL', 'cdm_altitude_proxy')
+        if depth_name is None:
+            depth_name = self.metadata.variables_with('positive')[0]
+        return depth_name
+
+    def get_depths(self, file_type='csv', index=None):
+        """
+        Returns a list of depths read directly from an ERDDAP data source, or from a DistinctIndex if one is given.
 
+            Parameters:
+                    :param: file_type: the ERDDAP response type to read, one of csv, nc or parquet. Falls back to csv
+                    when the type cannot be decoded here or the server does not support it.
+                    :type: str
+                    :param: index: a DistinctIndex of this data set from sdig.erddap.distinct, answers without a request
+                    :type: sdig.erddap.distinct.DistinctIndex
             Returns:
                     :returns: depths: a sorted list of distinct depths.
                     :rtype: list
         """
-        dsg_type = self.get_dsg_type()
+        if index is not None:
+            return index.depths()
         depth_name, dsg_id = self.get_dsg_info()
-        depth_url = self.url + '.csv?' + depth_name + '&distinct()&orderBy("' + depth_name + '")'
-        depth_df = pd.read_csv(depth_url, skiprows=[1])
+        request = self._depths_request(file_type)
+        with instrument.span('get_depths', query.tabledap_url(*request)):
+            depth_df = query.read_table(*request)
+        if depth_df is None:
+            return []
         depths = depth_df[depth_name].to_list()
         return depths
 
+    def _depths_request(self, file_type):
+        depth_name, dsg_id = self.get_dsg_info()
+        return self.url, [depth_name], ['distinct()', 'orderBy("' + depth_name + '")'], file_type
+
     
+    @_memoized
     def get_times(self):
         """
         Returns a tuple of start time and end times both as YYYY-MM-dd string as Unix epoch seconds read from the metadata
@@ -136,16 +231,11 @@ class Info:
                 :returns: end_date_seconds: the end date as seconds from the Unix epoch
                 :rtype: float
         """
-        chk_start_date = self.info_df.loc[
-            (self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'time_coverage_start') & (
-                    self.info_df['Variable Name'] == 'NC_GLOBAL')]['Value'].to_list()[0]
-    
-        chk_end_date = self.info_df.loc[
-            (self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'time_coverage_end') & (
-                    self.info_df['Variable Name'] == 'NC_GLOBAL')]['Value'].to_list()[0]
-    
-        start_date_datetime = dateutil.parser.isoparse(chk_start_date)
-        end_date_datetime = dateutil.parser.isoparse(chk_end_date)
+        chk_start_date = self.metadata.attribute('NC_GLOBAL', 'time_coverage_start')
+        chk_end_date = self.metadata.attribute('NC_GLOBAL', 'time_coverage_end')
+
+        start_date_datetime = _parse_time(chk_start_date)
+        end_date_datetime = _parse_time(chk_end_date)
     
         start_date = start_date_datetime.date().strftime('%Y-%m-%d')
         end_date = end_date_datetime.date().strftime('%Y-%m-%d')
@@ -154,6 +244,7 @@ class Info:
         end_date_seconds = end_date_datetime.timestamp()
         return start_date, end_date, start_date_seconds, end_date_seconds
 
+    @_memoized
     def get_variables(self):
         """
         Returns a tuple list and dictionaries describing the data variables in an ERDDAP data set. Check if the key
@@ -169,21 +260,228 @@ class Info:
                 :returns: standard_names: a dict of variable standard_name values with the short names as the keys
                 :rtype: dict
         """
-        variables = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Variable Name'] != 'NC_GLOBAL')][
-            'Variable Name'].unique())
-        long_df_all = self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'long_name')]
-        long_df = long_df_all.drop_duplicates(subset=['Variable Name'])
-        long_names = dict(zip(long_df['Variable Name'], long_df['Value'].str.capitalize()))
-        unit_df = self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'units')]
-        units = dict(zip(unit_df['Variable Name'], unit_df['Value']))
-        std_nme_all = self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Attribute Name'] == 'standard_name')]
-        std_nme_df = std_nme_all.drop_duplicates(subset=['Variable Name'])
-        standard_names = dict(zip(std_nme_df['Variable Name'], std_nme_df['Value'].astype(str)))
-        v_types = list(self.info_df.loc[(self.info_df['Row Type'] == 'variable') & (self.info_df['Variable Name'] != 'NC_GLOBAL')][
-                           'Data Type'])
-        variable_types = dict(zip(variables, v_types))
+        variables = list(self.metadata.variables)
+        long_names = {v: values[0].capitalize() if isinstance(values[0], str) else values[0]
+                      for v, values in self.metadata.attribute_values('long_name').items()}
+        units = {v: values[-1] for v, values in self.metadata.attribute_values('units').items()}
+        standard_names = {v: str(values[0]) for v, values in self.metadata.attribute_values('standard_name').items()}
+        variable_types = {v: self.metadata.data_types[v] for v in variables if v in self.metadata.data_types}
         return variables, long_names, units, standard_names, variable_types
 
+    @_memoized
+    def get_dtypes(self):
+        """
+        Returns the compact pandas dtype of each variable planned from its declared Data Type and DSG role: the
+        declared width for numbers, category for the id variables and datetime64 for the times.
+
+        Returns:
+                :returns: plan: the dtypes keyed by variable name and the time variables
+                :rtype: sdig.erddap.dtypes.DtypePlan
+        """
+        return DtypePlan.from_info(self)
+
+    def get_data(self, variables, start=None, end=None, platforms=None, time_chunk=None, platforms_per_chunk=None,
+                 max_workers=4, file_type='csv', parse_times=False, compact=False):
+        """
+        Reads data from the data set in chunks and yields each chunk as a DataFrame as soon as it is read, so
+        the first rows can be used while the rest is still downloading and only a few chunks are in memory
+        at once. The request is split into time windows of time_chunk and into groups of platforms_per_chunk
+        platforms, and up to max_workers chunks are read at the same time. Chunks are yielded in time order
+        for each group of platforms, chunks with no data are skipped.
+
+            Parameters:
+                    :param: variables: the short names of the variables to read
+                    :type: list
+                    :param: start: the start time, ISO string or Unix epoch seconds, the start of the data if None
+                    :type: str or float
+                    :param: end: the end time, ISO string or Unix epoch seconds, the end of the data if None
+                    :type: str or float
+                    :param: platforms: the id or list of ids of the platforms to read, all platforms if None
+                    :type: list or str
+                    :param: time_chunk: the length of each time window, e.g. '30D', no time split if None
+                    :type: str or pandas.Timedelta
+                    :param: platforms_per_chunk: the most platforms in each request, no platform split if None
+                    :type: int
+                    :param: max_workers: the most chunks read at the same time
+                    :type: int
+                    :param: file_type: the ERDDAP response type to read, one of csv, nc or parquet. The binary types
+                    decode straight into typed columns with time as datetime64. Falls back to csv when the type cannot
+                    be decoded here or the server does not support it.
+                    :type: str
+                    :param: parse_times: return the times as UTC datetime64 whatever the file_type, by asking for
+                    epoch seconds (nc) or decoding the csv times in one pass, see sdig.erddap.query.read_table
+                    :type: bool
+                    :param: compact: decode the columns into the dtypes of get_dtypes rather than float64 and str, a
+                    fraction of the memory. Join the chunks with sdig.erddap.dtypes.concat to keep the ids category.
+                    :type: bool
+            Returns:
+                    :returns: chunks: a generator of DataFrames
+                    :rtype: generator
+        """
+        requests = self._data_requests(variables, start, end, platforms, time_chunk, platforms_per_chunk, file_type)
+        return _read_chunks(requests, max_workers, parse_times, self.get_dtypes() if compact else None)
+
+    def _data_requests(self, variables, start, end, platforms, time_chunk, platforms_per_chunk, file_type):
+        # The query.read_table arguments of each chunk of a get_data call, in the order the chunks are yielded.
+        time_name = self.get_time_variable()
+        platform_name = self.get_platform_variable()
+        if time_chunk is not None and (start is None or end is None):
+            start_date, end_date, start_date_seconds, end_date_seconds = self.get_times()
+            start = start_date_seconds if start is None else start
+            end = end_date_seconds if end is None else end
+        if start is None or end is None:
+            windows = [(start, end, True)]
+        else:
+            windows = query.time_windows(start, end, time_chunk)
+        # Split the platforms further where one =~ of all of them would make a URL longer than ERDDAP accepts
+        base = max(len(query.tabledap_url(self.url, variables, query.time_constraints(time_name, *window),
+                                          file_type)) for window in windows)
+        requests = []
+        for chunk in query.platform_groups(platforms, platforms_per_chunk):
+            for group in planner.split_platforms(platform_name, chunk, planner.MAX_URL_LENGTH - base - 1):
+                con = Info.make_platform_constraint(platform_name, group)['con'] if group is not None else ''
+                for w_start, w_end, end_inclusive in windows:
+                    constraints = query.time_constraints(time_name, w_start, w_end, end_inclusive)
+                    requests.append((self.url, variables, constraints + [con], file_type))
+        return requests
+
+    def plan_query(self, variables, start=None, end=None, platforms=None, n_out=1000, method='mean',
+                   file_type='csv', max_url_length=planner.MAX_URL_LENGTH):
+        """
+        Plans the requests for a view of about n_out rows per platform, see sdig.erddap.planner.plan_query. When
+        the view spans more than n_out samples of the data, as given by the time_coverage_resolution attribute, the
+        server bins the rows by time and reduces each bin with method, so an overview of years of data is a few
+        thousand rows rather than millions. The platforms are split across requests to keep each URL shorter than
+        max_url_length.
+
+            Parameters:
+                    :param: variables: the short names of the variables to read
+                    :type: list
+                    :param: start: the start time, ISO string or Unix epoch seconds, the start of the data if None
+                    :type: str or float
+                    :param: end: the end time, ISO string or Unix epoch seconds, the end of the data if None
+                    :type: str or float
+                    :param: platforms: the id or list of ids of the platforms to read, all platforms if None
+                    :type: list or str
+                    :param: n_out: the rows wanted for each platform, e.g. the width of the plot in pixels
+                    :type: int
+                    :param: method: mean, closest, minmax or count, see sdig.erddap.planner.REDUCTIONS
+                    :type: str
+                    :param: file_type: the ERDDAP response type to read, one of csv, nc or parquet
+                    :type: str
+                    :param: max_url_length: the longest URL to send
+                    :type: int
+            Returns:
+                    :returns: plan: the requests
+                    :rtype: sdig.erddap.planner.QueryPlan
+        """
+        if start is None or end is None:
+            start_date, end_date, start_date_seconds, end_date_seconds = self.get_times()
+            start = start_date_seconds if start is None else start
+            end = end_date_seconds if end is None else end
+        variable_names, long_names, units, standard_names, variable_types = self.get_variables()
+        numeric = [v for v in variable_names if variable_types.get(v) not in (None, 'String', 'char')]
+        return planner.plan_query(self.url, variables, self.get_time_variable(), self.get_platform_variable(), start,
+                                  end, platforms, n_out, method, self.get_time_resolution(), numeric, file_type,
+                                  max_url_length)
+
+    def get_reduced(self, variables, start=None, end=None, platforms=None, n_out=1000, method='mean',
+                    max_workers=4, file_type='csv', parse_times=False, compact=False):
+        """
+        Reads a view of about n_out rows per platform with the requests of plan_query, up to max_workers at the
+        same time, and returns them as one DataFrame sorted by platform and time. This is the read for an overview
+        plot: zoomed out, ERDDAP does the binning and only the reduced rows are sent, zoomed in far enough the
+        rows are read as they are.
+
+            Parameters:
+                    :param: variables: the short names of the variables to read
+                    :type: list
+                    :param: start: the start time, ISO string or Unix epoch seconds, the start of the data if None
+                    :type: str or float
+                    :param: end: the end time, ISO string or Unix epoch seconds, the end of the data if None
+                    :type: str or float
+                    :param: platforms: the id or list of ids of the platforms to read, all platforms if None
+                    :type: list or str
+                    :param: n_out: the rows wanted for each platform, e.g. the width of the plot in pixels
+                    :type: int
+                    :param: method: mean, closest, minmax or count, see sdig.erddap.planner.REDUCTIONS
+                    :type: str
+                    :param: max_workers: the most requests read at the same time
+                    :type: int
+                    :param: file_type: the ERDDAP response type to read, one of csv, nc or parquet
+                    :type: str
+                    :param: parse_times: return the times as UTC datetime64, as get_data does
+                    :type: bool
+                    :param: compact: decode the columns into the dtypes of get_dtypes, as get_data does
+                    :type: bool
+            Returns:
+                    :returns: df: the rows
+                    :rtype: Dataframe
+        """
+        plan = self.plan_query(variables, start, end, platforms, n_out, method, file_type)
+        with instrument.span('get_reduced', self.url):
+            return planner.read(plan, max_workers, parse_times, self._reduced_dtypes(plan, compact))
+
+    def _reduced_dtypes(self, plan, compact):
+        # Counts and means are not of the declared type of the variable, only the ids and times keep theirs.
+        if not compact:
+            return None
+        dtype_plan = self.get_dtypes()
+        if plan.method in ('mean', 'count'):
+            return dtype_plan.without([v for v in dtype_plan.dtypes if v not in plan.keys])
+        return dtype_plan
+
+    @_memoized
+    def get_time_resolution(self):
+        """
+        Returns the time between samples of the data from the time_coverage_resolution global attribute, an ISO
+        8601 duration such as PT1H or P1M. A month counts as 30.44 days and a year as 365.25.
+
+        Returns:
+            :returns: resolution: the time between samples, None if the attribute is missing or cannot be read
+            :rtype: pandas.Timedelta
+        """
+        resolution = self.metadata.attribute('NC_GLOBAL', 'time_coverage_resolution')
+        if not isinstance(resolution, str):
+            return None
+        # Not pandas.Timedelta, which reads the M of P1M as minutes and does not take years
+        match = _ISO_DURATION.fullmatch(resolution.strip().upper())
+        if match is None or not any(match.groups()):
+            return None
+        parts = [float(part) if part else 0 for part in match.groups()]
+        return pd.Timedelta(sum(part * seconds for part, seconds in zip(parts, _ISO_DURATION_SECONDS)), unit='s')
+
+    @_memoized
+    def get_time_variable(self):
+        """
+        Returns the name of the time variable, the variable with _CoordinateAxisType Time or 'time'.
+
+        Returns:
+            :returns: time_name: the short name of the time variable
+            :rtype: str
+        """
+        time_names = self.metadata.variables_with('_CoordinateAxisType', 'Time')
+        if len(time_names) > 0:
+            return time_names[0]
+        return 'time'
+
+    @_memoized
+    def get_platform_variable(self):
+        """
+        Returns the name of the variable that identifies a platform: the timeseries id, else the trajectory id,
+        else the profile id. This is the variable make_platform_constraint is used with.
+
+        Returns:
+            :returns: platform_name: the short name of the id variable, None if the data set has no id variable
+            :rtype: str
+        """
+        depth_name, dsg_id = self.get_dsg_info()
+        for dsg_type in ('timeseries', 'trajectory', 'profile'):
+            if dsg_type in dsg_id:
+                return dsg_id[dsg_type]
+        return None
+
+    @_memoized
     def get_title(self):
         """
         Returns the value of the title global attribute of the data set.
@@ -193,11 +491,73 @@ class Info:
             :rtype: str
     
         """
-        title = list(self.info_df.loc[(self.info_df['Row Type'] == 'attribute') & (self.info_df['Variable Name'] == 'NC_GLOBAL') & (
-                    self.info_df['Attribute Name'] == 'title')]['Value'].unique())[0]
+        title = self.metadata.attribute('NC_GLOBAL', 'title')
         return title
 
 
+    @classmethod
+    def set_cache(cls, cache):
+        """
+        Sets the cache used for the metadata of every Info constructed without an explicit cache.
+
+            Parameters:
+                    :param: cache: a MemoryCache or DiskCache from sdig.erddap.cache, or None to turn caching off
+                    :type: sdig.erddap.cache.MemoryCache
+        """
+        cls.cache = cache
+
+    @classmethod
+    def load_many(cls, data_urls, max_workers=16, cache=None):
+        """
+        Constructs an Info for each of a list of data URLs, reading the index.csv files concurrently over the
+        pooled connections of sdig.erddap.fetch. A data set that cannot be read does not stop the others, its
+        exception is reported in the errors dict instead of being raised.
+
+            Parameters:
+                    :param: data_urls: the data URLs of the data sets, as they would be passed to Info
+                    :type: list
+                    :param: max_workers: the most index.csv files read at the same time
+                    :type: int
+                    :param: cache: a MemoryCache or DiskCache from sdig.erddap.cache, the default cache if None
+                    :type: sdig.erddap.cache.MemoryCache
+            Returns:
+                    :returns: infos: the Info of each data set that was read keyed by its data URL
+                    :rtype: dict
+                    :returns: errors: the exception of each data set that could not be read keyed by its data URL
+                    :rtype: dict
+        """
+        infos = {}
+        errors = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(cls, data_url, cache): data_url for data_url in data_urls}
+            for future in concurrent.futures.as_completed(futures):
+                data_url = futures[future]
+                try:
+                    infos[data_url] = future.result()
+                except Exception as e:
+                    errors[data_url] = e
+        return infos, errors
+
+    @classmethod
+    def from_snapshot(cls, snapshot, cache=None):
+        """
+        Constructs an Info from a Snapshot of its metadata without reading index.csv. The getters answer from the
+        snapshot, only info_df and metadata read index.csv if they are used.
+
+            Parameters:
+                    :param: snapshot: the snapshot, e.g. from a SnapshotStore
+                    :type: sdig.erddap.snapshot.Snapshot
+                    :param: cache: a MemoryCache or DiskCache from sdig.erddap.cache, the default cache if None
+                    :type: sdig.erddap.cache.MemoryCache
+            Returns:
+                    :returns: info: the Info of the data set
+                    :rtype: Info
+        """
+        info = cls(snapshot.url, cache=cache, lazy=True)
+        info._dsg_type = snapshot.values['get_dsg_type']
+        info._memo.update(snapshot.values)
+        return info
+
     @classmethod
     def make_platform_constraint(cls, dsg_id_var, in_platforms):
         """
@@ -236,17 +596,17 @@ class Info:
         Make some time marks for the time slider, only one mark at the beginning and one mark at the end
 
         Parameters:
-            :param: start: start time as Unix epoch seconds
+            :param: start: start time as Unix epoch seconds, or a datetime64 or Timestamp e.g. from a time column
             :type: float
-            :param: end: end time as Unix epoch seconds
+            :param: end: end time as Unix epoch seconds, or a datetime64 or Timestamp e.g. from a time column
             :type: float
 
         Returns:
             :returns: marks: the marks as suitable for input into the slider DASH widget
             :rtype: dict
         """
-        start_obj = datetime.datetime.fromtimestamp(start)
-        end_obj = datetime.datetime.fromtimestamp(end)
+        start_obj = datetime.datetime.fromtimestamp(_epoch_seconds(start))
+        end_obj = datetime.datetime.fromtimestamp(_epoch_seconds(end))
         label_0 = str(start_obj.strftime('%Y-%m'))
         value_0 = int(start_obj.timestamp())
         label_n = str(end_obj.strftime('%Y-%m'))
@@ -292,45 +652,217 @@ class Info:
         :type: str
         :param: id_name: the column name of the timeseries ID
         :type: str
-        :param: list: the names of the columns which are to be copied into the NaN rows
+        :param: keep: the names of the columns which are to be copied into the NaN rows
         :type: list
         :param: n_std: the number of standard deviations wide the gap must be to be considered a gap
+        :type: float
         :return: The Dataframe with the NaN row in gap
         :rtype: Dataframe
         """
-        df[time_name] = pd.to_datetime(df[time_name])
-        processed = []
-        id_values = df[id_name].unique()
-        for e_id in id_values:
-            id_df = df[df[id_name]==e_id].copy()
-            gaps = id_df['time'].diff()[1:]
-            stats = gaps.describe()
-            factor = stats['std']*n_std
-            if factor > stats['mean']:
-                breaks = gaps[gaps>factor]
-                after = breaks.index
-                before = breaks.index - 1
-                insert = breaks.index - .5
-                for g in range(0, len(after)):
-                    b = before[g]
-                    b_row = df.loc[b]
-                    i = insert[g]
-                    a = after[g]
-                    a_row = id_df.loc[a]
-                    row = []
-                    for col in df.columns:
-                        if col == time_name:
-                            i_time = b_row[time_name] + (a_row[time_name] - b_row[time_name])/2.0
-                            row.append(i_time)
-                        elif col in keep:
-                            row.append(a_row[col])
-                        else:
-                            row.append(np.nan)
-                    id_df.loc[i] = row
-                id_df.sort_index(inplace=True)
-                id_df.reset_index(inplace=True, drop=True)
-            processed.append(id_df)
-        df = pd.concat(processed)
-        df = df.reset_index(drop=True)
-        return df
+        return gaps.plug_gaps(df, time_name, id_name, keep, n_std)
+
+    @classmethod
+    def decimate(cls, df, time_name, id_name, values, n_out=1000, method='minmax'):
+        """
+        Reduces each platform to about n_out points for plotting without joining across the NaN rows of plug_gaps,
+        see sdig.erddap.decimate.decimate.
+
+        :param: df: a Dataframe, e.g. the output of plug_gaps
+        :type: Dataframe
+        :param: time_name: the name of the column in the Dataframe that contains the time
+        :type: str
+        :param: id_name: the column name of the timeseries ID
+        :type: str
+        :param: values: the names of the plotted columns
+        :type: list
+        :param: n_out: the points wanted for each platform, e.g. the width of the plot in pixels
+        :type: int
+        :param: method: minmax or lttb
+        :type: str
+        :return: The rows that were kept
+        :rtype: Dataframe
+        """
+        return decimate.decimate(df, time_name, id_name, values, n_out, method)
+
+
+class AsyncInfo(Info):
+    """
+    An Info for asyncio code. The metadata and data are read through an asyncio HTTP session that reuses
+    connections and limits the requests in flight to each host, so a server on an event loop can load many data
+    sets at the same time without blocking the loop or holding a worker thread per request. Construct it with
+    open, which reads the metadata before returning:
+
+        info = await AsyncInfo.open(data_url)
+        depths = await info.get_depths()
+
+    The getters that only look at the metadata are the ones of Info and answer without I/O. get_depths,
+    get_data and get_reduced are coroutines here.
+    """
+    def __init__(self, data_url, cache=None, session=None):
+        """
+        Makes an AsyncInfo without reading the metadata, use open or await aprefetch() before the getters.
+
+            Parameters:
+                    :param: data_url: the data URL of the data set, with or without .html
+                    :type: str
+                    :param: cache: a MemoryCache or DiskCache from sdig.erddap.cache, the default cache if None
+                    :type: sdig.erddap.cache.MemoryCache
+                    :param: session: the sdig.erddap.fetch.AsyncSession to read with, the shared one if None
+                    :type: sdig.erddap.fetch.AsyncSession
+        """
+        super().__init__(data_url, cache=cache, lazy=True)
+        self.session = fetch.async_session if session is None else session
+
+    @classmethod
+    async def open(cls, data_url, cache=None, session=None):
+        """
+        Returns the AsyncInfo of a data set with its metadata read.
+
+            Parameters:
+                    :param: data_url: the data URL of the data set, with or without .html
+                    :type: str
+                    :param: cache: a MemoryCache or DiskCache from sdig.erddap.cache, the default cache if None
+                    :type: sdig.erddap.cache.MemoryCache
+                    :param: session: the sdig.erddap.fetch.AsyncSession to read with, the shared one if None
+                    :type: sdig.erddap.fetch.AsyncSession
+            Returns:
+                    :returns: info: the AsyncInfo
+                    :rtype: AsyncInfo
+        """
+        return await cls(data_url, cache=cache, session=session).aprefetch()
+
+    @classmethod
+    async def open_many(cls, data_urls, cache=None, session=None):
+        """
+        The asyncio load_many: opens the data sets concurrently, limited only by the per host limit of the session.
+        A data set that cannot be read does not stop the others, its exception is reported in the errors dict.
+
+            Returns:
+                    :returns: infos: the AsyncInfo of each data set that was read keyed by its data URL
+                    :rtype: dict
+                    :returns: errors: the exception of each data set that could not be read keyed by its data URL
+                    :rtype: dict
+        """
+        results = await asyncio.gather(*[cls.open(data_url, cache=cache, session=session) for data_url in data_urls],
+                                       return_exceptions=True)
+        infos = {}
+        errors = {}
+        for data_url, result in zip(data_urls, results):
+            if isinstance(result, Exception):
+                errors[data_url] = result
+            else:
+                infos[data_url] = result
+        return infos, errors
+
+    async def aprefetch(self):
+        """
+        Reads the metadata through the session if it has not been read yet.
+
+            Returns:
+                :returns: info: this AsyncInfo
+                :rtype: AsyncInfo
+        """
+        if self._metadata is None:
+            info_url = Info.get_info_url(self.url)
+            with instrument.span('info', info_url) as event:
+                async def read():
+                    return _parse_metadata(await self.session.get(info_url, self.cache), event)
+                info_df, metadata = await flight.flights.ado(info_url, read)
+                if self._metadata is None:
+                    self._set_metadata(info_df, metadata)
+        return self
+
+    async def get_depths(self, file_type='csv', index=None):
+        """
+        Awaitable Info.get_depths.
+        """
+        if index is not None:
+            return index.depths()
+        depth_name, dsg_id = self.get_dsg_info()
+        request = self._depths_request(file_type)
+        with instrument.span('get_depths', query.tabledap_url(*request)):
+            depth_df = await query.aread_table(*request, session=self.session)
+        if depth_df is None:
+            return []
+        return depth_df[depth_name].to_list()
+
+    async def get_data(self, variables, start=None, end=None, platforms=None, time_chunk=None,
+                       platforms_per_chunk=None, max_workers=4, file_type='csv', parse_times=False, compact=False):
+        """
+        Asynchronous Info.get_data, use it with async for. Up to max_workers chunks are read at the same time and
+        chunks are yielded in the same order.
+        """
+        requests = iter(self._data_requests(variables, start, end, platforms, time_chunk, platforms_per_chunk,
+                                            file_type))
+        plan = self.get_dtypes() if compact else None
+
+        def read(request):
+            return asyncio.ensure_future(query.aread_table(*request, session=self.session, parse_times=parse_times,
+                                                           plan=plan))
+        pending = collections.deque(read(request) for request in itertools.islice(requests, max_workers))
+        try:
+            while pending:
+                df = await pending.popleft()
+                request = next(requests, None)
+                if request is not None:
+                    pending.append(read(request))
+                if df is not None:
+                    yield df
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_reduced(self, variables, start=None, end=None, platforms=None, n_out=1000, method='mean',
+                          max_workers=4, file_type='csv', parse_times=False, compact=False):
+        """
+        Awaitable Info.get_reduced, the requests are limited by the session rather than max_workers.
+        """
+        plan = self.plan_query(variables, start, end, platforms, n_out, method, file_type)
+        dtype_plan = self._reduced_dtypes(plan, compact)
+        with instrument.span('get_reduced', self.url):
+            frames = await asyncio.gather(*[query.aread_table(*request, session=self.session, parse_times=parse_times,
+                                                              plan=dtype_plan) for request in plan.requests])
+        return planner.merge(plan, frames)
+
+
+def _parse_time(text):
+    # datetime.fromisoformat is much faster than dateutil and reads ERDDAP's 2020-01-31T12:00:00Z from Python 3.11.
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return dateutil.parser.isoparse(text)
+
+
+def _epoch_seconds(value):
+    if isinstance(value, numbers.Real):
+        return value
+    return query.to_timestamp(value).timestamp()
+
+
+def _parse_metadata(body, event=None):
+    # The info_df and Metadata of an index.csv response
+    start = time.perf_counter() if event is not None else None
+    info_df = pd.read_csv(io.BytesIO(body))
+    metadata = Metadata.from_dataframe(info_df)
+    if event is not None:
+        event['parse'] += time.perf_counter() - start
+        event['rows'] = len(info_df)
+    return info_df, metadata
+
 
+def _read_chunks(requests, max_workers, parse_times=False, plan=None):
+    # Keep max_workers chunks in flight and hand them out in order, so memory is bounded by the window.
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        requests = iter(requests)
+        pending = collections.deque(executor.submit(query.read_table, *request, parse_times=parse_times, plan=plan)
+                                    for request in itertools.islice(requests, max_workers))
+        while pending:
+            df = pending.popleft().result()
+            request = next(requests, None)
+            if request is not None:
+                pending.append(executor.submit(query.read_table, *request, parse_times=parse_times, plan=plan))
+            if df is not None:
+                yield df
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
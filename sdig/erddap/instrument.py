@@ -0,0 +1,197 @@
+import collections
+import contextvars
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# The installed sinks, see add_sink. Nothing is measured while this is empty.
+sinks = []
+
+# The numeric fields of an event that StatsRegistry keeps samples of
+FIELDS = ('duration', 'ttfb', 'fetch', 'parse', 'bytes', 'rows')
+
+_current = contextvars.ContextVar('sdig_erddap_event', default=None)
+_log = logging.getLogger(__name__)
+
+
+def add_sink(sink):
+    """
+    Installs a sink, a callable that is given every event as a dict when the operation it describes finishes.
+    An event has the keys:
+
+        name: the operation, info (reading index.csv), get_depths, get_reduced, tabledap (any other data read),
+              griddap or plug_gaps
+        url: the URL read, None for plug_gaps
+        status: the HTTP status of the last response
+        bytes: the bytes received, before gzip decompression, 0 for a cache hit
+        ttfb: seconds from sending the request to the response headers arriving
+        fetch: seconds spent in HTTP requests, including ttfb
+        parse: seconds spent decoding the response into a DataFrame
+        rows: the rows read, or the rows returned by plug_gaps
+        cache: hit, revalidated or miss when the read went through a cache, otherwise None
+        coalesced: True when the operation shared a read already in flight (see sdig.erddap.flight), otherwise None
+        duration: seconds for the whole operation
+        error: the name of the exception raised by the operation, if any
+
+    Sinks are called on the thread that did the work. An exception raised by a sink is logged and not raised.
+
+        Parameters:
+                :param: sink: the callable, e.g. a StatsRegistry, a LoggingSink or a function
+                :type: callable
+    """
+    sinks.append(sink)
+
+
+def remove_sink(sink):
+    if sink in sinks:
+        sinks.remove(sink)
+
+
+def span(name, url=None):
+    """
+    Returns a context manager that measures one operation. It gives the event dict to fill in, or None when no
+    sink is installed, in which case nothing is measured. Inside another span it gives the event of the outer
+    span, so the outermost operation owns the timings of everything it does.
+    """
+    return _Span(name, url)
+
+
+def current():
+    """
+    Returns the event of the span the caller is in, or None when nothing is being measured.
+    """
+    if not sinks:
+        return None
+    return _current.get()
+
+
+class _Span:
+    __slots__ = ('event', 'token', 'start')
+
+    def __init__(self, name, url):
+        self.event = None
+        if sinks and _current.get() is None:
+            self.event = {'name': name, 'url': url, 'status': None, 'bytes': 0, 'ttfb': None, 'fetch': 0.0,
+                          'parse': 0.0, 'rows': None, 'cache': None, 'coalesced': None, 'duration': None,
+                          'error': None}
+
+    def __enter__(self):
+        if self.event is None:
+            return _current.get() if sinks else None
+        self.token = _current.set(self.event)
+        self.start = time.perf_counter()
+        return self.event
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.event is None:
+            return
+        self.event['duration'] = time.perf_counter() - self.start
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.event['error'] = exc_type.__name__
+        emit(self.event)
+
+
+def emit(event):
+    for sink in list(sinks):
+        try:
+            sink(event)
+        except Exception:
+            _log.exception('instrumentation sink %r failed', sink)
+
+
+class LoggingSink:
+    """
+    A sink that writes each event as one line to a logger.
+
+        Parameters:
+                :param: logger: the logger to write to, the sdig.erddap.instrument logger if None
+                :type: logging.Logger
+                :param: level: the level to log at
+                :type: int
+    """
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = _log if logger is None else logger
+        self.level = level
+
+    def __call__(self, event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, ' '.join(key + '=' + _format(event[key]) for key in event
+                                                 if event[key] is not None))
+
+
+class StatsRegistry:
+    """
+    A sink that keeps the most recent max_samples values of each numeric field of each kind of event and the
+    cache outcome counts, and reports percentiles of them.
+
+        Parameters:
+                :param: max_samples: the values kept for each field of each event name
+                :type: int
+    """
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = collections.Counter()
+
+    def __call__(self, event):
+        with self._lock:
+            self._counts[(event['name'], 'events')] += 1
+            if event['cache'] is not None:
+                self._counts[(event['name'], 'cache_' + event['cache'])] += 1
+            if event['coalesced']:
+                self._counts[(event['name'], 'coalesced')] += 1
+            if event['error'] is not None:
+                self._counts[(event['name'], 'errors')] += 1
+            for field in FIELDS:
+                if event[field] is not None:
+                    key = (event['name'], field)
+                    if key not in self._samples:
+                        self._samples[key] = collections.deque(maxlen=self.max_samples)
+                    self._samples[key].append(event[field])
+
+    def percentiles(self, name, field, q=(50, 90, 99)):
+        """
+        Returns the percentiles q of the kept values of field for the events called name, keyed by percentile.
+        """
+        with self._lock:
+            values = np.array(self._samples.get((name, field), ()), dtype=float)
+        if len(values) == 0:
+            return {p: np.nan for p in q}
+        return dict(zip(q, np.percentile(values, q).tolist()))
+
+    def counts(self):
+        """
+        Returns the number of events, errors, coalesced reads and each cache outcome, keyed by (name, counter).
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def summary(self, q=(50, 90, 99)):
+        """
+        Returns a DataFrame with a row for each event name and field and the count, mean and percentiles q of
+        the kept values.
+        """
+        with self._lock:
+            samples = {key: np.array(values, dtype=float) for key, values in self._samples.items()}
+        rows = []
+        for (name, field), values in sorted(samples.items()):
+            row = {'name': name, 'field': field, 'count': len(values), 'mean': values.mean()}
+            row.update({'p' + str(p): value for p, value in zip(q, np.percentile(values, q))})
+            rows.append(row)
+        return pd.DataFrame(rows, columns=['name', 'field', 'count', 'mean'] + ['p' + str(p) for p in q])
+
+    def clear(self):
+        with self._lock:
+            self._samples = {}
+            self._counts = collections.Counter()
+
+
+def _format(value):
+    if isinstance(value, float):
+        return format(value, '.6f')
+    return str(value)
@@ -0,0 +1,97 @@
+class Metadata:
+    """
+    The attributes of an ERDDAP info/dataset_id/index.csv indexed by (variable, attribute) so that every
+    lookup is a dict access instead of a scan of the whole table.
+
+        Parameters:
+                :param: attributes: the values of each attribute keyed by (variable name, attribute name), in row order
+                :type: dict
+                :param: data_types: the ERDDAP data type of each variable keyed by variable name
+                :type: dict
+    """
+    def __init__(self, attributes, data_types):
+        self.attributes = attributes
+        self.data_types = data_types
+        self._by_name = {}
+        self._by_value = {}
+        variables = {}
+        for (variable, name), values in attributes.items():
+            self._by_name.setdefault(name, {})[variable] = values
+            for value in values:
+                self._by_value.setdefault((name, value), {})[variable] = None
+            if variable != 'NC_GLOBAL':
+                variables[variable] = None
+        self.variables = list(variables)
+
+    @classmethod
+    def from_dataframe(cls, info_df):
+        """
+        Builds the index in one pass over the rows of a DataFrame read from an ERDDAP index.csv.
+
+            Parameters:
+                    :param: info_df: the DataFrame read from index.csv
+                    :type: Dataframe
+            Returns:
+                    :returns: metadata: the indexed metadata
+                    :rtype: Metadata
+        """
+        attributes = {}
+        data_types = {}
+        columns = ['Row Type', 'Variable Name', 'Attribute Name', 'Data Type', 'Value']
+        rows = zip(*[info_df[column].tolist() for column in columns])
+        for row_type, variable, name, data_type, value in rows:
+            if row_type == 'attribute':
+                attributes.setdefault((variable, name), []).append(value)
+            elif row_type == 'variable' and variable != 'NC_GLOBAL':
+                data_types[variable] = data_type
+        return cls(attributes, data_types)
+
+    def attribute(self, variable, name, default=None):
+        """
+        Returns the first value of an attribute of a variable, use 'NC_GLOBAL' for global attributes.
+
+            Parameters:
+                    :param: variable: the variable name
+                    :type: str
+                    :param: name: the attribute name
+                    :type: str
+                    :param: default: what to return when the variable does not have the attribute
+            Returns:
+                    :returns: value: the attribute value as it appears in index.csv
+                    :rtype: str
+        """
+        values = self.attributes.get((variable, name))
+        if not values:
+            return default
+        return values[0]
+
+    def attribute_values(self, name):
+        """
+        Returns the values of an attribute for every variable that has it, in the order of index.csv.
+
+            Parameters:
+                    :param: name: the attribute name
+                    :type: str
+            Returns:
+                    :returns: values: lists of values keyed by variable name, NC_GLOBAL included
+                    :rtype: dict
+        """
+        return self._by_name.get(name, {})
+
+    def variables_with(self, name, value=None):
+        """
+        Returns the names of the variables that have an attribute, or that have an attribute with a given value,
+        e.g. variables_with('cf_role', 'timeseries_id').
+
+            Parameters:
+                    :param: name: the attribute name
+                    :type: str
+                    :param: value: the attribute value to match, None matches any value
+                    :type: str
+            Returns:
+                    :returns: variables: the matching variable names in the order of index.csv
+                    :rtype: list
+        """
+        if value is None:
+            return list(self._by_name.get(name, {}))
+        return list(self._by_value.get((name, value), {}))
@@ -0,0 +1,263 @@
+"""
+A reader and writer for the netCDF-3 classic and 64-bit offset formats, which is what ERDDAP returns for .nc
+requests. It needs nothing but numpy: every variable is decoded with a single numpy.frombuffer on the response
+body, so there is no text parsing at all.
+"""
+import struct
+
+import numpy as np
+
+_ABSENT = 0
+_DIMENSION = 10
+_VARIABLE = 11
+_ATTRIBUTE = 12
+_STREAMING = 0xFFFFFFFF
+
+_TYPES = {1: np.dtype('i1'), 2: np.dtype('S1'), 3: np.dtype('>i2'), 4: np.dtype('>i4'), 5: np.dtype('>f4'),
+          6: np.dtype('>f8')}
+_TYPE_CODES = {'i1': 1, 'u1': 1, 'i2': 3, 'u2': 4, 'i4': 4, 'u4': 6, 'i8': 6, 'u8': 6, 'f4': 5, 'f8': 6}
+
+
+def read(buffer):
+    """
+    Reads a netCDF-3 file from memory.
+
+        Parameters:
+                :param: buffer: the content of the file
+                :type: bytes
+        Returns:
+                :returns: dimensions: the length of each dimension keyed by name, the record dimension has the number of records
+                :rtype: dict
+                :returns: attributes: the global attributes keyed by name
+                :rtype: dict
+                :returns: variables: (dimension names, data, attributes) keyed by variable name in file order. Char
+                          variables are returned as arrays of str with the last dimension removed.
+                :rtype: dict
+    """
+    buffer = memoryview(buffer)
+    if bytes(buffer[:3]) != b'CDF' or buffer[3] not in (1, 2):
+        raise ValueError('Not a netCDF-3 file')
+    header = _Header(buffer, 4 if buffer[3] == 1 else 8)
+    numrecs = header.int32()
+    dimensions = []
+    for name, length in header.list(_DIMENSION, header.dimension):
+        dimensions.append((name, length))
+    attributes = dict(header.list(_ATTRIBUTE, header.attribute))
+    specs = header.list(_VARIABLE, header.variable)
+    record_dimension = None
+    for i, (name, length) in enumerate(dimensions):
+        if length == 0:
+            record_dimension = i
+    record_vars = [spec for spec in specs if spec[1] and spec[1][0] == record_dimension]
+    if numrecs == _STREAMING:
+        numrecs = 0
+        if record_vars:
+            record_size = sum(spec[4] for spec in record_vars)
+            numrecs = (len(buffer) - min(spec[5] for spec in record_vars)) // record_size
+    if len(record_vars) == 1:
+        record_size = _count(record_vars[0], dimensions, 1) * record_vars[0][3].itemsize
+    else:
+        record_size = sum(spec[4] for spec in record_vars)
+    variables = {}
+    for spec in specs:
+        name, dim_ids, var_attributes, dtype, vsize, begin = spec
+        shape = [numrecs if i == record_dimension else dimensions[i][1] for i in dim_ids]
+        if dim_ids and dim_ids[0] == record_dimension:
+            per_record = _count(spec, dimensions, 1) * dtype.itemsize
+            count = (numrecs - 1) * record_size + per_record if numrecs > 0 else 0
+            raw = np.frombuffer(buffer, np.uint8, count, begin)
+            records = np.lib.stride_tricks.as_strided(raw, (numrecs, per_record), (record_size, 1), writeable=False)
+            data = np.ascontiguousarray(records).view(dtype).reshape(shape)
+        else:
+            data = np.frombuffer(buffer, dtype, int(np.prod(shape)), begin).reshape(shape)
+        if dtype.kind == 'S':
+            data = _strings(data)
+            dim_ids = dim_ids[:-1]
+        else:
+            data = data.astype(dtype.newbyteorder('='))
+        variables[name] = ([dimensions[i][0] for i in dim_ids], data, var_attributes)
+    return {name: numrecs if i == record_dimension else length
+            for i, (name, length) in enumerate(dimensions)}, attributes, variables
+
+
+def write(columns, attributes=None, dimension='row'):
+    """
+    Writes one dimensional columns as a 64-bit offset netCDF-3 file laid out the way ERDDAP lays out a tabledap .nc
+    response: every column is a variable along dimension and strings are char variables with a NAME_strlen dimension.
+
+        Parameters:
+                :param: columns: (data, attributes) of each column keyed by variable name, data is a 1-D numpy array
+                :type: dict
+                :param: attributes: the global attributes
+                :type: dict
+                :param: dimension: the name of the row dimension
+                :type: str
+        Returns:
+                :returns: buffer: the file content
+                :rtype: bytes
+    """
+    n = len(next(iter(columns.values()))[0]) if columns else 0
+    dimensions = [(dimension, n)]
+    encoded = []
+    for name, (data, var_attributes) in columns.items():
+        data = np.asarray(data)
+        if data.dtype.kind in ('U', 'S', 'O'):
+            values = np.char.encode(data.astype(str), 'utf-8') if data.dtype.kind != 'S' else data
+            strlen = max(1, values.dtype.itemsize)
+            dimensions.append((name + '_strlen', strlen))
+            dim_ids = [0, len(dimensions) - 1]
+            payload = values.astype('S' + str(strlen)).tobytes()
+            encoded.append((name, dim_ids, var_attributes or {}, 2, _pad(payload)))
+        else:
+            encoded.append(_numeric(name, [0], data, var_attributes))
+    return _file(dimensions, encoded, attributes)
+
+
+def write_grid(axes, variables, attributes=None):
+    """
+    Writes a 64-bit offset netCDF-3 file laid out the way ERDDAP lays out a griddap .nc response: a dimension and
+    a coordinate variable for each axis, then the data variables over the axes.
+
+        Parameters:
+                :param: axes: (values, attributes) of each axis keyed by name in dimension order, values is 1-D
+                :type: dict
+                :param: variables: (data, attributes) of each data variable keyed by name, data has a dimension for
+                        each axis
+                :type: dict
+                :param: attributes: the global attributes
+                :type: dict
+        Returns:
+                :returns: buffer: the file content
+                :rtype: bytes
+    """
+    dimensions = [(name, len(values)) for name, (values, var_attributes) in axes.items()]
+    encoded = [_numeric(name, [i], values, var_attributes) for i, (name, (values, var_attributes))
+               in enumerate(axes.items())]
+    encoded += [_numeric(name, list(range(len(dimensions))), data, var_attributes)
+                for name, (data, var_attributes) in variables.items()]
+    return _file(dimensions, encoded, attributes)
+
+
+def _numeric(name, dim_ids, data, var_attributes):
+    data = np.asarray(data)
+    if data.dtype.kind == 'b':
+        data = data.astype('i1')
+    code = _TYPE_CODES[data.dtype.kind + str(data.dtype.itemsize)]
+    return name, dim_ids, var_attributes or {}, code, _pad(data.astype(_TYPES[code]).tobytes())
+
+
+def _file(dimensions, encoded, attributes):
+    def header(begins):
+        out = [b'CDF\x02', struct.pack('>i', 0)]
+        out.append(struct.pack('>ii', _DIMENSION, len(dimensions)))
+        for name, length in dimensions:
+            out.append(_name(name) + struct.pack('>i', length))
+        out.append(_attributes(attributes or {}))
+        out.append(struct.pack('>ii', _VARIABLE, len(encoded)) if encoded else struct.pack('>ii', _ABSENT, 0))
+        for (name, dim_ids, var_attributes, code, payload), begin in zip(encoded, begins):
+            out.append(_name(name) + struct.pack('>i', len(dim_ids)) + struct.pack('>' + 'i' * len(dim_ids), *dim_ids))
+            out.append(_attributes(var_attributes))
+            out.append(struct.pack('>iiq', code, min(len(payload), 2 ** 31 - 1), begin))
+        return b''.join(out)
+
+    begin = len(header([0] * len(encoded)))
+    begins = []
+    for item in encoded:
+        begins.append(begin)
+        begin += len(item[4])
+    return header(begins) + b''.join(item[4] for item in encoded)
+
+
+class _Header:
+    def __init__(self, buffer, offset_size):
+        self.buffer = buffer
+        self.offset_size = offset_size
+        self.position = 4
+
+    def int32(self):
+        value = struct.unpack_from('>I', self.buffer, self.position)[0]
+        self.position += 4
+        return value
+
+    def offset(self):
+        value = struct.unpack_from('>I' if self.offset_size == 4 else '>Q', self.buffer, self.position)[0]
+        self.position += self.offset_size
+        return value
+
+    def name(self):
+        length = self.int32()
+        name = bytes(self.buffer[self.position:self.position + length]).decode('utf-8')
+        self.position += _padded(length)
+        return name
+
+    def list(self, tag, item):
+        found, count = self.int32(), self.int32()
+        if found == _ABSENT:
+            return []
+        if found != tag:
+            raise ValueError('Malformed netCDF-3 header')
+        return [item() for i in range(count)]
+
+    def dimension(self):
+        return self.name(), self.int32()
+
+    def attribute(self):
+        name = self.name()
+        dtype = _TYPES[self.int32()]
+        count = self.int32()
+        raw = bytes(self.buffer[self.position:self.position + count * dtype.itemsize])
+        self.position += _padded(count * dtype.itemsize)
+        if dtype.kind == 'S':
+            return name, raw.rstrip(b'\x00').decode('utf-8', errors='replace')
+        values = np.frombuffer(raw, dtype).astype(dtype.newbyteorder('='))
+        return name, values[0].item() if count == 1 else values
+
+    def variable(self):
+        name = self.name()
+        dim_ids = [self.int32() for i in range(self.int32())]
+        var_attributes = dict(self.list(_ATTRIBUTE, self.attribute))
+        dtype = _TYPES[self.int32()]
+        vsize = self.int32()
+        return name, dim_ids, var_attributes, dtype, vsize, self.offset()
+
+
+def _count(spec, dimensions, skip):
+    return int(np.prod([dimensions[i][1] for i in spec[1][skip:]]))
+
+
+def _strings(data):
+    if data.ndim == 0 or data.shape[-1] == 0:
+        return np.full(data.shape[:-1], '', dtype=object)
+    fixed = np.ascontiguousarray(data).view('S' + str(data.shape[-1])).reshape(data.shape[:-1])
+    # Id and flag columns repeat a few values many times, so decode each distinct value only once.
+    unique, inverse = np.unique(fixed, return_inverse=True)
+    decoded = np.array([value.decode('utf-8', errors='replace') for value in unique.tolist()], dtype=object)
+    return decoded[inverse].reshape(fixed.shape)
+
+
+def _padded(length):
+    return (length + 3) // 4 * 4
+
+
+def _pad(payload):
+    return payload + b'\x00' * (_padded(len(payload)) - len(payload))
+
+
+def _name(name):
+    encoded = name.encode('utf-8')
+    return struct.pack('>i', len(encoded)) + _pad(encoded)
+
+
+def _attributes(attributes):
+    if not attributes:
+        return struct.pack('>ii', _ABSENT, 0)
+    out = [struct.pack('>ii', _ATTRIBUTE, len(attributes))]
+    for name, value in attributes.items():
+        if isinstance(value, str):
+            raw, code, count = value.encode('utf-8'), 2, len(value.encode('utf-8'))
+        else:
+            values = np.atleast_1d(np.asarray(value))
+            code = 4 if values.dtype.kind in ('i', 'u', 'b') else 6
+            raw, count = values.astype(_TYPES[code]).tobytes(), len(values)
+        out.append(_name(name) + struct.pack('>ii', code, count) + _pad(raw))
+    return b''.join(out)
@@ -0,0 +1,239 @@
+import concurrent.futures
+import math
+import urllib.parse
+
+import pandas as pd
+
+from sdig.erddap import query
+
+# The longest URL a plan sends. Tomcat, which ERDDAP runs in, refuses request lines over 8 KB by default and the
+# proxies in front of many servers allow less.
+MAX_URL_LENGTH = 4000
+
+# The ERDDAP filter that makes the server do each reduction. mean and closest give a row for each time bin of
+# each platform, minmax the rows with the smallest and largest value in each bin and count the number of values.
+REDUCTIONS = {'mean': 'orderByMean', 'closest': 'orderByClosest', 'minmax': 'orderByMinMax', 'count': 'orderByCount'}
+
+# The bin widths a plan rounds up to, in seconds with their ERDDAP interval, so that zoom levels near each other
+# share bins. Anything wider is a whole number of days.
+_BINS = [(1, '1second'), (2, '2seconds'), (5, '5seconds'), (10, '10seconds'), (15, '15seconds'),
+         (30, '30seconds'), (60, '1minute'), (120, '2minutes'), (300, '5minutes'), (600, '10minutes'),
+         (900, '15minutes'), (1800, '30minutes'), (3600, '1hour'), (7200, '2hours'), (10800, '3hours'),
+         (21600, '6hours'), (43200, '12hours'), (86400, '1day'), (172800, '2days'), (432000, '5days'),
+         (604800, '7days'), (1209600, '14days'), (2592000, '30days'), (5184000, '60days'), (7776000, '90days'),
+         (15552000, '180days'), (31536000, '365days')]
+
+
+class QueryPlan:
+    """
+    The tabledap requests that read a view of a data set, made by plan_query. When the view is zoomed out far
+    enough that the data have more rows than it can show, each request carries an ERDDAP reduction, e.g.
+    orderByMean("ID,time/1day"), so the server bins and aggregates and sends a few rows for each platform instead
+    of all of them. The platforms are split across requests so no URL is longer than max_url_length.
+
+        Parameters:
+                :param: requests: the sdig.erddap.query.read_table arguments of each request
+                :type: list
+                :param: method: the reduction, one of REDUCTIONS, or None when the rows are read as they are
+                :type: str
+                :param: interval: the ERDDAP interval of the time bins, e.g. '1day', None without a reduction
+                :type: str
+                :param: keys: the columns the rows are grouped and sorted by, the platform and time variables
+                :type: list
+    """
+    def __init__(self, requests, method, interval, keys):
+        self.requests = requests
+        self.method = method
+        self.interval = interval
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.requests)
+
+    def __repr__(self):
+        return ('QueryPlan(' + str(len(self.requests)) + ' requests, method=' + repr(self.method) + ', interval=' +
+                repr(self.interval) + ')')
+
+    def urls(self):
+        """
+        Returns the URL of each request of the plan.
+        """
+        return [query.tabledap_url(*request) for request in self.requests]
+
+
+def plan_query(data_url, variables, time_name, platform_name, start, end, platforms=None, n_out=1000,
+               method='mean', resolution=None, numeric=None, file_type='csv', max_url_length=MAX_URL_LENGTH):
+    """
+    Plans the requests that read the variables from start to end for the platforms at about n_out rows per
+    platform. When the time bins n_out divides the range into are wider than resolution, the spacing of the data,
+    the reduction method is pushed to the server, otherwise the rows are read as they are. Use Info.plan_query,
+    which fills in the names and the resolution from the metadata.
+
+        Parameters:
+                :param: data_url: the data URL of the data set, without .html
+                :type: str
+                :param: variables: the short names of the variables to read
+                :type: list
+                :param: time_name: the name of the time variable
+                :type: str
+                :param: platform_name: the name of the platform id variable, None if there is none
+                :type: str
+                :param: start: the start time, anything sdig.erddap.query.to_timestamp accepts
+                :param: end: the end time, anything sdig.erddap.query.to_timestamp accepts
+                :param: platforms: the id or list of ids of the platforms to read, all platforms if None
+                :type: list or str
+                :param: n_out: the rows wanted for each platform, e.g. the width of the plot in pixels
+                :type: int
+                :param: method: one of REDUCTIONS
+                :type: str
+                :param: resolution: the time between samples of the data, always reduce if None
+                :type: str or pandas.Timedelta
+                :param: numeric: the names of the numeric variables, which are the ones mean and minmax reduce.
+                The others are left out of a mean, all variables are numeric if None.
+                :type: list
+                :param: file_type: one of sdig.erddap.formats.FILE_TYPES
+                :type: str
+                :param: max_url_length: the longest URL to send
+                :type: int
+        Returns:
+                :returns: plan: the requests
+                :rtype: QueryPlan
+    """
+    if method not in REDUCTIONS:
+        raise ValueError('method must be one of ' + ', '.join(REDUCTIONS))
+    keys = [time_name] if platform_name is None else [platform_name, time_name]
+    variables = keys + [v for v in variables if v not in keys]
+    values = [v for v in variables if v not in keys and (numeric is None or v in numeric)]
+    if method == 'minmax' and not values:
+        # Nothing to take the smallest and largest of, keep the row closest to each bin instead
+        method = 'closest'
+    start = query.to_timestamp(start)
+    end = query.to_timestamp(end)
+    # minmax keeps two rows of each bin
+    n_bins = max(1, n_out // 2 if method == 'minmax' else n_out)
+    seconds, interval = time_bin(start, end, n_bins)
+    if resolution is not None and seconds <= pd.Timedelta(resolution).total_seconds():
+        method = None
+        interval = None
+    time_filter = query.time_constraints(time_name, start, end)
+    if method is None:
+        reductions = [(variables, [])]
+    else:
+        grouped = ','.join(keys) + '/' + interval
+        if method == 'minmax':
+            # orderByMinMax takes a single value variable, so each one is a request of its own.
+            reductions = [(variables, [REDUCTIONS[method] + '("' + grouped + ',' + v + '")']) for v in values]
+        elif method == 'mean':
+            reductions = [(keys + values, [REDUCTIONS[method] + '("' + grouped + '")'])]
+        else:
+            reductions = [(variables, [REDUCTIONS[method] + '("' + grouped + '")'])]
+    requests = []
+    for request_variables, reduction in reductions:
+        base = len(query.tabledap_url(data_url, request_variables, time_filter + reduction, file_type))
+        for group in split_platforms(platform_name, platforms, max_url_length - base - 1):
+            con = platform_constraint(platform_name, group)
+            requests.append((data_url, request_variables, time_filter + [con] + reduction, file_type))
+    return QueryPlan(requests, method, interval, keys)
+
+
+def read(plan, max_workers=4, parse_times=False, dtype_plan=None):
+    """
+    Reads the requests of a plan in parallel and merges them into one DataFrame sorted by platform and time.
+
+        Parameters:
+                :param: plan: the plan to read
+                :type: QueryPlan
+                :param: max_workers: the most requests read at the same time
+                :type: int
+                :param: parse_times: return times as datetime64, see sdig.erddap.query.read_table
+                :type: bool
+                :param: dtype_plan: the dtypes to decode the columns into, see sdig.erddap.dtypes.DtypePlan
+                :type: sdig.erddap.dtypes.DtypePlan
+        Returns:
+                :returns: df: the rows of all the requests
+                :rtype: Dataframe
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(lambda request: query.read_table(*request, parse_times=parse_times,
+                                                                   plan=dtype_plan), plan.requests))
+    return merge(plan, frames)
+
+
+def merge(plan, frames):
+    """
+    Joins the DataFrames read for the requests of a plan, None for a request that found no rows.
+    """
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return pd.DataFrame(columns=plan.requests[0][1] if plan.requests else [])
+    df = pd.concat(frames, ignore_index=True)
+    if plan.method == 'minmax':
+        # A row can be the smallest or largest of more than one variable
+        df = df.drop_duplicates()
+    return df.sort_values(plan.keys, kind='stable', ignore_index=True)
+
+
+def time_bin(start, end, n_bins):
+    """
+    Returns the width in seconds and the ERDDAP interval of the time bins that divide start to end into at most
+    n_bins, rounded up to one of a fixed set of widths.
+    """
+    width = (end - start).total_seconds() / n_bins
+    for seconds, interval in _BINS:
+        if seconds >= width:
+            return seconds, interval
+    days = math.ceil(width / 86400)
+    return days * 86400, str(days) + 'days'
+
+
+def platform_constraint(dsg_id_var, platforms):
+    """
+    Returns the constraint selecting the platforms, as Info.make_platform_constraint makes it, '' for None.
+    """
+    if dsg_id_var is None or platforms is None:
+        return ''
+    if len(platforms) == 1:
+        return dsg_id_var + '="' + urllib.parse.quote(platforms[0]) + '"'
+    return dsg_id_var + '=~"' + urllib.parse.quote('|'.join(platforms)) + '"'
+
+
+def split_platforms(dsg_id_var, platforms, budget):
+    """
+    Splits platforms into groups whose constraint is at most budget characters long. A platform that does not
+    fit on its own is a group of its own. Returns [None] for all platforms. Raises ValueError for platforms of a
+    data set with no platform id variable.
+
+        Parameters:
+                :param: dsg_id_var: the name of the platform id variable, None if there is none
+                :type: str
+                :param: platforms: the id or list of ids of the platforms, None for all platforms
+                :type: list or str
+                :param: budget: the most characters a constraint may have
+                :type: int
+        Returns:
+                :returns: groups: lists of ids
+                :rtype: list
+    """
+    if platforms is None:
+        return [None]
+    if dsg_id_var is None:
+        # Reading every platform instead would hand back data that was not asked for
+        raise ValueError('Platforms can only be selected in a data set with a platform id variable')
+    if not isinstance(platforms, list):
+        platforms = [platforms]
+    # The variable name, the =~ and the quotes, then each id and a %7C between ids
+    fixed = len(dsg_id_var) + 4
+    groups = []
+    group = []
+    length = fixed
+    for platform in [str(p) for p in platforms]:
+        size = len(urllib.parse.quote(platform))
+        if group and length + 3 + size > budget:
+            groups.append(group)
+            group = []
+            length = fixed
+        length = length + size + (3 if group else 0)
+        group.append(platform)
+    if group:
+        groups.append(group)
+    return groups
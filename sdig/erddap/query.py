@@ -0,0 +1,268 @@
+import asyncio
+import numbers
+import time
+import urllib.error
+
+import pandas as pd
+
+from sdig.erddap import fetch
+from sdig.erddap import flight
+from sdig.erddap import formats
+from sdig.erddap import instrument
+
+ERDDAP_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# The message of the 404 ERDDAP answers to a query with no rows
+_NO_MATCHING_RESULTS = b'Your query produced no matching results'
+
+
+def to_timestamp(value):
+    """
+    Returns value as a UTC pandas Timestamp. Accepts ISO 8601 strings, datetimes, numpy datetime64 and Unix
+    epoch seconds, which is what get_times and get_time_marks hand out.
+
+        Parameters:
+                :param: value: the time to convert
+                :type: str or float or datetime
+        Returns:
+                :returns: timestamp: the time as a timezone aware UTC Timestamp
+                :rtype: pandas.Timestamp
+    """
+    if isinstance(value, numbers.Real):
+        timestamp = pd.Timestamp(value, unit='s')
+    else:
+        timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize('UTC')
+    return timestamp.tz_convert('UTC')
+
+
+def time_windows(start, end, chunk):
+    """
+    Splits the time range from start to end into consecutive windows of length chunk. Every window except the last
+    one is open at its end so a row on a boundary is only in one window.
+
+        Parameters:
+                :param: start: start of the range, anything to_timestamp accepts
+                :param: end: end of the range, anything to_timestamp accepts
+                :param: chunk: the window length, e.g. '30D' or a Timedelta, None for one window
+                :type: str or pandas.Timedelta
+        Returns:
+                :returns: windows: (start, end, end_inclusive) tuples of Timestamps
+                :rtype: list
+    """
+    start = to_timestamp(start)
+    end = to_timestamp(end)
+    if chunk is None:
+        return [(start, end, True)]
+    chunk = pd.Timedelta(chunk)
+    windows = []
+    window_start = start
+    while window_start + chunk < end:
+        windows.append((window_start, window_start + chunk, False))
+        window_start = window_start + chunk
+    windows.append((window_start, end, True))
+    return windows
+
+
+def time_constraints(time_name, start=None, end=None, end_inclusive=True):
+    """
+    Returns the ERDDAP constraints that select rows from start to end, either of which may be None.
+
+        Parameters:
+                :param: time_name: the name of the time variable
+                :type: str
+                :param: start: start of the range, anything to_timestamp accepts
+                :param: end: end of the range, anything to_timestamp accepts
+                :param: end_inclusive: use <= rather than < for the end
+                :type: bool
+        Returns:
+                :returns: constraints: the constraints, without the joining &
+                :rtype: list
+    """
+    constraints = []
+    if start is not None:
+        constraints.append(time_name + '>=' + to_timestamp(start).strftime(ERDDAP_TIME_FORMAT))
+    if end is not None:
+        constraints.append(time_name + ('<=' if end_inclusive else '<') + to_timestamp(end).strftime(ERDDAP_TIME_FORMAT))
+    return constraints
+
+
+def platform_groups(platforms, size):
+    """
+    Splits a list of platforms into lists of at most size platforms, or returns one group if size is None.
+    A single platform given as a str is treated as a list of one.
+    """
+    if platforms is None:
+        return [None]
+    if not isinstance(platforms, list):
+        platforms = [platforms]
+    if size is None:
+        return [platforms]
+    return [platforms[i:i + size] for i in range(0, len(platforms), size)]
+
+
+def tabledap_url(data_url, variables, constraints, file_type='csv'):
+    """
+    Returns the URL of a tabledap request for the variables with the constraints.
+
+        Parameters:
+                :param: data_url: the data URL of the data set, without .html
+                :type: str
+                :param: variables: the variables to return
+                :type: list
+                :param: constraints: ERDDAP constraints and filters, e.g. time>=2020-01-01 or distinct()
+                :type: list
+                :param: file_type: the ERDDAP file type extension
+                :type: str
+        Returns:
+                :returns: url: the request URL
+                :rtype: str
+    """
+    url = data_url + '.' + file_type + '?' + ','.join(variables)
+    for constraint in constraints:
+        if constraint:
+            url = url + '&' + constraint
+    return url
+
+
+def read_table(data_url, variables, constraints, file_type='csv', parse_times=False, plan=None):
+    """
+    Reads a tabledap request and decodes it into a DataFrame. A file_type that cannot be decoded here or that the
+    server rejects is read as csv instead.
+
+    With parse_times the time columns are returned as UTC datetime64. A csv request is then made as nc, which
+    carries times as epoch seconds, and if the server will not answer that, the times of the csv are decoded with
+    formats.to_datetimes.
+
+        Parameters:
+                :param: data_url: the data URL of the data set, without .html
+                :type: str
+                :param: variables: the variables to return
+                :type: list
+                :param: constraints: ERDDAP constraints and filters
+                :type: list
+                :param: file_type: one of sdig.erddap.formats.FILE_TYPES
+                :type: str
+                :param: parse_times: return times as datetime64, see above
+                :type: bool
+                :param: plan: the dtypes to decode the columns into, see sdig.erddap.dtypes.DtypePlan
+                :type: sdig.erddap.dtypes.DtypePlan
+        Returns:
+                :returns: df: the rows, or None if ERDDAP found no matching rows
+                :rtype: Dataframe
+    """
+    file_type = _file_type(file_type, parse_times)
+    url = tabledap_url(data_url, variables, constraints, file_type)
+    with instrument.span('tabledap', url) as event:
+        # Identical requests made at the same time share one read, each caller gets its own DataFrame.
+        return flight.flights.do((url, parse_times, plan),
+                                 lambda: _read_table(data_url, variables, constraints, file_type, parse_times, plan,
+                                                     event), copy=pd.DataFrame.copy)
+
+
+def _read_table(data_url, variables, constraints, file_type, parse_times, plan, event):
+    try:
+        try:
+            body = fetch.get(tabledap_url(data_url, variables, constraints, file_type))
+        except urllib.error.HTTPError as e:
+            # Servers older than the file type answer with a bad request, read it as csv instead.
+            if file_type == 'csv' or e.code not in (400, 415, 501):
+                raise
+            file_type = 'csv'
+            body = fetch.get(tabledap_url(data_url, variables, constraints, file_type))
+    except urllib.error.HTTPError as e:
+        if _no_matching_results(e):
+            _record_rows(event, 0)
+            return None
+        raise
+    if event is None:
+        return formats.read(body, file_type, parse_times, plan)
+    start = time.perf_counter()
+    df = formats.read(body, file_type, parse_times, plan)
+    event['parse'] += time.perf_counter() - start
+    _record_rows(event, len(df))
+    return df
+
+
+async def aread_table(data_url, variables, constraints, file_type='csv', session=None, parse_times=False,
+                      plan=None):
+    """
+    The awaitable read_table: reads a tabledap request through an asyncio session and decodes it on a worker
+    thread, so the event loop is blocked by neither.
+
+        Parameters:
+                :param: data_url: the data URL of the data set, without .html
+                :type: str
+                :param: variables: the variables to return
+                :type: list
+                :param: constraints: ERDDAP constraints and filters
+                :type: list
+                :param: file_type: one of sdig.erddap.formats.FILE_TYPES
+                :type: str
+                :param: session: the sdig.erddap.fetch.AsyncSession to read with, the shared one if None
+                :type: sdig.erddap.fetch.AsyncSession
+                :param: parse_times: return times as datetime64, as read_table does
+                :type: bool
+                :param: plan: the dtypes to decode the columns into, as read_table does
+                :type: sdig.erddap.dtypes.DtypePlan
+        Returns:
+                :returns: df: the rows, or None if ERDDAP found no matching rows
+                :rtype: Dataframe
+    """
+    if session is None:
+        session = fetch.async_session
+    file_type = _file_type(file_type, parse_times)
+    url = tabledap_url(data_url, variables, constraints, file_type)
+    with instrument.span('tabledap', url) as event:
+        return await flight.flights.ado((url, parse_times, plan),
+                                        lambda: _aread_table(data_url, variables, constraints, file_type, parse_times,
+                                                             plan, session, event), copy=pd.DataFrame.copy)
+
+
+async def _aread_table(data_url, variables, constraints, file_type, parse_times, plan, session, event):
+    try:
+        try:
+            body = await session.get(tabledap_url(data_url, variables, constraints, file_type))
+        except urllib.error.HTTPError as e:
+            if file_type == 'csv' or e.code not in (400, 415, 501):
+                raise
+            file_type = 'csv'
+            body = await session.get(tabledap_url(data_url, variables, constraints, file_type))
+    except urllib.error.HTTPError as e:
+        if _no_matching_results(e):
+            _record_rows(event, 0)
+            return None
+        raise
+    start = time.perf_counter()
+    df = await asyncio.to_thread(formats.read, body, file_type, parse_times, plan)
+    if event is not None:
+        event['parse'] += time.perf_counter() - start
+        _record_rows(event, len(df))
+    return df
+
+
+def _no_matching_results(error):
+    # ERDDAP answers 404 when a query produced no matching results, but also for a data set or page that is not
+    # there. Only the message in the body tells them apart.
+    if error.code != 404:
+        return False
+    body = error.read()
+    if error.fp is not None and error.fp.seekable():
+        # Leave the body for whoever handles the error when it is re-raised
+        error.fp.seek(0)
+    return _NO_MATCHING_RESULTS in body
+
+
+def _file_type(file_type, parse_times):
+    # The file type to ask for: one that can be decoded here, and with parse_times nc rather than csv for its
+    # epoch seconds times.
+    if not formats.available(file_type):
+        file_type = 'csv'
+    if parse_times and file_type == 'csv':
+        return 'nc'
+    return file_type
+
+
+def _record_rows(event, rows):
+    if event is not None:
+        event['rows'] = rows if event['rows'] is None else event['rows'] + rows
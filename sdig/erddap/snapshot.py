@@ -0,0 +1,226 @@
+import bisect
+import json
+import mmap
+import struct
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import pandas as pd
+
+from sdig.erddap import cache
+
+_MAGIC = b'SDIGSNP2'
+_STORE_MAGIC = b'SDIGSTR1'
+_HEADER = struct.Struct('<8sI')
+_ENTRY = struct.Struct('<QIQI')
+
+# The Info getters a snapshot answers, in the order they are stored
+GETTERS = ('get_dsg_type', 'get_dsg_info', 'get_times', 'get_variables', 'get_title', 'get_time_variable',
+           'get_platform_variable', 'get_time_resolution')
+
+
+class Snapshot:
+    """
+    The parsed metadata of a data set, everything the Info getters return, without the index.csv table behind
+    it. A snapshot is a few kilobytes where an Info keeps the whole info_df, it encodes to a small bytes blob with
+    to_bytes and an Info can be made from it with Info.from_snapshot without reading index.csv again.
+    Snapshots are read only.
+
+        Parameters:
+                :param: url: the data URL of the data set
+                :type: str
+                :param: values: the result of each getter in GETTERS keyed by getter name, a getter left out reads
+                index.csv when it is called
+                :type: dict
+    """
+    __slots__ = ('url', 'values')
+
+    def __init__(self, url, values):
+        object.__setattr__(self, 'url', url)
+        object.__setattr__(self, 'values', values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Snapshot is read only')
+
+    def __eq__(self, other):
+        return isinstance(other, Snapshot) and self.url == other.url and self.values == other.values
+
+    @classmethod
+    def from_info(cls, info):
+        """
+        Takes the snapshot of an Info, reading its metadata if that has not been done yet.
+
+            Parameters:
+                    :param: info: the Info of the data set
+                    :type: sdig.erddap.info.Info
+            Returns:
+                    :returns: snapshot: the snapshot
+                    :rtype: Snapshot
+        """
+        return cls(info.url, {getter: getattr(info, getter)() for getter in GETTERS})
+
+    def to_bytes(self):
+        """
+        Encodes the snapshot as a bytes blob for from_bytes, a short header followed by compact UTF-8 JSON.
+        """
+        get_dsg_info = self.values['get_dsg_info']
+        payload = {'url': self.url}
+        payload.update(self.values)
+        payload['get_dsg_info'] = [get_dsg_info[0], get_dsg_info[1]]
+        if self.values.get('get_time_resolution') is not None:
+            payload['get_time_resolution'] = self.values['get_time_resolution'].total_seconds()
+        body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        return _HEADER.pack(_MAGIC, len(body)) + body
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """
+        Decodes a blob made by to_bytes. buffer may be any bytes-like object, e.g. a memoryview of an mmap, and is
+        read in place.
+        """
+        view = memoryview(buffer)
+        magic, length = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError('Not an sdig metadata snapshot')
+        payload = json.loads(view[_HEADER.size:_HEADER.size + length].tobytes().decode('utf-8'))
+        url = payload.pop('url')
+        payload['get_dsg_info'] = tuple(payload['get_dsg_info'])
+        payload['get_times'] = tuple(payload['get_times'])
+        payload['get_variables'] = tuple(payload['get_variables'])
+        if payload.get('get_time_resolution') is not None:
+            payload['get_time_resolution'] = pd.Timedelta(seconds=payload['get_time_resolution'])
+        return cls(url, payload)
+
+
+class SnapshotStore:
+    """
+    Many snapshots in one read only buffer, a file or a shared memory segment, so one process can publish the
+    metadata of every data set and the others attach to it. Attaching maps the buffer without copying or decoding
+    it, a data URL is found by binary search in the index at the start of the buffer and only the snapshots that
+    are asked for are decoded. Use write or publish to make a store and open or attach to use one:
+
+        SnapshotStore.write('/dev/shm/erddap.snap', [Snapshot.from_info(info) for info in infos])
+        store = SnapshotStore.open('/dev/shm/erddap.snap')
+        info = Info.from_snapshot(store.get(data_url))
+
+        Parameters:
+                :param: buffer: the encoded store
+                :type: bytes-like
+    """
+    def __init__(self, buffer, owner=None):
+        self._view = memoryview(buffer)
+        self._owner = owner
+        magic, count = _HEADER.unpack_from(self._view)
+        if magic != _STORE_MAGIC:
+            raise ValueError('Not an sdig snapshot store')
+        self._count = count
+        self._keys = _Keys(self._view, count)
+        self._decoded = {}
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, url):
+        return self._find(url) is not None
+
+    def get(self, url, default=None):
+        """
+        Returns the snapshot of the data set with the data URL url, or default if the store does not have it.
+        """
+        if url in self._decoded:
+            return self._decoded[url]
+        i = self._find(url)
+        if i is None:
+            return default
+        key_offset, key_length, blob_offset, blob_length = _ENTRY.unpack_from(self._view, _entry_offset(i))
+        snapshot = Snapshot.from_bytes(self._view[blob_offset:blob_offset + blob_length])
+        self._decoded[url] = snapshot
+        return snapshot
+
+    def urls(self):
+        return [self._keys[i] for i in range(self._count)]
+
+    def _find(self, url):
+        i = bisect.bisect_left(self._keys, url)
+        if i < self._count and self._keys[i] == url:
+            return i
+        return None
+
+    def close(self):
+        self._view.release()
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    @classmethod
+    def encode(cls, snapshots):
+        """
+        Returns the bytes of a store of the snapshots, keyed by their data URLs.
+        """
+        entries = sorted((snapshot.url.encode('utf-8'), snapshot.to_bytes()) for snapshot in snapshots)
+        offset = _entry_offset(len(entries))
+        index = []
+        for key, blob in entries:
+            index.append(_ENTRY.pack(offset, len(key), offset + len(key), len(blob)))
+            offset += len(key) + len(blob)
+        parts = [_HEADER.pack(_STORE_MAGIC, len(entries))] + index
+        for key, blob in entries:
+            parts.append(key)
+            parts.append(blob)
+        return b''.join(parts)
+
+    @classmethod
+    def write(cls, path, snapshots):
+        """
+        Writes a store of the snapshots to path, replacing it atomically so readers never see a partial store.
+        """
+        cache.write_atomic(path, cls.encode(snapshots))
+
+    @classmethod
+    def open(cls, path):
+        """
+        Maps the store written to path read only, the pages are shared with every other process that maps it.
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    @classmethod
+    def publish(cls, name, snapshots):
+        """
+        Creates the shared memory segment name holding a store of the snapshots and returns the
+        multiprocessing.shared_memory.SharedMemory. The segment lives until unlink() is called on it.
+        """
+        data = cls.encode(snapshots)
+        segment = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        segment.buf[:len(data)] = data
+        return segment
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attaches to a store published to the shared memory segment name.
+        """
+        segment = shared_memory.SharedMemory(name=name)
+        # Attaching registers the segment with the resource tracker, which would remove it when this process
+        # exits. It belongs to the publisher.
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return cls(segment.buf, segment)
+
+
+class _Keys:
+    # The data URLs of a store as a sequence for bisect, decoded one at a time as the search visits them.
+    def __init__(self, view, count):
+        self._view = view
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        key_offset, key_length, blob_offset, blob_length = _ENTRY.unpack_from(self._view, _entry_offset(i))
+        return bytes(self._view[key_offset:key_offset + key_length]).decode('utf-8')
+
+
+def _entry_offset(i):
+    return _HEADER.size + i * _ENTRY.size
@@ -0,0 +1,221 @@
+import concurrent.futures
+import csv
+import hashlib
+import io
+import math
+import os
+
+import pandas as pd
+
+from sdig.erddap import cache
+from sdig.erddap import formats
+from sdig.erddap import query
+from sdig.erddap.dtypes import DtypePlan
+
+_ORIGIN = pd.Timestamp('1970-01-01T00:00:00Z')
+_EXTENSIONS = ('.parquet', '.csv', '.empty')
+
+
+class TileCache:
+    """
+    A local disk cache of data split into fixed length time tiles for each platform. A read fetches only the tiles
+    it has not seen before and stitches the rest together from disk, so panning or zooming the time slider over
+    ranges already viewed costs a disk read instead of a request to ERDDAP. Tiles are aligned on the Unix epoch so
+    overlapping requests share tiles, and tiles that reach past the time_coverage_end of the data set are not kept
+    because data may still be arriving for them. Tiles are stored as Parquet when pyarrow or fastparquet is
+    installed and as csv with the dtype of each column otherwise, and the least recently read tiles are removed
+    when the cache grows past max_bytes.
+
+        Parameters:
+                :param: directory: where to keep the tiles, created if it does not exist
+                :type: str
+                :param: tile_length: the time span of each tile, e.g. '7D'
+                :type: str or pandas.Timedelta
+                :param: max_bytes: the size of the tiles kept on disk before the least recently used are removed
+                :type: int
+                :param: max_workers: the most tiles read from ERDDAP at the same time
+                :type: int
+                :param: file_type: the ERDDAP response type to read tiles with, one of csv, nc or parquet
+                :type: str
+    """
+    def __init__(self, directory, tile_length='7D', max_bytes=2 * 1024 ** 3, max_workers=4, file_type='csv'):
+        self.directory = directory
+        self.tile_length = pd.Timedelta(tile_length)
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.file_type = file_type
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def read(self, info, variables, start, end, platforms=None):
+        """
+        Returns the data of the variables from start to end for the platforms, reading only missing tiles from
+        ERDDAP. The time and platform variables are always included and time is returned as UTC datetime64.
+
+            Parameters:
+                    :param: info: the Info of the data set
+                    :type: sdig.erddap.info.Info
+                    :param: variables: the short names of the variables to read
+                    :type: list
+                    :param: start: the start time, ISO string or Unix epoch seconds as from get_time_marks
+                    :type: str or float
+                    :param: end: the end time, ISO string or Unix epoch seconds as from get_time_marks
+                    :type: str or float
+                    :param: platforms: the id or list of ids of the platforms to read, all platforms if None
+                    :type: list or str
+            Returns:
+                    :returns: df: the rows from start to end, by platform and then time
+                    :rtype: Dataframe
+        """
+        time_name = info.get_time_variable()
+        platform_name = info.get_platform_variable()
+        if platforms is not None and platform_name is None:
+            raise ValueError('Platforms can only be selected in a data set with a platform id variable, ' + info.url +
+                             ' has none')
+        columns = list(variables)
+        for name in (platform_name, time_name):
+            if name is not None and name not in columns:
+                columns.insert(0, name)
+        start_date, end_date, start_date_seconds, end_date_seconds = info.get_times()
+        coverage_end = query.to_timestamp(end_date_seconds)
+        start = max(query.to_timestamp(start), query.to_timestamp(start_date_seconds))
+        end = min(query.to_timestamp(end), coverage_end)
+        if start > end:
+            return pd.DataFrame(columns=columns)
+        if platforms is None:
+            platforms = [None]
+        elif not isinstance(platforms, list):
+            platforms = [platforms]
+        platforms = [None if p is None else str(p) for p in platforms]
+
+        first = self._tile(start)
+        last = self._tile(end)
+        tiles = {}
+        missing = {}
+        for k in range(first, last + 1):
+            for platform in platforms:
+                df = self._load(self._path(info.url, columns, platform, k))
+                if df is None:
+                    self.misses += 1
+                    missing.setdefault(k, []).append(platform)
+                else:
+                    self.hits += 1
+                    tiles[(platform, k)] = df
+        if missing:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._fetch, info, columns, time_name, platform_name, k, tile_platforms,
+                                           coverage_end)
+                           for k, tile_platforms in missing.items()]
+                for future in futures:
+                    tiles.update(future.result())
+            self._evict()
+
+        frames = [tiles[(platform, k)] for platform in platforms for k in range(first, last + 1)]
+        frames = [df for df in frames if len(df) > 0]
+        if len(frames) == 0:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, ignore_index=True)
+        df = df[(df[time_name] >= start) & (df[time_name] <= end)]
+        return df.reset_index(drop=True)
+
+    def stats(self):
+        """
+        Returns the tile hit and miss counters and the number and size of the tiles on disk.
+        """
+        sizes = [entry.stat().st_size for entry in self._entries()]
+        return {'hits': self.hits, 'misses': self.misses, 'tiles': len(sizes), 'bytes': sum(sizes)}
+
+    def clear(self):
+        for entry in self._entries():
+            os.remove(entry.path)
+
+    def _tile(self, timestamp):
+        return math.floor((timestamp - _ORIGIN) / self.tile_length)
+
+    def _fetch(self, info, columns, time_name, platform_name, k, platforms, coverage_end):
+        tile_start = _ORIGIN + k * self.tile_length
+        tile_end = tile_start + self.tile_length
+        constraints = query.time_constraints(time_name, tile_start, tile_end, end_inclusive=False)
+        if platforms != [None]:
+            constraints.append(info.make_platform_constraint(platform_name, platforms)['con'])
+        # The ids as strings, read as numbers an id such as 01 would not match the platform it was asked for
+        df = query.read_table(info.url, columns, constraints, self.file_type, plan=DtypePlan.ids(info))
+        if df is None:
+            df = pd.DataFrame(columns=columns)
+        elif not pd.api.types.is_datetime64_any_dtype(df[time_name]):
+            df[time_name] = formats.to_datetimes(df[time_name])
+        complete = tile_end <= coverage_end
+        tiles = {}
+        for platform in platforms:
+            if platform is None:
+                part = df
+            else:
+                part = df[df[platform_name] == platform].reset_index(drop=True)
+            if complete:
+                self._store(self._path(info.url, columns, platform, k), part)
+            tiles[(platform, k)] = part
+        return tiles
+
+    def _path(self, data_url, columns, platform, k):
+        key = '|'.join([data_url, ','.join(columns), str(platform), str(self.tile_length.value), str(k)])
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _load(self, path):
+        for extension in _EXTENSIONS:
+            try:
+                os.utime(path + extension)
+                if extension == '.parquet':
+                    return pd.read_parquet(path + extension)
+                if extension == '.csv':
+                    return _read_csv(path + extension)
+                return pd.DataFrame()
+            except FileNotFoundError:
+                # Not stored in this form, or evicted by another reader since
+                continue
+        return None
+
+    def _store(self, path, df):
+        if len(df) == 0:
+            cache.write_atomic(path + '.empty', b'')
+        elif formats.available('parquet'):
+            cache.write_atomic(path + '.parquet', df.to_parquet(index=False))
+        else:
+            cache.write_atomic(path + '.csv', _write_csv(df))
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(_EXTENSIONS)]
+
+    def _evict(self):
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries()]
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _write_csv(df):
+    # The rows with the dtype of each column in a row under the header, where ERDDAP puts the units
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(df.columns)
+    writer.writerow([str(dtype) for dtype in df.dtypes])
+    df.to_csv(buffer, index=False, header=False)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _read_csv(path):
+    with open(path, 'rb') as f:
+        body = f.read()
+    names, kinds = csv.reader([line.decode('utf-8') for line in body.split(b'\n', 2)[:2]])
+    times = {name: kind for name, kind in zip(names, kinds) if kind.startswith('datetime64')}
+    df = pd.read_csv(io.BytesIO(body), skiprows=[1],
+                     dtype={name: kind for name, kind in zip(names, kinds) if name not in times})
+    for name, kind in times.items():
+        df[name] = formats.to_datetimes(df[name]).astype(kind)
+    return df
@@ -1,4 +1,13 @@
 import numpy as np
+import pandas as pd
+
+# longitudinal range by zoom level (20 to 1)
+# in degrees, if centered at equator
+_LON_ZOOM_RANGE = np.array([
+    0.0007, 0.0014, 0.003, 0.006, 0.012, 0.024, 0.048, 0.096,
+    0.192, 0.3712, 0.768, 1.536, 3.072, 6.144, 11.8784, 23.7568,
+    47.5136, 98.304, 190.0544, 360.0
+])
 
 # https://stackoverflow.com/questions/63787612/plotly-automatic-zooming-for-mapbox-maps
 def zoom_center(lons: tuple = None, lats: tuple = None, lonlats: tuple = None,
@@ -45,24 +54,146 @@ def zoom_center(lons: tuple = None, lats: tuple = None, lonlats: tuple = None,
         'lat': round((maxlat + minlat) / 2, 6)
     }
 
-    # longitudinal range by zoom level (20 to 1)
-    # in degrees, if centered at equator
-    lon_zoom_range = np.array([
-        0.0007, 0.0014, 0.003, 0.006, 0.012, 0.024, 0.048, 0.096,
-        0.192, 0.3712, 0.768, 1.536, 3.072, 6.144, 11.8784, 23.7568,
-        47.5136, 98.304, 190.0544, 360.0
-    ])
-
     if projection == 'mercator':
-        margin = 1.2
-        height = (maxlat - minlat) * margin * width_to_height
-        width = (maxlon - minlon) * margin
-        lon_zoom = np.interp(width, lon_zoom_range, range(20, 0, -1))
-        lat_zoom = np.interp(height, lon_zoom_range, range(20, 0, -1))
-        zoom = round(min(lon_zoom, lat_zoom) * .85, 2)
+        zoom = round(float(_zoom(maxlon - minlon, maxlat - minlat, width_to_height)), 2)
     else:
         raise NotImplementedError(
             f'{projection} projection is not implemented'
         )
 
     return zoom, center
+
+
+def bounds(lons, lats, groups=None) -> pd.DataFrame:
+    """Finds the extent of the locations of every group in one pass.
+    Locations missing either component (NaN) are ignored, as are
+    locations with a missing group.
+
+    Parameters
+    --------
+    lons: array-like, longitude component of each location
+    lats: array-like, latitude component of each location
+    groups: array-like, optional, the group (platform, trajectory, ...)
+        of each location, all locations are one group 0 if not passed
+
+    Returns
+    --------
+    bounds: DataFrame, minlon, maxlon, minlat and maxlat columns
+        indexed by group
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    groups = np.zeros(len(lons), dtype=int) if groups is None else np.asarray(groups)
+    located = ~(np.isnan(lons) | np.isnan(lats))
+    if not located.all():
+        lons, lats, groups = lons[located], lats[located], groups[located]
+    grouped = pd.DataFrame({'lon': lons, 'lat': lats}).groupby(groups, sort=False)
+    minimum = grouped.min()
+    maximum = grouped.max()
+    return pd.DataFrame({'minlon': minimum['lon'], 'maxlon': maximum['lon'],
+                         'minlat': minimum['lat'], 'maxlat': maximum['lat']})
+
+
+def zoom_centers(lons, lats, groups=None, projection: str = 'mercator',
+                 width_to_height: float = 2.0) -> pd.DataFrame:
+    """Finds the zoom and center of every group of locations at once,
+    the batched form of zoom_center for numpy arrays or DataFrame columns.
+
+    Parameters
+    --------
+    lons: array-like, longitude component of each location
+    lats: array-like, latitude component of each location
+    groups: array-like, optional, the group of each location, e.g. the
+        platform id column, all locations are one group 0 if not passed
+    projection: str, only accepting 'mercator' at the moment
+    width_to_height: float, expected ratio of final graph's with to height
+
+    Returns
+    --------
+    zoom_centers: DataFrame, zoom, lon and lat columns indexed by group,
+        each row what zoom_center returns for the locations of the group
+
+    >>> df = pd.DataFrame({'id': ['a', 'a', 'b', 'b'],
+    ...     'longitude': [-109.031387, -103.385460, 10.0, 10.5],
+    ...     'latitude': [25.587101, 31.784620, 50.0, 50.2]})
+    >>> zoom_centers(df['longitude'], df['latitude'], df['id'])
+       zoom         lon        lat
+    a  4.89 -106.208423  28.685861
+    b  8.86   10.250000  50.100000
+    """
+    return _zoom_centers(bounds(lons, lats, groups), projection, width_to_height)
+
+
+def frame_zoom_centers(df: pd.DataFrame, group: str = None, lon: str = 'longitude', lat: str = 'latitude',
+                       projection: str = 'mercator', width_to_height: float = 2.0) -> pd.DataFrame:
+    """zoom_centers for the locations in the lon and lat columns of df,
+    grouped by the values of the group column.
+    """
+    return zoom_centers(df[lon], df[lat], None if group is None else df[group], projection, width_to_height)
+
+
+class Bounds:
+    """Accumulates the extent of each group of locations from chunks of
+    data as they arrive, e.g. from Info.get_data, so a map can be framed
+    before the whole download is finished:
+
+        extent = Bounds()
+        for df in info.get_data(['time', 'latitude', 'longitude', 'ID'], time_chunk='30D'):
+            extent.update_frame(df, 'ID')
+            zoom, center = extent.zoom_center()
+    """
+    def __init__(self):
+        self.bounds = pd.DataFrame(columns=['minlon', 'maxlon', 'minlat', 'maxlat'], dtype=float)
+
+    def update(self, lons, lats, groups=None):
+        """Adds a chunk of locations, see bounds for the parameters."""
+        chunk = bounds(lons, lats, groups)
+        if len(self.bounds) == 0:
+            self.bounds = chunk
+            return
+        both = pd.concat([self.bounds, chunk]).groupby(level=0, sort=False)
+        minimum = both.min()
+        maximum = both.max()
+        self.bounds = pd.DataFrame({'minlon': minimum['minlon'], 'maxlon': maximum['maxlon'],
+                                    'minlat': minimum['minlat'], 'maxlat': maximum['maxlat']})
+
+    def update_frame(self, df: pd.DataFrame, group: str = None, lon: str = 'longitude', lat: str = 'latitude'):
+        """Adds the locations in the lon and lat columns of a chunk."""
+        self.update(df[lon], df[lat], None if group is None else df[group])
+
+    def zoom_centers(self, projection: str = 'mercator', width_to_height: float = 2.0) -> pd.DataFrame:
+        """The zoom and center of each group seen so far, like zoom_centers."""
+        return _zoom_centers(self.bounds, projection, width_to_height)
+
+    def zoom_center(self, projection: str = 'mercator', width_to_height: float = 2.0) -> (float, dict):
+        """The zoom and center of all locations seen so far, like zoom_center."""
+        if len(self.bounds) == 0:
+            raise ValueError('No locations have been added')
+        extent = self.bounds.agg({'minlon': 'min', 'maxlon': 'max', 'minlat': 'min', 'maxlat': 'max'})
+        row = _zoom_centers(extent.to_frame().T, projection, width_to_height).iloc[0]
+        return float(row['zoom']), {'lon': float(row['lon']), 'lat': float(row['lat'])}
+
+
+def _zoom(width, height, width_to_height):
+    # The mercator zoom that fits a width by height degree extent, for scalars or arrays of extents.
+    margin = 1.2
+    lon_zoom = np.interp(width * margin, _LON_ZOOM_RANGE, range(20, 0, -1))
+    lat_zoom = np.interp(height * margin * width_to_height, _LON_ZOOM_RANGE, range(20, 0, -1))
+    return np.minimum(lon_zoom, lat_zoom) * .85
+
+
+def _zoom_centers(extents, projection, width_to_height):
+    if projection != 'mercator':
+        raise NotImplementedError(
+            f'{projection} projection is not implemented'
+        )
+    zoom = _zoom((extents['maxlon'] - extents['minlon']).to_numpy(dtype=float),
+                 (extents['maxlat'] - extents['minlat']).to_numpy(dtype=float), width_to_height)
+    # One value per group, rounded with round() so the centers are exactly those of zoom_center.
+    lon = (extents['maxlon'] + extents['minlon']).to_numpy(dtype=float) / 2
+    lat = (extents['maxlat'] + extents['minlat']).to_numpy(dtype=float) / 2
+    return pd.DataFrame({
+        'zoom': np.round(zoom, 2),
+        'lon': [round(value, 6) for value in lon.tolist()],
+        'lat': [round(value, 6) for value in lat.tolist()],
+    }, index=extents.index)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from sdig.erddap import fetch
+from sdig.erddap.cache import MemoryCache, DiskCache
+from sdig.erddap.info import Info
+
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            index_csv = f.read()
+        self.server = StandInServer({'CGBN_Canada': index_csv, 'other': index_csv}).start()
+        self.data_url = self.server.url + '/tabledap/CGBN_Canada'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_memory_hit(self):
+        cache = MemoryCache(ttl=60)
+        first = Info(self.data_url, cache=cache)
+        second = Info(self.data_url, cache=cache)
+        self.assertEqual(first.get_title(), second.get_title())
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_revalidate(self):
+        cache = MemoryCache(ttl=0)
+        Info(self.data_url, cache=cache)
+        info = Info(self.data_url, cache=cache)
+        self.assertEqual(info.get_dsg_type(), 'timeseries')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(cache.revalidations, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_evicted_before_revalidation(self):
+        class EvictingCache(MemoryCache):
+            # Loses the entry between the lookup and the 304, as eviction or another process sharing a disk cache do
+            def lookup(self, url):
+                body, headers = super().lookup(url)
+                self.clear()
+                return body, headers
+
+        url = self.data_url.replace('tabledap', 'info') + '/index.csv'
+        expected = fetch.get(url)
+        cache = EvictingCache(ttl=0)
+        self.assertEqual(cache.fetch(url), expected)
+        body, headers = cache.lookup(url)
+        self.assertIn('If-None-Match', headers)
+        status, body, response_headers = fetch.request(url, headers=headers)
+        self.assertEqual((status, body), (304, b''))
+        self.assertIsNone(cache.update(url, status, body, response_headers))
+        self.assertEqual(len(cache), 0)
+        # fetch reads the whole body again instead of caching the empty one
+        self.assertEqual(cache.fetch(url), expected)
+        self.assertEqual(cache._entries[url]['body'], expected)
+        self.assertEqual(cache.revalidations, 0)
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(ttl=60, max_entries=1)
+        Info(self.data_url, cache=cache)
+        Info(self.server.url + '/tabledap/other', cache=cache)
+        Info(self.data_url, cache=cache)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.evictions, 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            Info(self.data_url, cache=DiskCache(directory, ttl=60))
+            cache = DiskCache(directory, ttl=60)
+            info = Info(self.data_url, cache=cache)
+            self.assertEqual(info.get_title(), 'CGBN Canadian Arctic Flux 1993-1999')
+            self.assertEqual(len(self.server.requests), 1)
+            self.assertEqual(cache.hits, 1)
+
+    def test_default_cache(self):
+        cache = MemoryCache()
+        Info.set_cache(cache)
+        try:
+            Info(self.data_url)
+            Info(self.data_url)
+        finally:
+            Info.set_cache(None)
+        self.assertEqual(cache.hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from sdig.erddap.catalog import Catalog
+from sdig.erddap.info import Info
+from sdig.erddap.snapshot import Snapshot
+
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def snapshot(url, title, dsg_type, start, end, standard_names):
+    variables = ['time'] + list(standard_names)
+    long_names = {v: v.replace('_', ' ').capitalize() for v in variables}
+    names = dict(standard_names)
+    names['time'] = 'time'
+    times = (start[:10], end[:10], pd.Timestamp(start).timestamp(), pd.Timestamp(end).timestamp())
+    return Snapshot(url, {'get_dsg_type': dsg_type, 'get_dsg_info': (None, {}), 'get_times': times,
+                          'get_variables': (variables, long_names, {}, names, {}), 'get_title': title,
+                          'get_time_variable': 'time', 'get_platform_variable': None})
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshots = [
+            snapshot('http://e/tabledap/moorings', 'Ocean Moorings', 'timeseries', '2010-01-01T00:00:00Z',
+                     '2016-06-30T00:00:00Z', {'TEMP': 'sea_water_temperature', 'PSAL': 'sea_water_salinity'}),
+            snapshot('http://e/tabledap/old', 'Old Moorings', 'timeseries', '2000-01-01T00:00:00Z',
+                     '2014-12-31T23:00:00Z', {'TEMP': 'sea_water_temperature'}),
+            snapshot('http://e/tabledap/gliders', 'Gliders', 'trajectoryprofile', '2015-03-01T00:00:00Z',
+                     '2020-01-01T00:00:00Z', {'TEMP': 'sea_water_temperature'}),
+            snapshot('http://e/tabledap/wind', 'Wind at moorings', 'timeseries', '2012-01-01T00:00:00Z',
+                     '2018-01-01T00:00:00Z', {'WSPD': 'wind_speed'}),
+        ]
+        self.catalog = Catalog.build(self.snapshots)
+
+    def test_search(self):
+        self.assertEqual(self.catalog.search(standard_name='sea_water_temperature', dsg_type='TimeSeries',
+                                             start='2015-01-01', end='2015-12-31T23:59:59Z'),
+                         ['http://e/tabledap/moorings'])
+        self.assertEqual(self.catalog.search(text='MOORINGS'),
+                         ['http://e/tabledap/moorings', 'http://e/tabledap/old', 'http://e/tabledap/wind'])
+        self.assertEqual(self.catalog.search(text='wind speed'), ['http://e/tabledap/wind'])
+        self.assertEqual(self.catalog.search(text='psal'), ['http://e/tabledap/moorings'])
+        self.assertEqual(self.catalog.search(standard_name=['sea_water_temperature', 'sea_water_salinity']),
+                         ['http://e/tabledap/moorings'])
+        self.assertEqual(self.catalog.search(end='2005-01-01'), ['http://e/tabledap/old'])
+        self.assertEqual(self.catalog.search(start=pd.Timestamp('2019-01-01')), ['http://e/tabledap/gliders'])
+        self.assertEqual(self.catalog.search(text='nothing'), [])
+        self.assertEqual(self.catalog.search(), self.catalog.urls())
+
+    def test_refresh(self):
+        changed = snapshot('http://e/tabledap/wind', 'Wind', 'timeseries', '2012-01-01T00:00:00Z',
+                           '2019-01-01T00:00:00Z', {'WSPD': 'wind_speed'})
+        self.assertEqual(self.catalog.refresh(self.snapshots[:3] + [changed]), ['http://e/tabledap/wind'])
+        self.assertEqual(self.catalog.search(text='moorings'), ['http://e/tabledap/moorings', 'http://e/tabledap/old'])
+        self.assertEqual(self.catalog.search(start='2018-06-01', dsg_type='timeseries'), ['http://e/tabledap/wind'])
+        self.assertEqual(self.catalog.refresh(self.snapshots[1:3], prune=True),
+                         ['http://e/tabledap/moorings', 'http://e/tabledap/wind'])
+        self.assertEqual(self.catalog.search(standard_name='wind_speed'), [])
+        self.assertNotIn('wind', self.catalog._terms)
+        self.assertEqual(len(self.catalog), 2)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.snap')
+            self.catalog.save(path)
+            loaded = Catalog.load(path)
+        self.assertEqual(loaded.urls(), self.catalog.urls())
+        self.assertEqual(loaded.get('http://e/tabledap/old'), self.snapshots[1])
+        self.assertEqual(loaded.search(standard_name='sea_water_temperature', start='2015-01-01'),
+                         ['http://e/tabledap/gliders', 'http://e/tabledap/moorings'])
+
+    def test_from_info(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            index_csv = f.read()
+        with StandInServer({'CGBN_Canada': index_csv}) as server:
+            info = Info(server.url + '/tabledap/CGBN_Canada')
+            catalog = Catalog.build([info])
+        start, end = info.get_times()[:2]
+        self.assertEqual(catalog.search(text=info.get_title(), dsg_type=info.get_dsg_type(), start=start, end=end),
+                         [info.url])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the stand-in ERDDAP and the shared fixtures from this directory, they are not part of sdig.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
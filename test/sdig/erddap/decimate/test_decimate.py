@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap.decimate import Decimator
+from sdig.erddap.decimate import decimate
+from sdig.erddap.info import Info
+
+
+def reference_lttb(x, y, k):
+    # The usual one point at a time LTTB, with buckets of the inner points split as decimate splits them.
+    n = len(x)
+    if n <= k:
+        return list(range(n))
+    bucket = 1 + (np.arange(1, n - 1) - 1) * (k - 2) // (n - 2)
+    members = [np.flatnonzero(bucket == b) + 1 for b in range(1, k - 1)] + [np.array([n - 1])]
+    selected = [0]
+    for b in range(k - 2):
+        a = selected[-1]
+        cx, cy = x[members[b + 1]].mean(), y[members[b + 1]].mean()
+        area = np.abs((x[a] - cx) * (y[members[b]] - y[a]) - (x[a] - x[members[b]]) * (cy - y[a]))
+        selected.append(members[b][np.argmax(area)])
+    return selected + [n - 1]
+
+
+class TestDecimate(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        times = pd.date_range('2020-01-01T00:00:00Z', periods=20000, freq='min')
+        frames = []
+        for p in range(3):
+            frames.append(pd.DataFrame({'platform': 'P' + str(p), 'time': times,
+                                        'temp': np.cumsum(rng.normal(0, 1, len(times))),
+                                        'salt': rng.normal(35, 0.1, len(times))}))
+        df = pd.concat(frames, ignore_index=True)
+        df.loc[(df['platform'] == 'P1') & (df['time'].dt.day == 5), 'temp'] += 1000
+        # Cut a day out of P2 and plug it the way plug_gaps does
+        df = df[~((df['platform'] == 'P2') & (df['time'].dt.day == 8))]
+        self.df = Info.plug_gaps(df.copy(), 'time', 'platform', ['platform'], 3)
+
+    def test_minmax(self):
+        out = decimate(self.df, 'time', 'platform', 'temp', n_out=200)
+        self.assertEqual(out.groupby('platform').size().max() <= 2 * 200 + 4, True)
+        for platform, group in self.df.groupby('platform'):
+            kept = out[out['platform'] == platform]
+            self.assertEqual(kept['temp'].max(), group['temp'].max())
+            self.assertEqual(kept['temp'].min(), group['temp'].min())
+            self.assertEqual(kept['time'].iloc[0], group['time'].iloc[0])
+            self.assertEqual(kept['time'].iloc[-1], group['time'].iloc[-1])
+        # The plugged gap is kept, between the last row before it and the first row after it
+        gap = out[out['temp'].isna()]
+        self.assertEqual(gap['platform'].tolist(), ['P2'])
+        position = gap.index[0]
+        self.assertEqual(out.loc[position - 1, 'time'], self.df[self.df['time'].dt.day == 7]['time'].max())
+        self.assertEqual(out.loc[position + 1, 'time'], self.df[self.df['time'].dt.day == 9]['time'].min())
+
+    def test_lttb(self):
+        out = decimate(self.df, 'time', 'platform', 'temp', n_out=300, method='lttb')
+        for platform in ('P0', 'P1'):
+            group = self.df[self.df['platform'] == platform].reset_index(drop=True)
+            x = group['time'].to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+            expected = group.iloc[reference_lttb(x, group['temp'].to_numpy(), 300)]
+            kept = out[out['platform'] == platform].reset_index(drop=True)
+            pd.testing.assert_frame_equal(kept, expected.reset_index(drop=True))
+        self.assertEqual(out['temp'].isna().sum(), 1)
+
+    def test_order_and_values(self):
+        shuffled = self.df.sample(frac=1, random_state=2)
+        pd.testing.assert_frame_equal(decimate(shuffled, 'time', 'platform', ['temp', 'salt'], 100),
+                                      decimate(self.df, 'time', 'platform', ['temp', 'salt'], 100))
+        both = decimate(self.df, 'time', 'platform', ['temp', 'salt'], 100)
+        one = decimate(self.df, 'time', 'platform', 'temp', 100)
+        self.assertTrue(set(one['time'].astype(str) + one['platform']) <=
+                        set(both['time'].astype(str) + both['platform']))
+        with self.assertRaises(ValueError):
+            decimate(self.df, 'time', 'platform', 'temp', method='mean')
+
+    def test_streamed(self):
+        start = self.df['time'].min()
+        end = self.df['time'].max()
+        for method in ('minmax', 'lttb'):
+            decimator = Decimator('time', 'platform', 'temp', start, end, n_out=200, method=method)
+            self.assertIsNone(decimator.result())
+            for day, chunk in self.df.groupby(self.df['time'].dt.day):
+                decimator.update(chunk)
+                self.assertLess(len(decimator.candidates), 3 * 2 * 200 * 4 + 20)
+            self.assertEqual(decimator.rows, len(self.df))
+            result = decimator.result()
+            if method == 'minmax':
+                pd.testing.assert_frame_equal(result, decimate(self.df, 'time', 'platform', 'temp', 200,
+                                                               start=start, end=end))
+            else:
+                self.assertLessEqual(result.groupby('platform').size().max(), 200 + 4)
+                self.assertEqual(result['temp'].max(), self.df['temp'].max())
+            self.assertEqual(result['temp'].isna().sum(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
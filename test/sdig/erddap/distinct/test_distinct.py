@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from sdig.erddap.distinct import DistinctIndex
+from sdig.erddap.info import Info
+
+import fixtures
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def casts(station, start, depths, n):
+    times = pd.date_range(start, periods=n, freq='D')
+    return pd.DataFrame([{'station': station, 'profile': station + '_' + str(i), 'time': t, 'depth': d,
+                          'TEMP': 10.0 - d / 10} for i, t in enumerate(times) for d in depths])
+
+
+class TestDistinctIndex(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            index_csv = f.read().replace('TimeSeries', 'TimeSeriesProfile').replace(
+                'attribute,ID,cf_role,String,timeseries_id', 'attribute,station,cf_role,String,timeseries_id\n'
+                                                             'attribute,profile,cf_role,String,profile_id')
+        index_csv += 'variable,depth,,float,\nattribute,depth,positive,String,down\n'
+        self.data = {'tsp': pd.concat([casts('M1', '2020-01-01T00:00:00Z', [1.0, 10.0, 20.0], 5),
+                                       casts('M2', '2020-01-01T00:00:00Z', [1.0, 5.0], 5)], ignore_index=True)}
+        self.server = StandInServer({'tsp': index_csv}, self.data).start()
+        self.info = Info(self.server.url + '/tabledap/tsp')
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tsp.json')
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_answers(self):
+        index = DistinctIndex(self.info, self.path)
+        self.assertEqual(index.refresh(), 25)
+        requests = len(self.server.requests)
+        self.assertEqual(self.info.get_depths(index=index), [1.0, 5.0, 10.0, 20.0])
+        self.assertEqual(index.depths('M2'), [1.0, 5.0])
+        self.assertEqual(index.platforms(), ['M1', 'M2'])
+        self.assertEqual(index.platforms(depth=20.0), ['M1'])
+        self.assertEqual(len(index.filter(station='M1', depth=[1.0, 10.0])), 10)
+        self.assertEqual(len(self.server.requests), requests)
+
+    def test_incremental(self):
+        DistinctIndex(self.info, self.path).refresh()
+        self.data['tsp'] = pd.concat([self.data['tsp'], casts('M3', '2020-02-01T00:00:00Z', [50.0], 2)],
+                                     ignore_index=True)
+        # A new process loads the saved index and only asks for the new rows
+        index = DistinctIndex(self.info, self.path)
+        self.assertEqual(index.platforms(), ['M1', 'M2'])
+        self.assertEqual(index.refresh(), 2)
+        self.assertIn('time>2020-01-05T00:00:00Z', self.server.requests[-1].replace('%3E', '>'))
+        self.assertEqual(index.platforms(), ['M1', 'M2', 'M3'])
+        self.assertEqual(index.depths(), [1.0, 5.0, 10.0, 20.0, 50.0])
+        self.assertEqual(index.refresh(), 0)
+
+    def test_no_depth(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            self.server.datasets['ts'] = f.read()
+        times = pd.date_range('2020-01-01T00:00:00Z', periods=3)
+        self.server.data['ts'] = pd.DataFrame({'ID': ['A', 'B', 'A'], 'time': times, 'QS': [1.0, 2.0, 3.0]})
+        index = DistinctIndex(Info(self.server.url + '/tabledap/ts'))
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(index.depths(), [])
+        self.assertEqual(index.platforms(), ['A', 'B'])
+        with self.assertRaises(ValueError):
+            index.platforms(depth=10.0)
+
+    def test_numeric_ids(self):
+        # Ids that read as numbers keep their leading zeros, in memory and in the saved index
+        self.server.datasets['ts'] = fixtures.index_csv()
+        df = fixtures.hourly(['01', '02', '10'], 3)
+        df.loc[len(df) - 1, 'ID'] = None
+        self.server.data['ts'] = df
+        info = Info(self.server.url + '/tabledap/ts')
+        index = DistinctIndex(info, self.path)
+        self.assertEqual(index.refresh(), 4)
+        self.assertEqual(index.platforms(), ['01', '02', '10'])
+        self.assertEqual(len(index.filter(ID='01')), 1)
+        with open(self.path) as f:
+            self.assertNotIn('nan', f.read())
+        loaded = DistinctIndex(info, self.path)
+        self.assertEqual(loaded.platforms(), ['01', '02', '10'])
+        self.assertEqual(len(loaded.filter(ID=['01', '10'])), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
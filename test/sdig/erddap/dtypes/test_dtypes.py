@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import dtypes
+from sdig.erddap import formats
+from sdig.erddap.dtypes import DtypePlan
+from sdig.erddap.info import Info
+
+import fixtures
+import standin
+
+
+class TestDtypePlan(unittest.TestCase):
+
+    def setUp(self):
+        index_csv = fixtures.index_csv() + 'variable,flag,,short,\nattribute,flag,_FillValue,short,-99\n'
+        self.df = fixtures.hourly(['station_' + str(p) for p in range(20)], latitude=lambda p, times: 75.0 + p,
+                                  QS=lambda p, times: np.arange(len(times)) / 8 + p,
+                                  flag=lambda p, times: np.where(np.arange(len(times)) % 7 == 0, np.nan, 2.0))
+        self.server, data_url = fixtures.serve(self.df, index_csv)
+        self.info = Info(data_url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_plan(self):
+        plan = self.info.get_dtypes()
+        self.assertEqual(plan.dtypes, {'ID': 'category', 'latitude': 'float32', 'longitude': 'float32',
+                                       'QS': 'float32', 'TAU': 'float32', 'flag': 'Int16'})
+        self.assertEqual(plan.times, ['time'])
+        self.assertEqual(plan, DtypePlan.from_info(self.info))
+        self.assertEqual(plan.without(['ID', 'time']).dtypes.get('ID'), None)
+
+    def test_readers(self):
+        plan = self.info.get_dtypes()
+        data = self.df[['ID', 'time', 'QS', 'flag']]
+        for df in (formats.read(standin.encode_csv(data), 'csv', plan=plan),
+                   formats.read(standin.encode_nc(data), 'nc', plan=plan)):
+            self.assertEqual(df['ID'].dtype, 'category')
+            self.assertEqual(df['QS'].dtype, np.float32)
+            self.assertEqual(df['flag'].dtype, 'Int16')
+            self.assertTrue(df['flag'].isna().iloc[0])
+            self.assertEqual(df['flag'].iloc[1], 2)
+            self.assertEqual(df['time'].iloc[1], pd.Timestamp('1993-08-19T16:00:00Z'))
+            self.assertEqual(df['ID'].iloc[-1], 'station_19')
+
+    def test_get_data(self):
+        variables = ['ID', 'time', 'latitude', 'longitude', 'QS']
+        wide = pd.concat(self.info.get_data(variables, platforms_per_chunk=5, platforms=self.df['ID'].unique().tolist()),
+                         ignore_index=True)
+        compact = dtypes.concat(self.info.get_data(variables, platforms_per_chunk=5, compact=True,
+                                                   platforms=self.df['ID'].unique().tolist()))
+        self.assertEqual(len(compact), len(self.df))
+        self.assertEqual(compact['ID'].dtype, 'category')
+        self.assertTrue(np.allclose(compact['QS'].to_numpy(dtype=float), wide['QS']))
+        self.assertGreater(wide.memory_usage(deep=True).sum() / compact.memory_usage(deep=True).sum(), 4)
+        plugged = Info.plug_gaps(compact, 'time', 'ID', ['ID'], 3)
+        self.assertEqual(len(plugged), len(compact))
+        self.assertEqual(plugged['QS'].dtype, np.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+The data set most tests read: the CGBN_Canada time series metadata with hourly rows for a few platforms, served by
+a stand-in ERDDAP.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DATASET_ID = 'CGBN_Canada'
+START = '1993-08-19T15:00:00Z'
+
+
+def index_csv():
+    """
+    Returns the info/CGBN_Canada/index.csv of a time series data set with the platform id variable ID.
+    """
+    with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+        return f.read()
+
+
+def hourly(ids=5, periods=24 * 60, **columns):
+    """
+    Returns hourly rows from START for each platform with the columns ID, time, latitude, longitude and QS, the
+    number of the hour plus 10000 times the position of the platform.
+
+        Parameters:
+                :param: ids: the number of platforms, with ids '0', '1', ..., or the list of ids
+                :type: int or list
+                :param: periods: the rows of each platform
+                :type: int
+                :param: columns: columns to add or replace, each a function of the position of the platform and the
+                times that returns the values
+                :type: dict
+        Returns:
+                :returns: df: the rows of all the platforms, platform by platform
+                :rtype: Dataframe
+    """
+    if isinstance(ids, int):
+        ids = [str(p) for p in range(ids)]
+    times = pd.date_range(START, periods=periods, freq='h')
+    frames = []
+    for p, platform in enumerate(ids):
+        frame = {'ID': platform, 'time': times, 'latitude': 75.0, 'longitude': -95.0,
+                 'QS': np.arange(periods, dtype=float) + 10000 * p}
+        frame.update({name: values(p, times) for name, values in columns.items()})
+        frames.append(pd.DataFrame(frame))
+    return pd.concat(frames, ignore_index=True)
+
+
+def serve(df, index=None, **kwargs):
+    """
+    Starts a stand-in ERDDAP serving df as the CGBN_Canada data set and returns it with the data URL. kwargs go
+    to StandInServer, e.g. delay.
+
+        Parameters:
+                :param: df: the rows of the data set
+                :type: Dataframe
+                :param: index: the text of the index.csv, index_csv() if None
+                :type: str
+        Returns:
+                :returns: server: the started server, stop it when done
+                :rtype: StandInServer
+                :returns: data_url: the data URL of the data set
+                :rtype: str
+    """
+    server = StandInServer({DATASET_ID: index_csv() if index is None else index}, {DATASET_ID: df}, **kwargs).start()
+    return server, server.url + '/tabledap/' + DATASET_ID
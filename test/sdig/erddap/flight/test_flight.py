@@ -0,0 +1,135 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+import unittest
+import urllib.error
+
+from sdig.erddap import flight
+from sdig.erddap import instrument
+from sdig.erddap import query
+from sdig.erddap.flight import SingleFlight
+from sdig.erddap.info import AsyncInfo
+from sdig.erddap.info import Info
+
+import fixtures
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_threads(self):
+        group = SingleFlight()
+        calls = []
+        barrier = threading.Barrier(6)
+
+        def work():
+            calls.append(1)
+            time.sleep(0.2)
+            return [1, 2]
+
+        def call():
+            barrier.wait()
+            return group.do('key', work, copy=list)
+        with concurrent.futures.ThreadPoolExecutor(6) as executor:
+            results = list(executor.map(lambda i: call(), range(6)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[1, 2]] * 6)
+        self.assertEqual(len(set(id(r) for r in results)), 6)
+        self.assertEqual(group.stats(), {'executed': 1, 'coalesced': 5, 'in_flight': 0})
+        # Nothing is kept once the call is done
+        group.do('key', work)
+        self.assertEqual(len(calls), 2)
+
+    def test_exception(self):
+        group = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('no')
+        with concurrent.futures.ThreadPoolExecutor(3) as executor:
+            futures = [executor.submit(group.do, 'key', fail) for i in range(3)]
+        for future in futures:
+            self.assertIsInstance(future.exception(), ValueError)
+        self.assertEqual(group.stats()['executed'], 1)
+
+    def test_tasks_and_threads(self):
+        group = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.3)
+            return 'result'
+
+        async def run():
+            leader = asyncio.ensure_future(group.ado('key', work))
+            await asyncio.sleep(0.05)
+            # A thread waits for the call running on the event loop, a call on the loop's own thread can not.
+            from_thread = asyncio.to_thread(group.do, 'key', lambda: 'thread')
+            on_loop = group.do('key', lambda: 'loop')
+            followers = await asyncio.gather(from_thread, *[group.ado('key', work) for i in range(3)])
+            leader.cancel()
+            return on_loop, followers
+        on_loop, followers = asyncio.run(run())
+        self.assertEqual(on_loop, 'loop')
+        self.assertEqual(followers, ['result'] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(group.stats(), {'executed': 2, 'coalesced': 4, 'in_flight': 0})
+
+
+class TestCoalescedReads(unittest.TestCase):
+
+    def setUp(self):
+        self.df = fixtures.hourly(['1'], 48)
+        self.server, self.data_url = fixtures.serve(self.df, delay=0.2)
+        flight.flights.clear_stats()
+        self.stats = instrument.StatsRegistry()
+        instrument.add_sink(self.stats)
+
+    def tearDown(self):
+        instrument.remove_sink(self.stats)
+        self.server.stop()
+
+    def test_info_and_read_table(self):
+        barrier = threading.Barrier(8)
+
+        def load(i):
+            barrier.wait()
+            info = Info(self.data_url)
+            barrier.wait()
+            return info, query.read_table(self.data_url, ['ID', 'time', 'QS'], ['time>=1993-08-20T00:00:00Z'])
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(load, range(8)))
+        self.assertEqual(len(self.server.requests), 2)
+        infos = [info for info, df in results]
+        self.assertTrue(all(info.metadata is infos[0].metadata for info in infos))
+        frames = [df for info, df in results]
+        self.assertEqual(len(frames[0]), 39)
+        frames[0]['QS'] = -1.0
+        self.assertEqual(frames[1]['QS'].iloc[0], 9.0)
+        self.assertEqual(flight.flights.stats()['coalesced'], 14)
+        counts = self.stats.counts()
+        self.assertEqual(counts[('info', 'coalesced')], 7)
+        self.assertEqual(counts[('tabledap', 'coalesced')], 7)
+
+    def test_async(self):
+        async def load():
+            infos = await asyncio.gather(*[AsyncInfo.open(self.data_url) for i in range(4)])
+            chunks = await asyncio.gather(*[query.aread_table(self.data_url, ['ID', 'QS'], []) for i in range(4)])
+            return infos, chunks
+        infos, chunks = asyncio.run(load())
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(infos[3].get_title(), 'CGBN Canadian Arctic Flux 1993-1999')
+        self.assertTrue(all(len(df) == 48 for df in chunks))
+        self.assertEqual(flight.flights.stats()['coalesced'], 6)
+
+    def test_errors_are_shared(self):
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(Info, self.server.url + '/tabledap/missing') for i in range(4)]
+        for future in futures:
+            self.assertIsInstance(future.exception(), urllib.error.HTTPError)
+        self.assertEqual(len(self.server.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import struct
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import formats
+from sdig.erddap import netcdf3
+
+import standin
+
+
+def name(text):
+    encoded = text.encode('utf-8')
+    return struct.pack('>i', len(encoded)) + encoded + b'\0' * ((4 - len(encoded) % 4) % 4)
+
+
+class TestFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({'station': ['M1', 'M22', 'M1'],
+                                'time': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03'], utc=True),
+                                'depth': np.array([1, 2, 3], dtype='int16'),
+                                'SST': [1.5, np.nan, 3.0]})
+
+    def test_nc_round_trip(self):
+        df = formats.read(standin.encode_nc(self.df), 'nc')
+        self.assertEqual(df['station'].tolist(), ['M1', 'M22', 'M1'])
+        self.assertEqual(df['time'].iloc[2], pd.Timestamp('2020-01-03T00:00:00Z'))
+        self.assertEqual(df['depth'].dtype, np.int16)
+        self.assertTrue(np.isnan(df['SST'].iloc[1]))
+
+    def test_csv(self):
+        df = formats.read(standin.encode_csv(self.df), 'csv')
+        self.assertEqual(df['time'].iloc[0], '2020-01-01T00:00:00Z')
+        self.assertEqual(len(df), 3)
+
+    def test_csv_parse_times(self):
+        df = formats.read(standin.encode_csv(self.df), 'csv', parse_times=True)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['time']))
+        self.assertEqual(df['time'].tolist(), self.df['time'].tolist())
+        self.assertEqual(df['station'].tolist(), ['M1', 'M22', 'M1'])
+
+    def test_to_datetimes(self):
+        expected = [pd.Timestamp('1999-12-31T23:59:59Z'), pd.NaT, pd.Timestamp('2024-02-29T12:30:00Z')]
+        fixed = pd.Series(['1999-12-31T23:59:59Z', None, '2024-02-29T12:30:00Z'])
+        self.assertEqual(formats.to_datetimes(fixed).tolist(), expected)
+        epoch = pd.Series([946684799, np.nan, 1709209800])
+        self.assertEqual(formats.to_datetimes(epoch).tolist(), expected)
+        # Other forms go to pandas
+        iso = pd.Series(['1999-12-31T23:59:59.500Z', '2024-02-29T12:30:00Z'])
+        self.assertEqual(formats.to_datetimes(iso).iloc[0], pd.Timestamp('1999-12-31T23:59:59.5Z'))
+        times = self.df['time']
+        self.assertIs(formats.to_datetimes(times), times)
+        with self.assertRaises(ValueError):
+            formats.to_datetimes(pd.Series(['2020-13-01T00:00:00Z']))
+        # A day the month does not have is an error, not the first of the next month
+        for day in ('2021-04-31T00:00:00Z', '2023-02-29T00:00:00Z'):
+            with self.assertRaises(ValueError):
+                formats.to_datetimes(pd.Series(['2021-04-30T00:00:00Z', day]))
+
+    def test_fill_value(self):
+        body = netcdf3.write({'n': (np.array([1, -999, 3], dtype='int32'), {'_FillValue': -999})})
+        df = formats.read_nc(body)
+        self.assertTrue(np.isnan(df['n'].iloc[1]))
+        self.assertEqual(df['n'].iloc[2], 3)
+
+    def test_record_variables(self):
+        # A classic format file with an unlimited dimension, so the variables are interleaved record by record
+        header = b'CDF\x01' + struct.pack('>I', 3)
+        header += struct.pack('>ii', 10, 2) + name('time') + struct.pack('>i', 0) + name('strlen') + struct.pack('>i', 2)
+        header += struct.pack('>ii', 0, 0)
+        specs = [('t', [0], 6, 8), ('s', [0], 3, 4), ('c', [0, 1], 2, 4)]
+
+        def variables(begins):
+            out = struct.pack('>ii', 11, len(specs))
+            for (var, dim_ids, code, vsize), begin in zip(specs, begins):
+                out += name(var) + struct.pack('>i', len(dim_ids)) + b''.join(struct.pack('>i', d) for d in dim_ids)
+                out += struct.pack('>ii', 0, 0) + struct.pack('>iiI', code, vsize, begin)
+            return out
+
+        base = len(header + variables([0, 0, 0]))
+        data = b''
+        for r in range(3):
+            data += struct.pack('>d', r + 0.5) + struct.pack('>h', r * 10) + b'\0\0' + ('a' + str(r)).encode() + b'\0\0'
+        dimensions, attributes, variables_read = netcdf3.read(header + variables([base, base + 8, base + 12]) + data)
+        self.assertEqual(dimensions['time'], 3)
+        self.assertEqual(variables_read['t'][1].tolist(), [0.5, 1.5, 2.5])
+        self.assertEqual(variables_read['s'][1].tolist(), [0, 10, 20])
+        self.assertEqual(variables_read['c'][1].tolist(), ['a0', 'a1', 'a2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import math
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap.gaps import GapPlugger
+from sdig.erddap.info import Info
+
+
+def hourly(station, hours, start=0):
+    times = pd.Timestamp('2020-01-01T00:00:00Z') + pd.to_timedelta(hours, unit='h')
+    return pd.DataFrame({'station_id': station, 'time': times.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                         'count': np.arange(start, start + len(hours)), 'SST': np.linspace(0., 1., len(hours)),
+                         'latitude': 1.0})
+
+
+class TestPlugGaps(unittest.TestCase):
+
+    def setUp(self):
+        hours = list(range(0, 7)) + [30, 31]
+        self.df = pd.concat([hourly('b', hours), hourly('a', hours, 9), hourly('c', list(range(0, 9)), 18)],
+                            ignore_index=True)
+
+    def test_gap_rows(self):
+        df = Info.plug_gaps(self.df, 'time', 'station_id', ['latitude', 'station_id', 'count'], 2)
+        self.assertEqual(len(df), len(self.df) + 2)
+        self.assertEqual(df['station_id'].tolist(), ['b'] * 10 + ['a'] * 10 + ['c'] * 9)
+        nan_row = df.loc[7]
+        self.assertTrue(math.isnan(nan_row['SST']))
+        self.assertEqual(nan_row['time'], pd.Timestamp('2020-01-01T18:00:00Z'))
+        self.assertEqual(nan_row['count'], 7)
+        self.assertEqual(nan_row['station_id'], 'b')
+        self.assertEqual(df['count'].dtype, np.int64)
+        self.assertTrue(math.isnan(df.loc[17]['SST']))
+        self.assertFalse(df.loc[20:]['SST'].isna().any())
+
+    def test_no_gaps(self):
+        df = Info.plug_gaps(self.df, 'time', 'station_id', ['latitude', 'station_id'], 10)
+        self.assertEqual(len(df), len(self.df))
+        self.assertFalse(df['SST'].isna().any())
+
+
+class TestGapPlugger(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        frames = []
+        for station in ['b', 'a', 'c']:
+            hours = np.cumsum(rng.choice([1, 1, 1, 1, 2, 40], size=300))
+            frames.append(hourly(station, hours))
+        self.df = pd.concat(frames, ignore_index=True)
+        self.df['time'] = pd.to_datetime(self.df['time'])
+        self.df = self.df.sort_values(['time', 'station_id'], kind='stable', ignore_index=True)
+        edges = pd.date_range(self.df['time'].min(), self.df['time'].max(), periods=7)
+        window = np.searchsorted(edges, self.df['time'], side='right')
+        self.chunks = [g.reset_index(drop=True) for w, g in self.df.groupby(window)]
+        self.keep = ['station_id', 'count']
+
+    def by_station(self, df):
+        # plug_gaps puts the platforms in order of first appearance in the whole frame
+        order = pd.Categorical(df['station_id'], categories=pd.unique(self.df['station_id']))
+        return df.iloc[np.argsort(order.codes, kind='stable')].reset_index(drop=True)
+
+    def gaps(self, df, after):
+        nan_rows = df[df['SST'].isna() & (df['time'] > after)]
+        return sorted(zip(nan_rows['station_id'], nan_rows['time']))
+
+    def test_exact(self):
+        batch = Info.plug_gaps(self.df.copy(), 'time', 'station_id', self.keep, 2)
+        plugger = GapPlugger('time', 'station_id', self.keep, 2)
+        for chunk in self.chunks:
+            plugger.observe(chunk.copy())
+        plugger.freeze()
+        streamed = pd.concat([plugger.plug(chunk.copy()) for chunk in self.chunks], ignore_index=True)
+        self.assertGreater(len(batch), len(self.df))
+        pd.testing.assert_frame_equal(self.by_station(streamed), batch)
+        with self.assertRaises(ValueError):
+            plugger.observe(self.chunks[0])
+
+    def test_running(self):
+        plugger = GapPlugger('time', 'station_id', self.keep, 2)
+        streamed = pd.concat([plugger.plug(chunk.copy()) for chunk in self.chunks], ignore_index=True)
+        batch = Info.plug_gaps(self.df.copy(), 'time', 'station_id', self.keep, 2)
+        # Apart from the first steps of each platform the running statistics find the same gaps.
+        later = self.df['time'].median()
+        self.assertEqual(self.gaps(streamed, later), self.gaps(batch, later))
+        self.assertGreater(len(self.gaps(batch, later)), 0)
+        self.assertEqual(sorted(plugger._stats), ['a', 'b', 'c'])
+        n, mean, m2 = plugger._stats['a']
+        steps = self.df[self.df['station_id'] == 'a']['time'].diff().dt.total_seconds()
+        self.assertEqual(n, steps.count())
+        self.assertAlmostEqual(mean, steps.mean())
+        self.assertAlmostEqual(np.sqrt(m2 / (n - 1)), steps.std(), places=6)
+
+    def test_gap_across_chunks(self):
+        plugger = GapPlugger('time', 'station_id', self.keep, 2)
+        first = plugger.plug(hourly('a', list(range(0, 10))))
+        second = plugger.plug(hourly('a', [30, 31]))
+        self.assertFalse(first['SST'].isna().any())
+        self.assertEqual(len(second), 3)
+        self.assertTrue(math.isnan(second.loc[0]['SST']))
+        self.assertEqual(second.loc[0]['time'], pd.Timestamp('2020-01-01T19:30:00Z'))
+
+
+if __name__ == '__main__':
+    unittest.main()
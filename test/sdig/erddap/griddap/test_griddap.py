@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap.griddap import Axis
+from sdig.erddap.griddap import GridCache
+from sdig.erddap.griddap import GridInfo
+
+import standin
+from standin import StandInServer
+
+
+class TestGriddap(unittest.TestCase):
+
+    def setUp(self):
+        # Monthly times are not evenly spaced, latitude runs north to south as in many ERDDAP grids
+        self.axes = {'time': np.array(['2020-01-16', '2020-02-15', '2020-03-16', '2020-04-16'], dtype='datetime64[s]'),
+                     'latitude': np.linspace(89.5, -89.5, 180), 'longitude': np.linspace(-179.5, 179.5, 360)}
+        self.sst = (np.arange(4)[:, None, None] * 1e6 + np.arange(180)[None, :, None] * 1000 +
+                    np.arange(360)[None, None, :]).astype(np.float32)
+        self.sst[1, 100, 200] = np.nan
+        self.server = StandInServer({'sst': standin.grid_index_csv(self.axes, {'sst': self.sst})},
+                                    grids={'sst': (self.axes, {'sst': self.sst})}).start()
+        self.info = GridInfo(self.server.url + '/griddap/sst')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_axes(self):
+        axes = self.info.get_axes()
+        self.assertEqual([axis.name for axis in axes], ['time', 'latitude', 'longitude'])
+        self.assertTrue(axes[0].is_time)
+        np.testing.assert_allclose(axes[1].values, self.axes['latitude'])
+        np.testing.assert_allclose(axes[0].values, self.axes['time'].astype(np.int64))
+        # Only the uneven time axis is read from the server, and only once
+        self.assertEqual(self.server.requests[1:], ['/erddap/griddap/sst.nc?time'])
+        self.info.get_axes()
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.info.get_grid_variables(), ['sst'])
+        self.assertEqual(axes[1].index_range(20, 50), (40, 69))
+        self.assertEqual(axes[1].index_range(50, 20), (40, 69))
+        self.assertEqual(axes[1].index_range(20.1, 20.2), (69, 69))
+        self.assertEqual(axes[0].nearest('2020-03-01'), 1)
+        self.assertEqual(Axis('x', [0, 1, 2]).index_range(None, 1.5), (0, 1))
+
+    def test_plan_subset(self):
+        subset = self.info.plan_subset({'time': '2020-02-15T00:00:00Z', 'latitude': (-60, 60),
+                                        'longitude': (None, None)}, {'latitude': 30, 'longitude': 90})
+        self.assertEqual(subset.ranges, [(1, 1, 1), (32, 4, 148), (0, 4, 356)])
+        self.assertEqual(subset.shape, (1, 30, 90))
+        self.assertEqual(subset.url('u', ['sst']), 'u.nc?sst[1:1:1][32:4:148][0:4:356]')
+        # No bounds and no shape is the whole grid
+        self.assertEqual(self.info.plan_subset().shape, (4, 180, 360))
+
+    def test_get_grid(self):
+        bounds = {'time': ('2020-02-01', '2020-04-01'), 'latitude': (-45, 45), 'longitude': (0, 90)}
+        grid = self.info.get_grid(['sst'], bounds, {'latitude': 20, 'longitude': 20})
+        self.assertEqual(grid.shape, (2, 18, 18))
+        expected = self.sst[1:3, 45:135:5, 180:270:5]
+        np.testing.assert_array_equal(grid.variables['sst'], expected)
+        self.assertEqual(grid.variables['sst'].dtype, np.float32)
+        self.assertTrue(np.isnan(grid.variables['sst'][0, 11, 4]))
+        self.assertEqual(grid.axes['time'][0], pd.Timestamp('2020-02-15T00:00:00Z'))
+        np.testing.assert_allclose(grid.axes['latitude'], self.axes['latitude'][45:135:5])
+        df = grid.to_dataframe()
+        self.assertEqual(len(df), 2 * 18 * 18)
+        self.assertEqual(list(df.columns), ['time', 'latitude', 'longitude', 'sst'])
+        self.assertEqual(df['sst'].iloc[1], expected[0, 0, 1])
+
+    def test_cache(self):
+        bounds = {'time': '2020-02-15', 'latitude': (0, 60), 'longitude': (-60, 0)}
+        with tempfile.TemporaryDirectory() as directory:
+            cache = GridCache(directory, chunk_points=16)
+            grid = self.info.get_grid(['sst'], bounds, {'latitude': 30, 'longitude': 30}, cache=cache)
+            direct = self.info.get_grid(['sst'], bounds, {'latitude': 30, 'longitude': 30})
+            np.testing.assert_array_equal(grid.variables['sst'], direct.variables['sst'])
+            misses = cache.stats()['misses']
+            self.assertGreater(misses, 1)
+            requests = len(self.server.requests)
+            # The same view again is read from disk, panning reads only the new chunks
+            again = self.info.get_grid(['sst'], bounds, {'latitude': 30, 'longitude': 30}, cache=cache)
+            np.testing.assert_array_equal(again.variables['sst'], direct.variables['sst'])
+            self.assertEqual(len(self.server.requests), requests)
+            panned = {'time': '2020-02-15', 'latitude': (0, 60), 'longitude': (-30, 30)}
+            grid = self.info.get_grid(['sst'], panned, {'latitude': 30, 'longitude': 30}, cache=cache)
+            direct = self.info.get_grid(['sst'], panned, {'latitude': 30, 'longitude': 30})
+            np.testing.assert_array_equal(grid.variables['sst'], direct.variables['sst'])
+            self.assertLess(cache.stats()['misses'] - misses, misses)
+            # Chunks of the last time step are read but not kept
+            stored = cache.stats()['chunks']
+            self.info.get_grid(['sst'], {'time': '2020-04-16', 'latitude': (0, 10), 'longitude': (0, 10)}, cache=cache)
+            self.assertEqual(cache.stats()['chunks'], stored)
+            # A chunk removed by another reader between finding and reading it is a miss
+            misses = cache.stats()['misses']
+            with unittest.mock.patch('os.utime', side_effect=FileNotFoundError):
+                grid = self.info.get_grid(['sst'], panned, {'latitude': 30, 'longitude': 30}, cache=cache)
+            np.testing.assert_array_equal(grid.variables['sst'], direct.variables['sst'])
+            self.assertGreater(cache.stats()['misses'], misses)
+            self.assertFalse([name for name in os.listdir(directory) if name.endswith('.tmp')])
+
+    def test_integer_fill(self):
+        # Only some of the chunks of the integer variable hold fill values, all of them come back as float
+        quality = np.tile(np.arange(360, dtype=np.int16), (4, 180, 1))
+        quality[0, 20:30, 20:30] = np.iinfo(np.int16).min
+        self.server.datasets['quality'] = standin.grid_index_csv(self.axes, {'quality': quality})
+        self.server.grids['quality'] = (self.axes, {'quality': quality})
+        info = GridInfo(self.server.url + '/griddap/quality')
+        bounds = {'time': '2020-01-16', 'latitude': (60, 89.5), 'longitude': (-179.5, -150)}
+        with tempfile.TemporaryDirectory() as directory:
+            cache = GridCache(directory, chunk_points=8)
+            for i in range(2):
+                grid = info.get_grid(['quality'], bounds, cache=cache)
+                values = grid.variables['quality']
+                self.assertEqual(values.dtype, np.float32)
+                self.assertTrue(np.isnan(values[0, 20:, 20:]).all())
+                self.assertEqual(np.isnan(values).sum(), 100)
+                np.testing.assert_array_equal(values[0, :20, :20], quality[0, :20, :20])
+
+
+if __name__ == '__main__':
+    unittest.main()
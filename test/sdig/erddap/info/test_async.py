@@ -0,0 +1,184 @@
+import asyncio
+import gzip
+import threading
+import time
+import unittest
+import urllib.error
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import fetch
+from sdig.erddap.cache import MemoryCache
+from sdig.erddap.info import AsyncInfo
+from sdig.erddap.info import Info
+
+import fixtures
+from standin import StandInServer
+
+
+class TestAsyncInfo(unittest.TestCase):
+
+    def setUp(self):
+        self.df = fixtures.hourly(3, QS=lambda p, times: np.arange(len(times), dtype=float))
+        datasets = {'CGBN_Canada_' + str(i): fixtures.index_csv() for i in range(8)}
+        self.server = StandInServer(datasets, {'CGBN_Canada_0': self.df}, delay=0.05).start()
+        self.session = fetch.AsyncSession(max_connections_per_host=2)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def url(self, i):
+        return self.server.url + '/tabledap/CGBN_Canada_' + str(i)
+
+    def test_open(self):
+        async def load():
+            return await AsyncInfo.open(self.url(0) + '.html', session=self.session)
+        info = asyncio.run(load())
+        self.assertEqual(info.url, self.url(0))
+        self.assertEqual(info.get_title(), 'CGBN Canadian Arctic Flux 1993-1999')
+        self.assertEqual(info.get_dsg_info(), Info(self.url(0)).get_dsg_info())
+
+    def test_open_many(self):
+        async def load():
+            urls = [self.url(i) for i in range(8)] + [self.server.url + '/tabledap/missing']
+            result = await AsyncInfo.open_many(urls, session=self.session)
+            await self.session.close()
+            return result
+        infos, errors = asyncio.run(load())
+        self.assertEqual(len(infos), 8)
+        self.assertIsInstance(errors[self.server.url + '/tabledap/missing'], urllib.error.HTTPError)
+        # Nine requests over at most two connections at a time, reused between requests
+        self.assertEqual(self.session.connections_opened, 2)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_get_data(self):
+        async def read():
+            info = await AsyncInfo.open(self.url(0), session=self.session)
+            return [df async for df in info.get_data(['ID', 'time', 'QS'], start='1993-08-20T00:00:00Z',
+                                                     end='1993-09-30T00:00:00Z', time_chunk='7D', file_type='nc')]
+        chunks = asyncio.run(read())
+        expected = list(Info(self.url(0)).get_data(['ID', 'time', 'QS'], start='1993-08-20T00:00:00Z',
+                                                   end='1993-09-30T00:00:00Z', time_chunk='7D', file_type='nc'))
+        self.assertEqual(len(chunks), 6)
+        for df, other in zip(chunks, expected):
+            pd.testing.assert_frame_equal(df, other)
+
+    def test_cache(self):
+        cache = MemoryCache(ttl=0)
+
+        async def load():
+            for i in range(2):
+                await AsyncInfo.open(self.url(1), cache=cache, session=self.session)
+        asyncio.run(load())
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['revalidations'], 1)
+
+    def test_two_loops(self):
+        # One session used from two threads, each with its own event loop, as the shared fetch.async_session is
+        urls = [self.server.url + '/info/CGBN_Canada_' + str(i) + '/index.csv' for i in range(8)]
+        results = {}
+
+        barrier = threading.Barrier(2)
+
+        async def worker(part):
+            # One after the other, so each request can reuse an idle connection
+            return [await self.session.get(url) for url in part]
+
+        async def load():
+            start = time.perf_counter()
+            parts = await asyncio.gather(*[worker(urls[i::4]) for i in range(4)])
+            await self.session.close()
+            return sum(parts, []), time.perf_counter() - start
+
+        def run(name):
+            barrier.wait()
+            try:
+                results[name] = asyncio.run(load())
+            except Exception as e:
+                results[name] = e
+        threads = [threading.Thread(target=run, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for name in ('a', 'b'):
+            bodies, elapsed = results[name]
+            self.assertEqual(len(set(bodies)), 1)
+            # Eight requests of 0.05 seconds, at most two at a time on each loop
+            self.assertGreaterEqual(elapsed, 0.19)
+        self.assertEqual(self.session.connections_opened, 4)
+
+    def test_timeout_excludes_slot_wait(self):
+        # Each request takes 0.05 seconds but the fourth waits 0.15 seconds for a slot
+        session = fetch.AsyncSession(max_connections_per_host=1, timeout=0.12)
+
+        async def load():
+            try:
+                return await asyncio.gather(*[session.get(self.server.url + '/info/CGBN_Canada_' + str(i) +
+                                                          '/index.csv') for i in range(4)])
+            finally:
+                await session.close()
+        self.assertEqual(len(asyncio.run(load())), 4)
+
+
+class TestAsyncSession(unittest.TestCase):
+
+    def test_chunked_gzip(self):
+        body = gzip.compress(b'a,b\n1,2\n' * 1000)
+
+        async def handle(reader, writer):
+            while True:
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                if reader.at_eof():
+                    break
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\nTransfer-Encoding: chunked\r\n\r\n')
+                for i in range(0, len(body), 1000):
+                    chunk = body[i:i + 1000]
+                    writer.write(('%x\r\n' % len(chunk)).encode() + chunk + b'\r\n')
+                writer.write(b'0\r\n\r\n')
+                await writer.drain()
+            writer.close()
+
+        async def read():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            url = 'http://127.0.0.1:' + str(server.sockets[0].getsockname()[1]) + '/x.csv'
+            session = fetch.AsyncSession()
+            bodies = [await session.get(url) for i in range(3)]
+            await session.close()
+            server.close()
+            return session, bodies
+        session, bodies = asyncio.run(read())
+        self.assertEqual(bodies, [b'a,b\n1,2\n' * 1000] * 3)
+        self.assertEqual(session.connections_opened, 1)
+
+    def test_redirect_loop(self):
+        async def handle(reader, writer):
+            while True:
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                if reader.at_eof():
+                    break
+                writer.write(b'HTTP/1.1 302 Found\r\nLocation: /x.csv\r\nContent-Length: 5\r\n\r\nmoved')
+                await writer.drain()
+            writer.close()
+
+        async def read(session):
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            url = 'http://127.0.0.1:' + str(server.sockets[0].getsockname()[1]) + '/x.csv'
+            try:
+                if isinstance(session, fetch.AsyncSession):
+                    return await session.request(url)
+                return await asyncio.to_thread(session.request, url)
+            finally:
+                server.close()
+        for session in (fetch.AsyncSession(), fetch.Session()):
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                asyncio.run(read(session))
+            self.assertEqual(raised.exception.code, 302)
+            self.assertIn('infinite loop', raised.exception.reason)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import tempfile
+import unittest
+import urllib.error
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import fetch
+from sdig.erddap import query
+from sdig.erddap.info import Info
+from sdig.erddap.tiles import TileCache
+
+import fixtures
+import standin
+
+
+class TestGetData(unittest.TestCase):
+
+    def setUp(self):
+        self.df = fixtures.hourly()
+        self.server, data_url = fixtures.serve(self.df)
+        self.info = Info(data_url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_chunked(self):
+        chunks = list(self.info.get_data(['ID', 'time', 'QS'], start='1993-08-20T00:00:00Z', end='1993-09-30T00:00:00Z',
+                                         platforms=['1', '3', '4'], time_chunk='7D', platforms_per_chunk=2))
+        self.assertEqual(len(chunks), 12)
+        df = pd.concat(chunks, ignore_index=True)
+        self.assertEqual(sorted(df['ID'].unique().tolist()), [1, 3, 4])
+        self.assertEqual(len(df), 3 * (41 * 24 + 1))
+        self.assertEqual(df['time'].min(), '1993-08-20T00:00:00Z')
+        self.assertEqual(df['time'].max(), '1993-09-30T00:00:00Z')
+        self.assertFalse(df.duplicated(['ID', 'time']).any())
+
+    def test_whole_and_empty(self):
+        chunks = list(self.info.get_data(['ID', 'QS'], platforms='2'))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(len(chunks[0]), 24 * 60)
+        # The data end on 1993-10-18, the windows after that have no data and are skipped
+        chunks = list(self.info.get_data(['ID', 'QS'], time_chunk='365D'))
+        self.assertEqual(len(self.server.requests), 1 + 1 + 7)
+        self.assertEqual(sum(len(c) for c in chunks), len(self.df))
+
+    def test_nc(self):
+        chunks = list(self.info.get_data(['ID', 'time', 'QS'], start='1993-08-20T00:00:00Z', end='1993-09-30T00:00:00Z',
+                                         platforms=['1', '3'], time_chunk='20D', file_type='nc'))
+        df = pd.concat(chunks, ignore_index=True)
+        self.assertTrue(self.server.requests[-1].startswith('/erddap/tabledap/CGBN_Canada.nc?'))
+        self.assertEqual(len(df), 2 * (41 * 24 + 1))
+        self.assertEqual(df['time'].min(), pd.Timestamp('1993-08-20T00:00:00Z'))
+        self.assertEqual(df['QS'].dtype, np.float64)
+        self.assertEqual(df['ID'].iloc[0], '1')
+
+    def test_parse_times(self):
+        chunks = list(self.info.get_data(['ID', 'time', 'QS'], start='1993-08-20T00:00:00Z', end='1993-09-30T00:00:00Z',
+                                         platforms='1', parse_times=True))
+        self.assertTrue(self.server.requests[-1].startswith('/erddap/tabledap/CGBN_Canada.nc?'))
+        self.assertEqual(chunks[0]['time'].min(), pd.Timestamp('1993-08-20T00:00:00Z'))
+        # A server that only answers csv gets the times decoded from the csv
+        def csv_only(df, file_type):
+            if file_type != 'csv':
+                return 400, 'text/plain', b''
+            return 200, 'text/csv', standin.encode_csv(df)
+        self.server.encode = csv_only
+        chunks = list(self.info.get_data(['ID', 'time', 'QS'], start='1993-08-20T00:00:00Z', end='1993-09-30T00:00:00Z',
+                                         platforms='3', parse_times=True))
+        self.assertTrue(self.server.requests[-1].startswith('/erddap/tabledap/CGBN_Canada.csv?'))
+        df = chunks[0]
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['time']))
+        self.assertEqual(len(df), 41 * 24 + 1)
+        marks = Info.get_time_marks(df['time'].min(), df['time'].max().to_datetime64())
+        self.assertEqual(list(marks), [745804800, 749347200])
+        plugged = Info.plug_gaps(df[df['time'].dt.day != 5].copy(), 'time', 'ID', ['ID'], 3)
+        self.assertEqual(plugged['QS'].isna().sum(), 1)
+
+    def test_unsupported_file_type(self):
+        # The stand-in rejects parquet when it cannot write it, either way the rows come back
+        chunks = list(self.info.get_data(['ID', 'QS'], platforms='2', file_type='parquet'))
+        self.assertEqual(len(chunks[0]), 24 * 60)
+
+    def test_no_rows_and_not_found(self):
+        # A query with no matching rows is None, a data set that is not there is an error
+        data_url = self.server.url + '/tabledap/CGBN_Canada'
+        self.assertIsNone(query.read_table(data_url, ['ID', 'QS'], ['QS<0']))
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            query.read_table(self.server.url + '/tabledap/missing', ['ID', 'QS'], [])
+        self.assertEqual(raised.exception.code, 404)
+        self.assertIn(b'Resource not found', raised.exception.read())
+
+        async def read(url):
+            session = fetch.AsyncSession()
+            try:
+                return await query.aread_table(url, ['ID', 'QS'], ['QS<0'], session=session)
+            finally:
+                await session.close()
+        self.assertIsNone(asyncio.run(read(data_url)))
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            asyncio.run(read(self.server.url + '/tabledap/missing'))
+        self.assertEqual(raised.exception.code, 404)
+
+    def test_platforms_without_platform_variable(self):
+        # A Point data set has no id variable, selecting platforms is an error rather than reading all of them
+        self.server.datasets['no_ids'] = fixtures.index_csv().replace('TimeSeries', 'Point')
+        self.server.data['no_ids'] = self.df
+        info = Info(self.server.url + '/tabledap/no_ids')
+        self.assertIsNone(info.get_platform_variable())
+        with self.assertRaises(ValueError):
+            list(info.get_data(['ID', 'QS'], platforms=['1']))
+        with self.assertRaises(ValueError):
+            info.get_reduced(['QS'], platforms='1')
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                TileCache(directory).read(info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-10T00:00:00Z', ['1'])
+        self.assertEqual(sum(len(c) for c in info.get_data(['ID', 'QS'])), len(self.df))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import unittest
+
+from sdig.erddap.info import Info
+
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestLazyInfo(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            index_csv = f.read()
+        self.server = StandInServer({'CGBN_Canada': index_csv}).start()
+        self.data_url = self.server.url + '/tabledap/CGBN_Canada.html'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_first_access(self):
+        info = Info(self.data_url, lazy=True)
+        self.assertEqual(info.url, self.server.url + '/tabledap/CGBN_Canada')
+        self.assertEqual(len(self.server.requests), 0)
+        self.assertEqual(info.get_title(), 'CGBN Canadian Arctic Flux 1993-1999')
+        self.assertEqual(info.get_dsg_type(), 'timeseries')
+        self.assertEqual(info.get_variables(), info.get_variables())
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_getters_return_copies(self):
+        info = Info(self.data_url)
+        variables, long_names = info.get_variables()[:2]
+        variables.append('not_a_variable')
+        long_names.clear()
+        info.get_dsg_info()[1].clear()
+        info.get_dtypes().dtypes.clear()
+        self.assertNotIn('not_a_variable', info.get_variables()[0])
+        self.assertTrue(info.get_variables()[1])
+        self.assertEqual(info.get_dsg_info()[1]['timeseries'], 'ID')
+        self.assertTrue(info.get_dtypes().dtypes)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_prefetch(self):
+        info = Info(self.data_url, lazy=True).prefetch()
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(info.get_dsg_info()[1]['timeseries'], 'ID')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_aprefetch(self):
+        async def load():
+            infos = [Info(self.data_url, lazy=True) for i in range(3)]
+            await asyncio.gather(*[info.aprefetch() for info in infos])
+            return infos
+        infos = asyncio.run(load())
+        # The three reads of the same index.csv at once share one request
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(infos[2].get_times()[0], '1993-08-19')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import time
+import unittest
+import urllib.error
+
+from sdig.erddap.fetch import Session
+from sdig.erddap.info import Info
+
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestLoadMany(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            index_csv = f.read()
+        self.datasets = {'ds_' + str(i): index_csv for i in range(20)}
+
+    def test_concurrent(self):
+        with StandInServer(self.datasets, delay=0.2) as server:
+            urls = [server.url + '/tabledap/' + dataset_id for dataset_id in self.datasets]
+            urls.append(server.url + '/tabledap/missing')
+            start = time.perf_counter()
+            infos, errors = Info.load_many(urls, max_workers=32)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(len(infos), 20)
+        self.assertEqual(infos[urls[3]].get_dsg_type(), 'timeseries')
+        self.assertIsInstance(errors[urls[-1]], urllib.error.HTTPError)
+        self.assertEqual(errors[urls[-1]].code, 404)
+        self.assertLess(elapsed, 20 * 0.2 / 2)
+
+    def test_connection_reuse(self):
+        session = Session()
+        with StandInServer(self.datasets) as server:
+            for dataset_id in self.datasets:
+                status, body, headers = session.request(server.url + '/info/' + dataset_id + '/index.csv')
+                self.assertEqual(status, 200)
+            session.close()
+        self.assertEqual(session.connections_opened, 1)
+        self.assertEqual(server.connections, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import instrument
+from sdig.erddap.cache import MemoryCache
+from sdig.erddap.info import Info
+
+import fixtures
+
+
+class TestInstrument(unittest.TestCase):
+
+    def setUp(self):
+        self.df = fixtures.hourly(['1'], 48)
+        self.server, self.data_url = fixtures.serve(self.df)
+        self.events = []
+        instrument.add_sink(self.events.append)
+
+    def tearDown(self):
+        instrument.remove_sink(self.events.append)
+        self.server.stop()
+
+    def test_no_sink(self):
+        instrument.remove_sink(self.events.append)
+        with instrument.span('info', 'x') as event:
+            self.assertIsNone(event)
+            self.assertIsNone(instrument.current())
+        Info(self.data_url)
+        self.assertEqual(self.events, [])
+
+    def test_info(self):
+        cache = MemoryCache()
+        Info(self.data_url, cache=cache)
+        Info(self.data_url, cache=cache)
+        first, second = self.events
+        self.assertEqual(first['name'], 'info')
+        self.assertEqual(first['url'], self.server.url + '/info/CGBN_Canada/index.csv')
+        self.assertEqual(first['cache'], 'miss')
+        self.assertEqual(first['status'], 200)
+        self.assertGreater(first['bytes'], 1000)
+        self.assertGreater(first['ttfb'], 0)
+        self.assertGreaterEqual(first['fetch'], first['ttfb'])
+        self.assertGreater(first['parse'], 0)
+        self.assertGreaterEqual(first['duration'], first['fetch'] + first['parse'])
+        self.assertEqual(first['rows'], 42)
+        self.assertEqual((second['cache'], second['bytes'], second['ttfb']), ('hit', 0, None))
+
+    def test_data(self):
+        info = Info(self.data_url)
+        chunks = list(info.get_data(['ID', 'time', 'QS'], start='1993-08-19T15:00:00Z', end='1993-08-21T14:00:00Z',
+                                    time_chunk='1D'))
+        df = Info.plug_gaps(pd.concat(chunks, ignore_index=True), 'time', 'ID', ['ID'], 1.0)
+        names = [event['name'] for event in self.events]
+        self.assertEqual(names, ['info', 'tabledap', 'tabledap', 'plug_gaps'])
+        self.assertEqual([event['rows'] for event in self.events[1:3]], [len(c) for c in chunks])
+        self.assertTrue(self.events[1]['url'].startswith(self.data_url + '.csv?ID,time,QS&time>='))
+        self.assertEqual(self.events[3]['rows'], len(df))
+        self.assertIsNone(self.events[3]['url'])
+
+    def test_nested_and_errors(self):
+        index_csv = fixtures.index_csv().replace('TimeSeries', 'TimeSeriesProfile').replace(
+            'attribute,ID,cf_role,String,timeseries_id', 'attribute,ID,cf_role,String,timeseries_id\n'
+                                                         'attribute,profile,cf_role,String,profile_id')
+        self.server.datasets['tsp'] = index_csv + 'variable,depth,,float,\nattribute,depth,positive,String,down\n'
+        self.server.data['tsp'] = pd.DataFrame({'ID': '1', 'profile': 'a', 'time': self.df['time'],
+                                                'depth': np.arange(48.0) % 4})
+        info = Info(self.server.url + '/tabledap/tsp')
+        self.assertEqual(info.get_depths(), [0.0, 1.0, 2.0, 3.0])
+        # The read_table inside get_depths adds to the get_depths event rather than making one of its own
+        self.assertEqual([event['name'] for event in self.events], ['info', 'get_depths'])
+        self.assertEqual(self.events[1]['rows'], 4)
+        self.assertGreater(self.events[1]['bytes'], 0)
+        with self.assertRaises(KeyError):
+            Info.plug_gaps(self.df.copy(), 'time', 'platform', [], 1.0)
+        self.assertEqual((self.events[2]['name'], self.events[2]['error']), ('plug_gaps', 'KeyError'))
+
+    def test_stats_registry(self):
+        registry = instrument.StatsRegistry()
+        instrument.add_sink(registry)
+        instrument.add_sink(_broken)
+        try:
+            with self.assertLogs('sdig.erddap.instrument', 'ERROR'):
+                for i in range(5):
+                    Info(self.data_url)
+        finally:
+            instrument.remove_sink(registry)
+            instrument.remove_sink(_broken)
+        self.assertEqual(registry.counts()[('info', 'events')], 5)
+        percentiles = registry.percentiles('info', 'duration')
+        self.assertLessEqual(percentiles[50], percentiles[99])
+        summary = registry.summary()
+        self.assertEqual(summary[summary['field'] == 'rows']['p90'].iloc[0], 42)
+        self.assertEqual(set(summary['field']), {'duration', 'ttfb', 'fetch', 'parse', 'bytes', 'rows'})
+
+    def test_logging_sink(self):
+        sink = instrument.LoggingSink()
+        instrument.add_sink(sink)
+        try:
+            with self.assertLogs('sdig.erddap.instrument', 'INFO') as logs:
+                Info(self.data_url)
+        finally:
+            instrument.remove_sink(sink)
+        self.assertIn('name=info url=' + self.server.url + '/info/CGBN_Canada/index.csv status=200', logs.output[0])
+
+
+def _broken(event):
+    raise RuntimeError('sink failure')
+
+
+if __name__ == '__main__':
+    unittest.main()
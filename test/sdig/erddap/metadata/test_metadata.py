@@ -0,0 +1,63 @@
+import io
+import os
+import unittest
+
+import pandas as pd
+
+from sdig.erddap.info import Info
+from sdig.erddap.metadata import Metadata
+
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            self.index_csv = f.read()
+        self.metadata = Metadata.from_dataframe(pd.read_csv(io.StringIO(self.index_csv)))
+
+    def test_attribute(self):
+        self.assertEqual(self.metadata.attribute('NC_GLOBAL', 'cdm_data_type'), 'TimeSeries')
+        self.assertEqual(self.metadata.attribute('QS', 'units'), 'W/m2')
+        self.assertIsNone(self.metadata.attribute('QS', 'standard_name'))
+
+    def test_variables_with(self):
+        self.assertEqual(self.metadata.variables_with('cf_role', 'timeseries_id'), ['ID'])
+        self.assertEqual(self.metadata.variables_with('standard_name'), ['latitude', 'longitude', 'time', 'TAU'])
+        self.assertEqual(self.metadata.variables, ['ID', 'latitude', 'longitude', 'time', 'QS', 'TAU'])
+        self.assertEqual(self.metadata.data_types['ID'], 'String')
+
+    def test_info_getters(self):
+        with StandInServer({'CGBN_Canada': self.index_csv}) as server:
+            info = Info(server.url + '/tabledap/CGBN_Canada.html')
+        self.assertEqual(info.get_dsg_type(), 'timeseries')
+        self.assertEqual(info.get_title(), 'CGBN Canadian Arctic Flux 1993-1999')
+        depth_name, dsg_id = info.get_dsg_info()
+        self.assertIsNone(depth_name)
+        self.assertEqual(dsg_id['timeseries'], 'ID')
+        start_date, end_date, start_date_seconds, end_date_seconds = info.get_times()
+        self.assertEqual(start_date, '1993-08-19')
+        self.assertEqual(end_date, '1999-11-05')
+        self.assertAlmostEqual(start_date_seconds, 745772400.0)
+        variables, long_names, units, standard_names, variable_types = info.get_variables()
+        self.assertIn('TAU', variables)
+        self.assertEqual(long_names['ID'], 'Ship id')
+        self.assertEqual(units['QS'], 'W/m2')
+        self.assertEqual(standard_names['latitude'], 'latitude')
+        self.assertEqual(variable_types['ID'], 'String')
+
+    def test_depth_variable(self):
+        profile_csv = self.index_csv.replace('TimeSeries', 'Profile').replace('timeseries_id', 'profile_id')
+        profile_csv += 'variable,depth,,float,\nattribute,depth,positive,String,down\n'
+        with StandInServer({'p': profile_csv}) as server:
+            info = Info(server.url + '/tabledap/p')
+        depth_name, dsg_id = info.get_dsg_info()
+        self.assertEqual(depth_name, 'depth')
+        self.assertEqual(dsg_id['profile'], 'ID')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import fetch
+from sdig.erddap import planner
+from sdig.erddap import query
+from sdig.erddap.info import AsyncInfo
+from sdig.erddap.info import Info
+
+import fixtures
+
+
+class TestPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.index_csv = fixtures.index_csv()
+        self.df = fixtures.hourly(['station_' + str(p) for p in range(5)],
+                                  QS=lambda p, times: np.sin(np.arange(len(times)) / 10) + p,
+                                  TAU=lambda p, times: np.arange(len(times), dtype=float))
+        self.server, data_url = fixtures.serve(self.df, self.index_csv)
+        self.info = Info(data_url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_split_platforms(self):
+        platforms = ['platform_number_' + str(p) for p in range(2000)]
+        groups = planner.split_platforms('ID', platforms, 500)
+        self.assertEqual(sum(groups, []), platforms)
+        for group in groups:
+            self.assertLessEqual(len(planner.platform_constraint('ID', group)), 500)
+        self.assertEqual(planner.split_platforms('ID', 'one', 500), [['one']])
+        self.assertEqual(planner.split_platforms('ID', None, 500), [None])
+        # get_data no longer sends one =~ of every platform
+        requests = self.info._data_requests(['ID', 'QS'], None, None, platforms, None, None, 'csv')
+        self.assertGreater(len(requests), 1)
+        self.assertTrue(all(len(query.tabledap_url(*r)) <= planner.MAX_URL_LENGTH for r in requests))
+        plan = self.info.plan_query(['QS'], platforms=platforms, method='minmax', max_url_length=2000)
+        self.assertTrue(all(len(url) <= 2000 for url in plan.urls()))
+
+    def test_mean(self):
+        plan = self.info.plan_query(['QS'], '1993-08-20T00:00:00Z', '1993-09-30T00:00:00Z', n_out=50)
+        self.assertEqual((plan.method, plan.interval), ('mean', '1day'))
+        self.assertEqual(len(plan), 1)
+        self.assertIn('orderByMean("ID,time/1day")', plan.urls()[0])
+        df = self.info.get_reduced(['QS'], '1993-08-20T00:00:00Z', '1993-09-30T00:00:00Z', n_out=50)
+        self.assertEqual(list(df.columns), ['ID', 'time', 'QS'])
+        self.assertEqual(len(df), 5 * 42)
+        rows = self.df[(self.df['time'] >= '1993-08-20T00:00:00Z') & (self.df['time'] <= '1993-09-30T00:00:00Z')]
+        expected = rows.groupby(['ID', rows['time'].dt.floor('1D')])['QS'].mean().to_numpy()
+        np.testing.assert_allclose(df['QS'].to_numpy(), expected)
+
+    def test_minmax_and_closest(self):
+        df = self.info.get_reduced(['QS', 'TAU'], platforms=['station_1', 'station_3'], n_out=20, method='minmax')
+        plan = self.info.plan_query(['QS', 'TAU'], platforms=['station_1', 'station_3'], n_out=20, method='minmax')
+        self.assertEqual(len(plan), 2)
+        self.assertEqual(sorted(df['ID'].unique()), ['station_1', 'station_3'])
+        self.assertFalse(df.duplicated().any())
+        for p in ('station_1', 'station_3'):
+            rows = self.df[self.df['ID'] == p]
+            self.assertAlmostEqual(df.loc[df['ID'] == p, 'QS'].max(), rows['QS'].max())
+            self.assertAlmostEqual(df.loc[df['ID'] == p, 'TAU'].min(), rows['TAU'].min())
+        self.assertLess(len(df), 2 * 3 * 20)
+        # The rows nearest to midnight on each Thursday, 7 day bins line up on the Unix epoch
+        closest = self.info.get_reduced(['QS'], '1993-08-20T00:00:00Z', '1993-10-10T00:00:00Z', 'station_2', n_out=10,
+                                        method='closest', parse_times=True)
+        self.assertEqual(len(closest), 8)
+        self.assertTrue((closest['time'].dt.hour == 0).all())
+        counts = self.info.get_reduced(['QS'], platforms='station_2', n_out=10, method='count')
+        self.assertEqual(counts['QS'].sum(), 24 * 60)
+
+    def test_resolution(self):
+        self.server.datasets['Hourly'] = self.index_csv + \
+            'attribute,NC_GLOBAL,time_coverage_resolution,String,PT1H\n'
+        self.server.data['Hourly'] = self.df
+        info = Info(self.server.url + '/tabledap/Hourly')
+        self.assertEqual(info.get_time_resolution(), pd.Timedelta('1h'))
+        self.assertIsNone(self.info.get_time_resolution())
+        # Months and years of their average length, not minutes
+        resolutions = (('P1M', pd.Timedelta('30.44D')), ('P1Y', pd.Timedelta('365.25D')),
+                       ('P1DT12H', pd.Timedelta('36h')), ('PT0.5S', pd.Timedelta('500ms')), ('P', None),
+                       ('1 hour', None))
+        for i, (resolution, expected) in enumerate(resolutions):
+            self.server.datasets['resolution_' + str(i)] = self.index_csv + \
+                'attribute,NC_GLOBAL,time_coverage_resolution,String,' + resolution + '\n'
+            other = Info(self.server.url + '/tabledap/resolution_' + str(i))
+            self.assertEqual(other.get_time_resolution(), expected, resolution)
+        # Zoomed in to fewer samples than n_out, the rows are read as they are
+        plan = info.plan_query(['QS'], '1993-09-01T00:00:00Z', '1993-09-03T00:00:00Z', n_out=1000)
+        self.assertIsNone(plan.method)
+        df = info.get_reduced(['QS'], '1993-09-01T00:00:00Z', '1993-09-03T00:00:00Z', n_out=1000)
+        self.assertEqual(len(df), 5 * 49)
+        self.assertEqual(info.plan_query(['QS'], n_out=1000).method, 'mean')
+
+    def test_async(self):
+        async def run():
+            session = fetch.AsyncSession()
+            try:
+                info = await AsyncInfo.open(self.server.url + '/tabledap/CGBN_Canada', session=session)
+                return await info.get_reduced(['QS'], n_out=100, platforms=['station_0', 'station_4'])
+            finally:
+                await session.close()
+        df = asyncio.run(run())
+        expected = self.info.get_reduced(['QS'], n_out=100, platforms=['station_0', 'station_4'])
+        pd.testing.assert_frame_equal(df, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
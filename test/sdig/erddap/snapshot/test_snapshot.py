@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap.info import Info
+from sdig.erddap.snapshot import GETTERS
+from sdig.erddap.snapshot import Snapshot
+from sdig.erddap.snapshot import SnapshotStore
+
+from standin import StandInServer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def attached_title(name, url, queue):
+    store = SnapshotStore.attach(name)
+    queue.put(Info.from_snapshot(store.get(url)).get_title())
+    store.close()
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA, 'CGBN_Canada_index.csv')) as f:
+            index_csv = f.read()
+        other_csv = index_csv.replace('CGBN', 'Other') + 'attribute,NC_GLOBAL,time_coverage_resolution,String,PT1H\n'
+        times = pd.date_range('1993-08-19T15:00:00Z', periods=24 * 30, freq='h')
+        df = pd.DataFrame({'ID': 'station_0', 'time': times, 'latitude': 75.0, 'longitude': -95.0,
+                           'QS': np.arange(len(times), dtype=float)})
+        self.server = StandInServer({'CGBN_Canada': index_csv, 'other': other_csv}, {'other': df}).start()
+        self.infos = [Info(self.server.url + '/tabledap/' + i) for i in ('CGBN_Canada', 'other')]
+        self.snapshots = [Snapshot.from_info(info) for info in self.infos]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_round_trip(self):
+        blob = self.snapshots[0].to_bytes()
+        self.assertLess(len(blob), 4096)
+        snapshot = Snapshot.from_bytes(blob)
+        self.assertEqual(snapshot, self.snapshots[0])
+        with self.assertRaises(AttributeError):
+            snapshot.url = 'x'
+        with self.assertRaises(ValueError):
+            Snapshot.from_bytes(b'x' * 16)
+
+    def test_from_snapshot(self):
+        requests = len(self.server.requests)
+        info = Info.from_snapshot(Snapshot.from_bytes(self.snapshots[0].to_bytes()))
+        for getter in GETTERS:
+            self.assertEqual(getattr(info, getter)(), getattr(self.infos[0], getter)())
+        self.assertEqual(info.dsg_type, 'timeseries')
+        self.assertEqual(len(self.server.requests), requests)
+        self.assertEqual(len(info.info_df), len(self.infos[0].info_df))
+        self.assertEqual(len(self.server.requests), requests + 1)
+
+    def test_reads_without_index_csv(self):
+        info = Info.from_snapshot(Snapshot.from_bytes(self.snapshots[1].to_bytes()))
+        self.assertEqual(info.get_time_resolution(), pd.Timedelta('1h'))
+        self.assertIsNone(Snapshot.from_bytes(self.snapshots[0].to_bytes()).values['get_time_resolution'])
+        requests = len(self.server.requests)
+        self.assertEqual(info.plan_query(['QS'], n_out=100).method, 'mean')
+        reduced = info.get_reduced(['QS'], n_out=100)
+        df = pd.concat(info.get_data(['ID', 'time', 'QS'], compact=True))
+        self.assertEqual(len(df), 24 * 30)
+        self.assertEqual(df['ID'].dtype, 'category')
+        # Only the data were read
+        self.assertFalse([r for r in self.server.requests[requests:] if '/info/' in r])
+        pd.testing.assert_frame_equal(reduced, self.infos[1].get_reduced(['QS'], n_out=100))
+
+    def test_file_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'erddap.snap')
+            SnapshotStore.write(path, self.snapshots)
+            store = SnapshotStore.open(path)
+            self.assertEqual(len(store), 2)
+            self.assertEqual(store.urls(), sorted(info.url for info in self.infos))
+            self.assertIn(self.infos[1].url, store)
+            self.assertIsNone(store.get(self.server.url + '/tabledap/missing'))
+            self.assertEqual(store.get(self.infos[1].url), self.snapshots[1])
+            self.assertIs(store.get(self.infos[1].url), store.get(self.infos[1].url))
+            self.assertEqual(Info.from_snapshot(store.get(self.infos[1].url)).get_title(),
+                             'Other Canadian Arctic Flux 1993-1999')
+            store.close()
+
+    def test_shared_memory(self):
+        name = 'sdig_test_' + uuid.uuid4().hex[:8]
+        segment = SnapshotStore.publish(name, self.snapshots)
+        try:
+            context = multiprocessing.get_context('spawn')
+            queue = context.Queue()
+            worker = context.Process(target=attached_title, args=(name, self.infos[0].url, queue))
+            worker.start()
+            self.assertEqual(queue.get(timeout=60), 'CGBN Canadian Arctic Flux 1993-1999')
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        finally:
+            segment.close()
+            segment.unlink()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,394 @@
+import email.utils
+import hashlib
+import http.server
+import io
+import re
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+from sdig.erddap import formats
+from sdig.erddap import netcdf3
+
+_CONSTRAINT = re.compile('^([A-Za-z_][A-Za-z0-9_]*)(>=|<=|!=|=~|=|<|>)(.*)$')
+_ORDER_BY = re.compile('^(orderByMax|orderByMin|orderByMinMax|orderByClosest|orderByMean|orderByCount)\\("(.*)"\\)$')
+_INTERVAL = re.compile('^([0-9.]+)([A-Za-z]*)$')
+# Seconds in each time unit of an interval, without a plural s
+_TIME_UNITS = {'milli': 0.001, 'millisecond': 0.001, 'sec': 1, 'second': 1, 'min': 60, 'minute': 60, 'hour': 3600,
+               'day': 86400}
+_NO_DATA = b'Error {\n    code=404;\n    message="Not Found: Your query produced no matching results. (nRows = 0)";\n}\n'
+_BAD_GRID_REQUEST = b'Error {\n    code=400;\n    message="Bad Request: Query error: invalid index range";\n}\n'
+_GRID_RANGE = re.compile('\\[([0-9]+)(?::([0-9]+))?(?::([0-9]+))?\\]')
+_NOT_FOUND = b'Error {\n    code=404;\n    message="Not Found: Resource not found";\n}\n'
+
+
+class StandInServer:
+    """
+    A local HTTP server that answers a small part of the ERDDAP URL space from in-memory content so Info
+    can be exercised and timed without a network connection. It serves info/dataset_id/index.csv and
+    tabledap/dataset_id.csv queries with variable lists, constraints (including =~), distinct(), orderBy()
+    and the orderByMax, Min, MinMax, Closest, Mean and Count reductions, with variable/interval such as time/1day.
+    It also serves griddap/dataset_id.nc queries with index ranges, e.g. sst[0:1:10][0:2:100][0:2:200]. Use it as a context manager:
+
+        with StandInServer({'my_id': index_csv_text}, {'my_id': data_df}) as server:
+            info = Info(server.url + '/tabledap/my_id')
+
+        Parameters:
+                :param: datasets: the text of the info index.csv of each data set keyed by data set id
+                :type: dict
+                :param: data: the rows of each data set keyed by data set id, time columns as datetime64
+                :type: dict
+                :param: delay: seconds to wait before answering each request, to stand in for a slow server
+                :type: float
+                :param: grids: the (axes, variables) of each griddap data set keyed by data set id, see griddap_query
+                :type: dict
+    """
+    def __init__(self, datasets, data=None, delay=0, grids=None):
+        self.datasets = datasets
+        self.data = data or {}
+        self.grids = grids or {}
+        self.delay = delay
+        self.requests = []
+        self.connections = 0
+        self.last_modified = email.utils.formatdate(time.time(), usegmt=True)
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://' + host + ':' + str(port) + '/erddap'
+
+    def start(self):
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _handler(self))
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, path, query, headers):
+        """
+        Returns the status, content type and body for a request. Override or extend to serve more of ERDDAP.
+        """
+        parts = path.strip('/').split('/')
+        if len(parts) == 4 and parts[0] == 'erddap' and parts[1] == 'info' and parts[3] == 'index.csv':
+            if parts[2] in self.datasets:
+                return 200, 'text/csv', self.datasets[parts[2]].encode('utf-8')
+        if len(parts) == 3 and parts[0] == 'erddap' and parts[1] == 'tabledap' and '.' in parts[2]:
+            dataset_id, file_type = parts[2].rsplit('.', 1)
+            if dataset_id in self.data:
+                df = tabledap_query(self.data[dataset_id], query)
+                if len(df) == 0:
+                    return 404, 'text/plain', _NO_DATA
+                return self.encode(df, file_type)
+        if len(parts) == 3 and parts[0] == 'erddap' and parts[1] == 'griddap' and parts[2].endswith('.nc'):
+            dataset_id = parts[2][:-len('.nc')]
+            if dataset_id in self.grids:
+                try:
+                    axes, variables = griddap_query(*self.grids[dataset_id], query)
+                except (IndexError, KeyError, ValueError):
+                    return 400, 'text/plain', _BAD_GRID_REQUEST
+                return 200, 'application/x-netcdf', encode_grid(axes, variables)
+        return 404, 'text/plain', _NOT_FOUND
+
+    def encode(self, df, file_type):
+        """
+        Returns the status, content type and body of a tabledap response of file_type for the rows in df.
+        """
+        if file_type == 'csv':
+            return 200, 'text/csv', encode_csv(df)
+        if file_type == 'nc':
+            return 200, 'application/x-netcdf', encode_nc(df)
+        if file_type == 'parquet' and formats.available('parquet'):
+            buffer = io.BytesIO()
+            df.to_parquet(buffer, index=False)
+            return 200, 'application/parquet', buffer.getvalue()
+        return 400, 'text/plain', b'Error {\n    code=400;\n    message="Bad Request: unsupported fileType";\n}\n'
+
+
+def encode_csv(df):
+    """
+    Returns the rows of df as an ERDDAP .csv response: a header, a units row and ISO 8601 times.
+    """
+    out = df.copy()
+    units = []
+    for col in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+            units.append('UTC')
+        else:
+            units.append('')
+    buffer = io.StringIO()
+    out.to_csv(buffer, index=False)
+    lines = buffer.getvalue().split('\n', 1)
+    return (lines[0] + '\n' + ','.join(units) + '\n' + lines[1]).encode('utf-8')
+
+
+def encode_nc(df):
+    """
+    Returns the rows of df as an ERDDAP tabledap .nc response with times in seconds since 1970-01-01.
+    """
+    columns = {}
+    for col in df.columns:
+        data = df[col]
+        attributes = {}
+        if pd.api.types.is_datetime64_any_dtype(data):
+            epoch = pd.Timestamp('1970-01-01', tz=data.dt.tz)
+            data = (data - epoch).dt.total_seconds()
+            attributes['units'] = 'seconds since 1970-01-01T00:00:00Z'
+        elif data.dtype.kind == 'f':
+            attributes['_FillValue'] = np.nan
+        columns[col] = (data.to_numpy(), attributes)
+    return netcdf3.write(columns)
+
+
+def encode_grid(axes, variables):
+    """
+    Returns a grid as an ERDDAP griddap .nc response with times in seconds since 1970-01-01. Float variables
+    have a _FillValue of NaN and integer variables the smallest value of their type.
+    """
+    encoded = {}
+    for name, values in axes.items():
+        if np.issubdtype(values.dtype, np.datetime64):
+            encoded[name] = (values.astype('datetime64[s]').astype(np.int64).astype(float),
+                             {'units': 'seconds since 1970-01-01T00:00:00Z'})
+        else:
+            encoded[name] = (values, {})
+    return netcdf3.write_grid(encoded, {name: (data, {'_FillValue': np.nan if data.dtype.kind == 'f' else
+                                                      data.dtype.type(np.iinfo(data.dtype).min)})
+                                        for name, data in variables.items()})
+
+
+def grid_index_csv(axes, variables, title='Stand-in grid'):
+    """
+    Returns the text of the info index.csv of a griddap data set: a dimension row for each axis, with time axes as
+    datetime64, and a variable row for each data variable.
+    """
+    rows = [('attribute', 'NC_GLOBAL', 'cdm_data_type', 'String', 'Grid'),
+            ('attribute', 'NC_GLOBAL', 'title', 'String', title)]
+    for name, values in axes.items():
+        is_time = np.issubdtype(values.dtype, np.datetime64)
+        numbers = values.astype('datetime64[s]').astype(np.int64).astype(float) if is_time else values
+        steps = np.diff(numbers)
+        even = len(steps) == 0 or bool(np.allclose(steps, steps[0]))
+        spacing = steps.mean() if len(steps) else 0
+        rows.append(('dimension', name, '', 'double' if is_time else 'float',
+                     'nValues=' + str(len(values)) + ', evenlySpaced=' + str(even).lower() + ', averageSpacing=' +
+                     repr(float(spacing))))
+        rows.append(('attribute', name, 'actual_range', 'double', repr(float(numbers[0])) + ', ' +
+                     repr(float(numbers[-1]))))
+        axis_type = {'time': 'Time', 'latitude': 'Lat', 'longitude': 'Lon'}.get(name)
+        if is_time:
+            axis_type = 'Time'
+            rows.append(('attribute', name, 'units', 'String', 'seconds since 1970-01-01T00:00:00Z'))
+            rows.append(('attribute', 'NC_GLOBAL', 'time_coverage_start', 'String',
+                         str(values[0].astype('datetime64[s]')) + 'Z'))
+            rows.append(('attribute', 'NC_GLOBAL', 'time_coverage_end', 'String',
+                         str(values[-1].astype('datetime64[s]')) + 'Z'))
+        if axis_type is not None:
+            rows.append(('attribute', name, '_CoordinateAxisType', 'String', axis_type))
+    for name, data in variables.items():
+        data_type = {'f4': 'float', 'i1': 'byte', 'i2': 'short', 'i4': 'int'}.get(data.dtype.str[1:], 'double')
+        rows.append(('variable', name, '', data_type, ', '.join(axes)))
+        rows.append(('attribute', name, 'long_name', 'String', name))
+    buffer = io.StringIO()
+    pd.DataFrame(rows, columns=['Row Type', 'Variable Name', 'Attribute Name', 'Data Type', 'Value']).to_csv(
+        buffer, index=False)
+    return buffer.getvalue()
+
+
+def griddap_query(axes, variables, query):
+    """
+    Applies a griddap query with index ranges to a grid and returns the axes and variables of the result. A grid
+    is the values of each axis keyed by name in dimension order and the data of each variable, with a dimension
+    for each axis, keyed by name. A query of only axis variables returns only those axes.
+    """
+    items = [urllib.parse.unquote(item) for item in query.split(',')] if query else list(variables)
+    names = list(axes)
+    out_axes = {}
+    out_variables = {}
+    for item in items:
+        name = item.split('[', 1)[0]
+        slices = [_grid_slice(*r) for r in _GRID_RANGE.findall(item)]
+        if name in axes:
+            out_axes[name] = _grid_take(axes[name], slices[0] if slices else slice(None))
+            continue
+        slices = slices or [slice(None)] * len(names)
+        if len(slices) != len(names):
+            raise ValueError('Expected ' + str(len(names)) + ' index ranges for ' + name)
+        out_variables[name] = variables[name][tuple(slices)]
+        for axis, index in zip(names, slices):
+            out_axes[axis] = _grid_take(axes[axis], index)
+    return {name: out_axes[name] for name in names if name in out_axes}, out_variables
+
+
+def _grid_slice(start, second, third):
+    # [start], [start:stop] or [start:stride:stop], stop included
+    start = int(start)
+    if third:
+        return slice(start, int(third) + 1, int(second))
+    if second:
+        return slice(start, int(second) + 1)
+    return slice(start, start + 1)
+
+
+def _grid_take(values, index):
+    if index.start is not None and (index.start >= len(values) or index.stop > len(values) or index.start >= index.stop):
+        raise IndexError('Index range out of bounds')
+    return values[index]
+
+
+def tabledap_query(df, query):
+    """
+    Applies an ERDDAP tabledap query string (still percent-encoded) to a DataFrame and returns the result.
+    """
+    items = [urllib.parse.unquote(item) for item in query.split('&')] if query else []
+    variables = [v for v in items[0].split(',') if v] if items and not _is_constraint(items[0]) else []
+    if variables:
+        items = items[1:]
+    for item in items:
+        match = _CONSTRAINT.match(item)
+        if match is not None:
+            df = df[_compare(df[match.group(1)], match.group(2), match.group(3))]
+    if variables:
+        df = df[variables]
+    for item in items:
+        if item == 'distinct()':
+            df = df.drop_duplicates()
+        elif item.startswith('orderBy("'):
+            df = df.sort_values(item[len('orderBy("'):-2].split(','), kind='stable')
+        else:
+            match = _ORDER_BY.match(item)
+            if match is not None:
+                df = _order_by(df, match.group(1), match.group(2).split(','))
+    return df.reset_index(drop=True)
+
+
+def _order_by(df, function, names):
+    # The orderByMax, Min, MinMax, Closest, Mean and Count filters, with the variable/interval form of the names,
+    # e.g. orderByMean("ID,time/1day").
+    columns = [name.split('/', 1)[0] for name in names]
+    keys = {}
+    for name, column in zip(names, columns):
+        interval = name.split('/', 1)[1] if '/' in name else None
+        keys[column] = df[column] if interval is None else _round(df[column], interval,
+                                                                  function == 'orderByClosest')
+    work = df.assign(**keys)
+    if function in ('orderByMean', 'orderByCount'):
+        others = [c for c in df.columns if c not in columns]
+        grouped = work.groupby(columns, sort=True)
+        if function == 'orderByMean':
+            # The mean of each numeric variable, the others are left out
+            reduced = grouped[[c for c in others if pd.api.types.is_numeric_dtype(df[c])]].mean()
+        else:
+            reduced = grouped[others].count()
+        reduced = reduced.reset_index()
+        return reduced[[c for c in df.columns if c in reduced.columns]]
+    if function == 'orderByClosest':
+        distance = (df[columns[-1]] - work[columns[-1]]).abs()
+        rows = distance.groupby([work[c] for c in columns], sort=True).idxmin()
+        return df.loc[rows.to_numpy()]
+    # orderByMax, orderByMin and orderByMinMax: the rows with the extreme value of the last variable of each group
+    value = columns[-1]
+    work = work[work[value].notna()]
+    rows = []
+    for extreme in (('idxmin',) if function == 'orderByMin' else ('idxmax',) if function == 'orderByMax'
+                    else ('idxmin', 'idxmax')):
+        if len(columns) == 1:
+            rows.extend([getattr(work[value], extreme)()] if len(work) else [])
+        else:
+            rows.extend(getattr(work.groupby(columns[:-1], sort=True)[value], extreme)().tolist())
+    selected = df.loc[sorted(set(rows))]
+    return selected.sort_values(columns[:-1], kind='stable') if len(columns) > 1 else selected
+
+
+def _round(column, interval, nearest):
+    # The values of column floored, or rounded when nearest, to interval: a number for numeric columns, a number
+    # and time unit such as 1day or 2hours for times.
+    match = _INTERVAL.match(interval)
+    number = float(match.group(1))
+    if pd.api.types.is_datetime64_any_dtype(column):
+        step = pd.Timedelta(seconds=number * _TIME_UNITS[match.group(2).lower().rstrip('s')])
+        return column.dt.round(step) if nearest else column.dt.floor(step)
+    steps = column / number
+    return (steps.round() if nearest else np.floor(steps)) * number
+
+
+def _is_constraint(item):
+    return _CONSTRAINT.match(item) is not None or item.endswith(')')
+
+
+def _compare(column, op, text):
+    if text.startswith('"') and text.endswith('"'):
+        value = text[1:-1]
+    elif pd.api.types.is_datetime64_any_dtype(column):
+        value = pd.Timestamp(text)
+        if value.tzinfo is None and column.dt.tz is not None:
+            value = value.tz_localize('UTC')
+    else:
+        value = float(text)
+    if op == '=~':
+        return column.astype(str).str.fullmatch(value)
+    if op == '=':
+        return column.astype(str) == value if isinstance(value, str) else column == value
+    if op == '!=':
+        return column.astype(str) != value if isinstance(value, str) else column != value
+    if op == '>=':
+        return column >= value
+    if op == '<=':
+        return column <= value
+    if op == '>':
+        return column > value
+    return column < value
+
+
+def _handler(server):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Send the headers and body of a response in one write, small responses otherwise stall on the
+        # client's delayed ACK.
+        wbufsize = 64 * 1024
+
+        def setup(self):
+            super().setup()
+            server.connections += 1
+
+        def do_GET(self):
+            split = urllib.parse.urlsplit(self.path)
+            server.requests.append(self.path)
+            if server.delay:
+                time.sleep(server.delay)
+            status, content_type, body = server.respond(split.path, split.query, self.headers)
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if status == 200:
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', server.last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,87 @@
+import tempfile
+import unittest
+import unittest.mock
+
+import pandas as pd
+
+from sdig.erddap.info import Info
+from sdig.erddap.tiles import TileCache
+
+import fixtures
+
+
+class TestTileCache(unittest.TestCase):
+
+    def setUp(self):
+        # Make the data set end with the rows below
+        self.index_csv = fixtures.index_csv().replace('1999-11-05T18:00:00Z', '1993-10-18T14:00:00Z')
+        self.df = fixtures.hourly()
+        self.server, data_url = fixtures.serve(self.df, self.index_csv)
+        self.info = Info(data_url)
+        self.directory = tempfile.TemporaryDirectory()
+        self.tiles = TileCache(self.directory.name, tile_length='7D')
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def expected(self, start, end, platforms):
+        df = self.df[(self.df['time'] >= pd.Timestamp(start, tz='UTC')) & (self.df['time'] <= pd.Timestamp(end, tz='UTC'))]
+        return df[df['ID'].isin(platforms)]
+
+    def test_overlapping_reads(self):
+        df = self.tiles.read(self.info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-10T00:00:00Z', ['1', '3'])
+        self.assertEqual(len(df), len(self.expected('1993-09-01', '1993-09-10', ['1', '3'])))
+        self.assertEqual(df['ID'].astype(str).unique().tolist(), ['1', '3'])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['time']))
+        requests = len(self.server.requests)
+        # The same tiles again, read from disk
+        self.tiles.read(self.info, ['QS'], '1993-09-02T00:00:00Z', '1993-09-09T00:00:00Z', ['3'])
+        self.assertEqual(len(self.server.requests), requests)
+        # One new tile at the end
+        df = self.tiles.read(self.info, ['QS'], '1993-09-05T00:00:00Z', '1993-09-20T00:00:00Z', ['1', '3'])
+        self.assertEqual(len(self.server.requests), requests + 1)
+        self.assertEqual(len(df), len(self.expected('1993-09-05', '1993-09-20', ['1', '3'])))
+        self.assertEqual(df['time'].min(), pd.Timestamp('1993-09-05T00:00:00Z'))
+
+    def test_stored_tiles(self):
+        # Tiles read back from disk have the values and dtypes of the ones read from ERDDAP
+        fresh = self.tiles.read(self.info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-10T00:00:00Z', ['1', '3'])
+        self.assertGreater(self.tiles.stats()['tiles'], 0)
+        stored = self.tiles.read(self.info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-10T00:00:00Z', ['1', '3'])
+        self.assertEqual(self.tiles.hits, self.tiles.misses)
+        pd.testing.assert_frame_equal(stored, fresh)
+        # A tile removed by another reader between finding and reading it is a miss
+        requests = len(self.server.requests)
+        with unittest.mock.patch('os.utime', side_effect=FileNotFoundError):
+            again = self.tiles.read(self.info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-10T00:00:00Z', ['1', '3'])
+        pd.testing.assert_frame_equal(again, fresh)
+        self.assertGreater(len(self.server.requests), requests)
+
+    def test_numeric_ids(self):
+        # Ids that read as numbers keep their leading zeros, in the tiles read from ERDDAP and from disk
+        self.server.data['CGBN_Canada'] = fixtures.hourly(['01', '02', '03', '04', '05'])
+        fresh = self.tiles.read(self.info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-10T00:00:00Z', ['01', '03'])
+        self.assertEqual(fresh['ID'].unique().tolist(), ['01', '03'])
+        self.assertEqual(len(fresh), 2 * (9 * 24 + 1))
+        stored = self.tiles.read(self.info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-10T00:00:00Z', ['01', '03'])
+        pd.testing.assert_frame_equal(stored, fresh)
+        self.assertGreater(self.tiles.stats()['bytes'], 0)
+
+    def test_coverage_end(self):
+        df = self.tiles.read(self.info, ['QS'], '1993-10-10T00:00:00Z', '1994-01-01T00:00:00Z', '2')
+        self.assertEqual(df['time'].max(), pd.Timestamp('1993-10-18T14:00:00Z'))
+        # Only requests up to the coverage end are made and the tile holding it is not kept
+        self.assertEqual(self.tiles.stats()['tiles'], 1)
+        requests = len(self.server.requests)
+        self.tiles.read(self.info, ['QS'], '1993-10-10T00:00:00Z', '1994-01-01T00:00:00Z', '2')
+        self.assertEqual(len(self.server.requests), requests + 1)
+
+    def test_eviction(self):
+        tiles = TileCache(self.directory.name, tile_length='1D', max_bytes=1)
+        tiles.read(self.info, ['QS'], '1993-09-01T00:00:00Z', '1993-09-05T00:00:00Z')
+        self.assertEqual(tiles.stats()['bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sdig.util.zc import Bounds
+from sdig.util.zc import frame_zoom_centers
+from sdig.util.zc import zoom_center
+from sdig.util.zc import zoom_centers
+
+
+class TestZoomCenters(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        n = 10000
+        self.df = pd.DataFrame({'ID': rng.choice(['a', 'b', 'c', 'd'], n),
+                                'longitude': rng.uniform(-170, 170, n), 'latitude': rng.uniform(-60, 60, n)})
+        self.df.loc[self.df['ID'] == 'b', ['longitude', 'latitude']] *= 0.01
+
+    def test_matches_zoom_center(self):
+        result = frame_zoom_centers(self.df, 'ID')
+        self.assertEqual(sorted(result.index), ['a', 'b', 'c', 'd'])
+        for platform, group in self.df.groupby('ID'):
+            zoom, center = zoom_center(tuple(group['longitude']), tuple(group['latitude']))
+            self.assertEqual(result.loc[platform, 'zoom'], zoom)
+            self.assertEqual(result.loc[platform, 'lon'], center['lon'])
+            self.assertEqual(result.loc[platform, 'lat'], center['lat'])
+
+    def test_missing(self):
+        lons = np.array([10.0, np.nan, 11.0, 50.0])
+        lats = np.array([1.0, 89.0, 2.0, 5.0])
+        result = zoom_centers(lons, lats, np.array(['x', 'x', 'x', None], dtype=object))
+        self.assertEqual(list(result.index), ['x'])
+        self.assertEqual(result.loc['x', 'lat'], 1.5)
+        self.assertEqual(zoom_centers(lons[[0, 2]], lats[[0, 2]]).loc[0, 'lon'], 10.5)
+
+    def test_bounds(self):
+        extent = Bounds()
+        with self.assertRaises(ValueError):
+            extent.zoom_center()
+        for start in range(0, len(self.df), 999):
+            extent.update_frame(self.df.iloc[start:start + 999], 'ID')
+        pd.testing.assert_frame_equal(extent.zoom_centers().sort_index(),
+                                      frame_zoom_centers(self.df, 'ID').sort_index())
+        self.assertEqual(extent.zoom_center(), zoom_center(tuple(self.df['longitude']), tuple(self.df['latitude'])))
+
+
+if __name__ == '__main__':
+    unittest.main()